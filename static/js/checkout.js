@@ -0,0 +1,39 @@
+// Looks the pincode up as it is typed: shows the delivery estimate and
+// turns express off where it isn't offered. payment() checks it again.
+document.addEventListener("DOMContentLoaded", function () {
+    var input = document.querySelector('input[name="pincode"]');
+    var method = document.getElementById("delivery_method");
+    var estimate = document.getElementById("delivery_estimate");
+    if (!input || !method || !estimate) {
+        return;
+    }
+    var express = method.querySelector('option[value="express"]');
+
+    input.addEventListener("input", function () {
+        var pincode = input.value.trim();
+        estimate.textContent = "";
+        express.disabled = false;
+        if (!/^[1-9][0-9]{5}$/.test(pincode)) {
+            return;
+        }
+        fetch(input.dataset.lookupUrl.replace("000000", pincode))
+            .then(function (response) { return response.json(); })
+            .then(function (data) {
+                if (input.value.trim() !== pincode) {
+                    return;  // typed on since
+                }
+                if (!data.serviceable) {
+                    estimate.textContent = "Sorry, we don't deliver to " + pincode + " yet.";
+                    return;
+                }
+                var days = data.delivery_days;
+                express.disabled = days.express === null;
+                if (express.disabled && method.value === "express") {
+                    method.value = "standard";
+                }
+                estimate.textContent = "Standard delivery in " + days.standard + " days" +
+                    (days.express === null ? "; no express delivery here." : ", express in " + days.express + ".");
+            })
+            .catch(function () {});
+    });
+});
@@ -1,16 +1,21 @@
 from django.contrib import admin
-from .models import Product, Category, ProductImage, ContactMessage, Order, OrderItem, CartItem
+from . import serviceability
+from .models import Product, Category, ProductImage, ProductVariant, ContactMessage, Order, OrderItem, CartItem, PincodeRange
 
 class ProductImageInline(admin.TabularInline):
     model = ProductImage
     extra = 3
 
+class ProductVariantInline(admin.TabularInline):
+    model = ProductVariant
+    extra = 1
+
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     list_display = ('title', 'price', 'old_price', 'category')
     prepopulated_fields = {"slug": ("title",)}
     list_filter = ('category',)
-    inlines = [ProductImageInline]
+    inlines = [ProductVariantInline, ProductImageInline]
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -50,4 +55,24 @@ class OrderItemAdmin(admin.ModelAdmin):
 class ContactMessageAdmin(admin.ModelAdmin):
     list_display = ("name", "email", "created_at")
     search_fields = ("name", "email")
-    list_filter = ("created_at",)
\ No newline at end of file
+    list_filter = ("created_at",)
+
+@admin.register(PincodeRange)
+class PincodeRangeAdmin(admin.ModelAdmin):
+    list_display = ("start", "end", "zone", "standard_days", "express_days")
+    list_filter = ("zone",)
+    search_fields = ("zone",)
+
+    # edits here move the version every worker's index is tagged with; no
+    # signals, so import_pincodes can replace the table without one per row
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        serviceability.invalidate()
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        serviceability.invalidate()
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        serviceability.invalidate()
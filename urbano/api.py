@@ -0,0 +1,289 @@
+"""
+Read-only JSON catalog API.
+
+  GET /api/categories/
+  GET /api/products/?category=&size=&min_price=&max_price=&ordering=&fields=&limit=&cursor=
+  GET /api/products/<slug>/?fields=
+  GET /api/search/?q=   (same parameters as the product list)
+  GET /api/pincodes/<pincode>/   delivery estimate for checkout
+
+``fields`` picks a subset of PRODUCT_FIELDS and the list query only()
+loads the columns those need. Lists are paged by an opaque keyset cursor
+on (ordering value, id), so deep pages cost the same as the first. Product
+detail is served from a cached full serialization, precomputed for the
+hottest products by update_rankings. Responses carry ETags from the same
+version stamps as the HTML pages and are gzipped when the client allows.
+"""
+
+import base64
+import binascii
+import json
+from dataclasses import asdict
+from decimal import Decimal, InvalidOperation
+
+from django.core.cache import cache
+from django.db.models import Prefetch, Q
+from django.http import JsonResponse
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import require_GET
+
+from . import pagecache, registry, serviceability
+from .conditional import catalog_condition
+from .metrics import note_cache
+from .models import Product, ProductImage, ProductRank, in_stock_size
+
+
+def _images(product):
+    return [image.image.url for image in product.images.all()]
+
+
+# name -> (columns to load, value)
+PRODUCT_FIELDS = {
+    "id": ((), lambda p: p.id),
+    "slug": (("slug",), lambda p: p.slug),
+    "title": (("title",), lambda p: p.title),
+    "price": (("price",), lambda p: p.price),
+    "old_price": (("old_price",), lambda p: p.old_price),
+    "discount_percentage": (("price", "old_price"), lambda p: p.discount_percentage),
+    "brand": (("brand",), lambda p: p.brand),
+    "tag": (("tag",), lambda p: p.tag),
+    "short_description": (("short_description",), lambda p: p.short_description),
+    "features": (("features",), lambda p: p.features.splitlines()),
+    "sizes": ((), lambda p: p.size_list),
+    "variants": ((), lambda p: [
+        {"size": v.size, "price": v.price if v.price is not None else p.price, "in_stock": v.in_stock}
+        for v in p.variants.all()
+    ]),
+    "category": (
+        ("category__slug", "category__name"),
+        lambda p: p.category and {"slug": p.category.slug, "name": p.category.name},
+    ),
+    "image": ((), lambda p: next(iter(_images(p)), None)),
+    "images": ((), _images),
+    "url": (("slug",), lambda p: reverse("product_detail", args=[p.slug])),
+}
+DEFAULT_FIELDS = ("id", "slug", "title", "price", "old_price", "image")
+ORDERINGS = ("-id", "id", "price", "-price")
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+CACHE_SECONDS = 60 * 60
+HOT_PRODUCTS = 200
+# SQLite integers are signed 64-bit
+MAX_ID = 2 ** 63 - 1
+CENT = Decimal("0.01")
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def _error(message):
+    return JsonResponse({"error": message}, status=400)
+
+
+def _fields(request):
+    names = request.GET.get("fields")
+    if not names:
+        return DEFAULT_FIELDS
+    names = tuple(name.strip() for name in names.split(",") if name.strip())
+    unknown = [name for name in names if name not in PRODUCT_FIELDS]
+    if unknown:
+        raise BadRequest(f"unknown fields: {', '.join(unknown)}")
+    return names
+
+
+def _queryset(fields, extra_columns=()):
+    columns = {"id", *extra_columns}
+    for name in fields:
+        columns.update(PRODUCT_FIELDS[name][0])
+    queryset = Product.objects.only(*columns)
+    if "category" in fields:
+        queryset = queryset.select_related("category")
+    if "image" in fields or "images" in fields:
+        queryset = queryset.prefetch_related(
+            Prefetch("images", queryset=ProductImage.objects.only("id", "product_id", "image"))
+        )
+    if "sizes" in fields or "variants" in fields:
+        queryset = queryset.prefetch_related("variants")
+    return queryset
+
+
+def serialize(product, fields):
+    return {name: PRODUCT_FIELDS[name][1](product) for name in fields}
+
+
+def _encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+
+def _price(value, message):
+    """``value`` as a finite Decimal in cents, else BadRequest(message)."""
+    try:
+        price = Decimal(value)
+        if price.is_finite():
+            # raises InvalidOperation past 28 digits
+            return price.quantize(CENT)
+    except (InvalidOperation, TypeError, ValueError):
+        pass
+    raise BadRequest(message)
+
+
+def _decode_cursor(cursor, field):
+    """[id], or [price, id] when ordering by price; anything else is a BadRequest."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise BadRequest("invalid cursor")
+    if not isinstance(values, list) or len(values) != (1 if field == "id" else 2):
+        raise BadRequest("cursor does not match ordering")
+    *value, last_id = values
+    if type(last_id) is not int or not 0 <= last_id <= MAX_ID:
+        raise BadRequest("invalid cursor")
+    if not value:
+        return [last_id]
+    if not isinstance(value[0], str):
+        raise BadRequest("invalid cursor")
+    return [_price(value[0], "invalid cursor"), last_id]
+
+
+def _after(queryset, ordering, cursor):
+    """Rows strictly after ``cursor`` in ``ordering``, ties broken by id."""
+    field = ordering.lstrip("-")
+    op = "lt" if ordering.startswith("-") else "gt"
+    if field == "id":
+        return queryset.filter(**{f"id__{op}": cursor[0]})
+    value, last_id = cursor
+    return queryset.filter(Q(**{f"{field}__{op}": value}) | Q(**{field: value, f"id__{op}": last_id}))
+
+
+def _page(request, where):
+    fields = _fields(request)
+    ordering = request.GET.get("ordering", "-id")
+    if ordering not in ORDERINGS:
+        raise BadRequest(f"ordering must be one of {', '.join(ORDERINGS)}")
+    try:
+        limit = min(int(request.GET.get("limit", PAGE_SIZE)), MAX_PAGE_SIZE)
+    except ValueError:
+        raise BadRequest("limit must be a number")
+    if limit < 1:
+        raise BadRequest("limit must be positive")
+
+    field = ordering.lstrip("-")
+    queryset = _queryset(fields, extra_columns=[field]).filter(where)
+    if request.GET.get("cursor"):
+        queryset = _after(queryset, ordering, _decode_cursor(request.GET["cursor"], field))
+    tiebreak = "-id" if ordering.startswith("-") else "id"
+    rows = list(queryset.order_by(*dict.fromkeys([ordering, tiebreak]))[:limit + 1])
+
+    next_url = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        cursor = [last.id] if field == "id" else [str(getattr(last, field)), last.id]
+        params = request.GET.copy()
+        params["cursor"] = _encode_cursor(cursor)
+        next_url = f"{request.path}?{params.urlencode()}"
+    return JsonResponse({"results": [serialize(p, fields) for p in rows], "next": next_url})
+
+
+def _filters(request):
+    where = Q()
+    if request.GET.get("category"):
+        where &= Q(category__slug=request.GET["category"])
+    if request.GET.get("size"):
+        where &= in_stock_size(request.GET["size"])
+    if request.GET.get("min_price"):
+        where &= Q(price__gte=_price(request.GET["min_price"], "min_price and max_price must be numbers"))
+    if request.GET.get("max_price"):
+        where &= Q(price__lte=_price(request.GET["max_price"], "min_price and max_price must be numbers"))
+    return where
+
+
+@gzip_page
+@require_GET
+@catalog_condition("catalog", per_viewer=False)
+def categories(request):
+    return JsonResponse({"results": [asdict(entry) for entry in registry.entries()]})
+
+
+@gzip_page
+@require_GET
+@catalog_condition("catalog", per_viewer=False)
+def products(request):
+    try:
+        return _page(request, _filters(request))
+    except BadRequest as error:
+        return _error(str(error))
+
+
+@gzip_page
+@require_GET
+@catalog_condition("catalog", per_viewer=False)
+def search(request):
+    query = request.GET.get("q", "").strip()
+    if not query:
+        return _error("q is required")
+    try:
+        matches = Q(title__icontains=query) | Q(short_description__icontains=query) | Q(brand__icontains=query)
+        return _page(request, _filters(request) & matches)
+    except BadRequest as error:
+        return _error(str(error))
+
+
+def _detail_key(slug):
+    return f"api:product:{pagecache.version()}:{slug}"
+
+
+def precompute(products):
+    """Cache the full serialization of ``products`` (a queryset); returns {slug: serialization}."""
+    rows = products.select_related("category").prefetch_related(
+        Prefetch("images", queryset=ProductImage.objects.only("id", "product_id", "image")), "variants",
+    )
+    found = {p.slug: serialize(p, PRODUCT_FIELDS) for p in rows}
+    cache.set_many({_detail_key(slug): data for slug, data in found.items()}, CACHE_SECONDS)
+    return found
+
+
+def precompute_hot(limit=HOT_PRODUCTS):
+    """Serialize the top trending and best-selling products ahead of requests."""
+    ids = set()
+    for feed in ("trending", "best_sellers"):
+        ranks = ProductRank.objects.filter(feed=feed).order_by("-score")
+        ids.update(ranks.values_list("product_id", flat=True)[:limit])
+    return len(precompute(Product.objects.filter(id__in=ids)))
+
+
+@gzip_page
+@require_GET
+@catalog_condition("product", per_viewer=False)
+def product(request, slug):
+    try:
+        fields = _fields(request)
+    except BadRequest as error:
+        return _error(str(error))
+    data = cache.get(_detail_key(slug))
+    note_cache(data is not None)
+    if data is None:
+        # used as built: the cache may not keep it (eviction, DummyCache)
+        data = precompute(Product.objects.filter(slug=slug)).get(slug)
+        if data is None:
+            return JsonResponse({"error": "not found"}, status=404)
+    return JsonResponse({name: data[name] for name in fields})
+
+
+@require_GET
+def pincode(request, pincode):
+    if not serviceability.PINCODE.match(pincode):
+        return _error("pincode must be 6 digits")
+    found = serviceability.estimate(pincode)
+    response = JsonResponse({
+        "pincode": pincode,
+        "serviceable": found is not None,
+        "zone": found and found["zone"],
+        "delivery_days": found and {"standard": found["standard"], "express": found["express"]},
+    })
+    # an import may change it, but a few minutes stale is fine for a hint
+    patch_cache_control(response, public=True, max_age=300)
+    return response
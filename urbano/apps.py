@@ -4,4 +4,7 @@ from django.apps import AppConfig
 class UrbanoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'urbano'
-    verbose_name = "Urbano"
\ No newline at end of file
+    verbose_name = "Urbano"
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,123 @@
+"""
+Async versions of the catalog, search and payment views, routed in place
+of the ones in views.py when ASYNC_VIEWS is on (urbano_cart/asgi.py).
+
+Rows are loaded with the async ORM, and payment awaits the gateway over
+httpx (gateway.get_async_client) instead of holding a worker for the
+round trip. The ORM itself still runs each query on a sync_to_async
+thread, so the catalog pages mostly gain from not queueing behind
+payments. Templates, the session and the category registry are sync
+code; each view renders through one sync_to_async call at the end.
+"""
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.http import Http404
+from django.shortcuts import aget_object_or_404, redirect, render
+
+from . import recommendations, registry, serviceability
+from .conditional import catalog_condition
+from .gateway import get_async_client
+from .models import CartItem, Order, OrderItem, Product
+from .views import UNSERVICEABLE, category_sizes, listing_filters, order_fields, order_lines, search_queryset
+
+
+async def _listing(request, products):
+    brands = [brand async for brand in products.order_by().values_list("brand", flat=True).distinct()]
+    products = [product async for product in products]
+    if request.GET.get("sort") == "discount":
+        products.sort(key=lambda p: p.discount_percentage, reverse=True)
+    return products, brands
+
+
+@catalog_condition("category")
+async def category_products(request, slug):
+    category = await sync_to_async(registry.get)(slug)
+    if category is None:
+        raise Http404(f"No category {slug}")
+    products, brands = await _listing(
+        request, listing_filters(request, Product.objects.filter(category_id=category.id).prefetch_related("images")),
+    )
+    sizes = [size async for size in category_sizes(category)] if category.requires_size else []
+    return await sync_to_async(render)(request, "category_products.html", {
+        "category": category,
+        "products": products,
+        "brands": brands,
+        "sizes": sizes,
+        "page_title": category.name,
+    })
+
+
+@catalog_condition("product")
+async def product_detail(request, slug):
+    product = await aget_object_or_404(Product, slug=slug)
+    return await sync_to_async(render)(request, "product_detail.html", {
+        "product": product,
+        "images": [image async for image in product.images.all()],
+        "variants": [variant async for variant in product.variants.all()],
+        "bought_together": await sync_to_async(recommendations.for_product)(product.id),
+    })
+
+
+@catalog_condition("catalog")
+async def search_products(request):
+    query = request.GET.get("q", "").strip()
+    products, brands = await _listing(request, listing_filters(request, search_queryset(query)))
+    return await sync_to_async(render)(request, "search_results.html", {
+        "products": products,
+        "brands": brands,
+        "page_title": f"Search results for: {query}",
+    })
+
+
+async def payment(request):
+    if request.method != "POST":
+        return redirect("checkout")
+
+    user = await request.auser()
+    items = [
+        item async for item in
+        CartItem.objects.filter(user=user).select_related("product").prefetch_related("product__variants")
+    ]
+    if not items:
+        return redirect("cart")
+
+    delivery_days = await sync_to_async(serviceability.delivery_days)(
+        request.POST.get("pincode"), request.POST.get("delivery_method"),
+    )
+    if delivery_days is None:
+        messages.error(request, UNSERVICEABLE)
+        return redirect("checkout")
+
+    fields = order_fields(request.POST, items, delivery_days)
+    order = await Order.objects.acreate(user=user, **fields)
+    await OrderItem.objects.abulk_create(order_lines(order, items))
+
+    if user.username == "demo@example.com":
+        # Do not trigger Razorpay
+        order.is_paid = True
+        order.payment_method = "demo"
+        await order.asave()
+        await CartItem.objects.filter(user=user).adelete()
+        return redirect("order_success", order_id=order.id)
+
+    if fields["payment_method"] == "cod":
+        await order.asave()
+        await CartItem.objects.filter(user=user).adelete()
+        return redirect("order_success", order_id=order.id)
+
+    razorpay_order = await get_async_client().order.create({
+        "amount": int(fields["total_price"] * 100),
+        "currency": "INR",
+        "payment_capture": 1,
+    })
+    order.razorpay_order_id = razorpay_order["id"]
+    await order.asave()
+
+    return await sync_to_async(render)(request, "payment_page.html", {
+        "order": order,
+        "razorpay_key": settings.RAZORPAY_KEY_ID,
+        "razorpay_order_id": razorpay_order["id"],
+        "amount": fields["total_price"],
+    })
@@ -0,0 +1,197 @@
+"""
+Per-view query counts and latency for every URL in urbano/urls.py.
+
+Shared by the ``bench_views`` command (JSON report against a seeded
+database) and the query-budget tests. Each request runs inside a
+transaction that is rolled back, so write views can be measured
+repeatedly without changing the data.
+"""
+
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import Category, Product, ProductImage, CartItem, Order
+from .urls import urlpatterns
+
+# Upper bound on SQL queries per request, independent of how many rows the
+# page shows. A view going over budget usually means a new N+1.
+QUERY_BUDGETS = {
+    "home": 13,
+    "signup": 2,
+    "login": 2,
+    "logout": 4,
+    "account": 2,
+    "categories": 4,
+    "category_products": 8,
+    "product_detail": 8,
+    "best_sellers": 7,
+    "new_arrivals": 7,
+    "on_sale": 6,
+    "summer_edit": 6,
+    "workspace": 6,
+    "gifts": 6,
+    "featured_product": 6,
+    "add_to_cart": 9,
+    "cart": 6,
+    "search": 6,
+    "update_cart": 4,
+    "remove_from_cart": 3,
+    "checkout": 5,
+    "payment": 10,
+    "order_success": 3,
+    "payment_failed": 2,
+    "my_orders": 6,
+    "cancel_order": 4,
+    "about": 2,
+    "contact": 2,
+    # session + user for the staff check; a scrape from METRICS_ALLOWED_IPS runs none
+    "metrics": 2,
+    "api_categories": 3,
+    "api_products": 4,
+    "api_product": 4,
+    "api_search": 4,
+    "api_pincode": 1,
+    "media": 0,
+}
+
+# URL names that can't be driven from a benchmark, with the reason
+SKIPPED = {
+    "payment_callback": "needs a signed Razorpay callback",
+}
+
+
+def sample_fixture():
+    """Pick the rows the scenarios point at from whatever data is loaded."""
+    shopper_id = (
+        CartItem.objects.filter(user__orders__isnull=False)
+        .order_by("user_id")
+        .values_list("user_id", flat=True)
+        .first()
+    )
+    user = User.objects.get(pk=shopper_id)
+    category = Category.objects.filter(products__isnull=False).order_by("pk").first()
+    # add_to_cart without a size needs a product without variants
+    unsized = Product.objects.filter(variants__isnull=True).order_by("pk").first()
+    return {
+        "user": user,
+        "category": category,
+        "product": Product.objects.filter(category=category).order_by("pk").first(),
+        "unsized_product": unsized,
+        "cart_item": CartItem.objects.filter(user=user).order_by("pk").first(),
+        "order": Order.objects.filter(user=user).order_by("-created_at").first(),
+        "image": ProductImage.objects.order_by("pk").values_list("image", flat=True).first() or "missing.png",
+    }
+
+
+def scenarios(fixture):
+    """URL name -> (method, path, data) for each benchmarked request."""
+    checkout_form = {
+        "fullname": "Bench Shopper",
+        "phone": "9999999999",
+        "address": "1 Bench Street",
+        "city": "Hyderabad",
+        "state": "Telangana",
+        "pincode": "500001",
+        "delivery_method": "standard",
+        "payment_method": "cod",
+    }
+    return {
+        "home": ("get", reverse("home"), None),
+        "signup": ("get", reverse("signup"), None),
+        "login": ("get", reverse("login"), None),
+        "logout": ("post", reverse("logout"), None),
+        "account": ("get", reverse("account"), None),
+        "categories": ("get", reverse("categories"), None),
+        "category_products": ("get", reverse("category_products", args=[fixture["category"].slug]), {"sort": "low_to_high"}),
+        "product_detail": ("get", reverse("product_detail", args=[fixture["product"].slug]), None),
+        "best_sellers": ("get", reverse("best_sellers"), None),
+        "new_arrivals": ("get", reverse("new_arrivals"), None),
+        "on_sale": ("get", reverse("on_sale"), None),
+        "summer_edit": ("get", reverse("summer_edit"), None),
+        "workspace": ("get", reverse("workspace"), None),
+        "gifts": ("get", reverse("gifts"), None),
+        "featured_product": ("get", reverse("featured_product"), None),
+        "add_to_cart": ("post", reverse("add_to_cart", args=[fixture["unsized_product"].pk]), {"quantity": "1"}),
+        "cart": ("get", reverse("cart"), None),
+        "search": ("get", reverse("search"), {"q": fixture["product"].title.split()[0]}),
+        "update_cart": ("post", reverse("update_cart", args=[fixture["cart_item"].pk]), {"quantity": "2"}),
+        "remove_from_cart": ("get", reverse("remove_from_cart", args=[fixture["cart_item"].pk]), None),
+        "checkout": ("get", reverse("checkout"), None),
+        "payment": ("post", reverse("payment"), checkout_form),
+        "order_success": ("get", reverse("order_success", args=[fixture["order"].pk]), None),
+        "payment_failed": ("get", reverse("payment_failed"), None),
+        "my_orders": ("get", reverse("my_orders"), None),
+        "cancel_order": ("get", reverse("cancel_order", args=[fixture["order"].pk]), None),
+        "about": ("get", reverse("about"), None),
+        "contact": ("get", reverse("contact"), None),
+        "metrics": ("get", reverse("metrics"), None),
+        "api_categories": ("get", reverse("api_categories"), None),
+        "api_products": ("get", reverse("api_products"), {"fields": "id,title,price,category,image", "ordering": "price"}),
+        "api_product": ("get", reverse("api_product", args=[fixture["product"].slug]), None),
+        "api_search": ("get", reverse("api_search"), {"q": fixture["product"].title.split()[0]}),
+        "api_pincode": ("get", reverse("api_pincode", args=["500001"]), None),
+        "media": ("get", reverse("media", args=[fixture["image"]]), None),
+    }
+
+
+def url_names():
+    return [pattern.name for pattern in urlpatterns if pattern.name]
+
+
+def measure(client, method, path, data, runs, user=None):
+    """Issue the request ``runs`` times; return status, query count and timings (ms)."""
+    timings = []
+    for _ in range(runs):
+        if user is not None:
+            # logout cycles the session key, so log in again before every run
+            client.force_login(user)
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = getattr(client, method)(path, data)
+                timings.append((time.perf_counter() - started) * 1000)
+            transaction.set_rollback(True)
+    return response.status_code, len(queries), timings
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def run(runs=5, fixture=None, client=None):
+    """Benchmark every URL name; returns the report ``views`` mapping."""
+    fixture = fixture or sample_fixture()
+    client = client or Client(raise_request_exception=False)
+    plans = scenarios(fixture)
+    report = {}
+    for name in url_names():
+        if name in SKIPPED:
+            report[name] = {"skipped": SKIPPED[name]}
+            continue
+        method, path, data = plans[name]
+        status, queries, timings = measure(client, method, path, data, runs, user=fixture["user"])
+        report[name] = {
+            "method": method.upper(),
+            "path": path,
+            "status": status,
+            "queries": queries,
+            "budget": QUERY_BUDGETS[name],
+            "mean_ms": round(statistics.fmean(timings), 2),
+            "p50_ms": round(percentile(timings, 0.50), 2),
+            "p95_ms": round(percentile(timings, 0.95), 2),
+        }
+    return report
+
+
+def over_budget(report):
+    return {
+        name: result for name, result in report.items()
+        if "queries" in result and result["queries"] > result["budget"]
+    }
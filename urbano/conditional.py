@@ -0,0 +1,129 @@
+"""
+Conditional GET for catalog pages.
+
+Each page gets an ETag built from a cheap version stamp instead of its
+rendered body, so a browser revalidating an unchanged page is answered
+with 304 before the view loads any product rows or renders a template:
+
+  product page   Product.updated_at, one lookup on the slug index
+  category page  Category.generation of that category
+  other listings the sum of every Category.generation
+
+Generations are bumped by urbano/signals.py whenever a product, its
+images or its category are saved or deleted. QuerySet.update() and
+bulk_create() skip those signals; bump by hand after using them.
+
+The header shows the username, the session cart count and a CSRF token,
+so the viewer is folded into the ETag too. Pages carrying a flash
+message are never answered with 304. For async views the stamp is looked
+up in one sync_to_async call, since the session and messages are sync.
+"""
+
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.db.models import F, Max, Sum
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from . import pagecache
+from .models import Category, Product
+
+
+def bump_categories(category_ids=None):
+    """Invalidate listing ETags for the given categories (all of them when None) and cached pages."""
+    categories = Category.objects.all()
+    if category_ids is not None:
+        categories = categories.filter(pk__in=category_ids)
+    categories.update(generation=F("generation") + 1, updated_at=timezone.now())
+    pagecache.invalidate()
+
+
+def _product_stamp(request, slug):
+    return Product.objects.filter(slug=slug).values_list("updated_at", flat=True).first()
+
+
+def _category_stamp(request, slug):
+    row = Category.objects.filter(slug=slug).values_list("generation", "updated_at").first()
+    return row and row[1], row and row[0]
+
+
+def _catalog_stamp(request, **kwargs):
+    row = Category.objects.aggregate(generation=Sum("generation"), modified=Max("updated_at"))
+    return row["modified"], row["generation"]
+
+
+STAMPS = {
+    "product": lambda request, slug: (_product_stamp(request, slug), None),
+    "category": _category_stamp,
+    "catalog": _catalog_stamp,
+}
+
+
+def _viewer(request):
+    user_id = request.user.pk if request.user.is_authenticated else 0
+    return (
+        user_id,
+        len(request.session.get("cart", {})),
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ""),
+    )
+
+
+def catalog_condition(scope, per_viewer=True):
+    """
+    Answer GET/HEAD with 304 while the ``scope`` stamp (and, for HTML
+    pages, the viewer) is unchanged. JSON responses pass per_viewer=False.
+    """
+    lookup = STAMPS[scope]
+
+    def stamp(request, *args, **kwargs):
+        # condition() asks for the ETag and Last-Modified separately; look up once
+        if not hasattr(request, "_catalog_stamp"):
+            modified, generation = lookup(request, *args, **kwargs)
+            request._catalog_stamp = None
+            if modified is not None and not (per_viewer and len(get_messages(request))):
+                parts = (scope, request.get_full_path(), modified.isoformat(), generation)
+                if per_viewer:
+                    parts += (_viewer(request),)
+                etag = hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+                request._catalog_stamp = (etag, modified)
+        return request._catalog_stamp
+
+    def etag(request, *args, **kwargs):
+        found = stamp(request, *args, **kwargs)
+        return found and found[0]
+
+    def last_modified(request, *args, **kwargs):
+        found = stamp(request, *args, **kwargs)
+        return found and found[1]
+
+    def revalidate(response):
+        if response.has_header("ETag"):
+            # must be revalidated, or the header/the catalog goes stale
+            visibility = {"private": True} if per_viewer else {"public": True}
+            patch_cache_control(response, no_cache=True, **visibility)
+        return response
+
+    def decorator(view):
+        conditional_view = condition(etag_func=etag, last_modified_func=last_modified)(view)
+
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                # condition() then finds it on the request
+                await sync_to_async(stamp)(request, *args, **kwargs)
+                return revalidate(await conditional_view(request, *args, **kwargs))
+
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            return revalidate(conditional_view(request, *args, **kwargs))
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,164 @@
+"""
+Buffered clickstream.
+
+record() only appends a tuple to an in-memory deque. A background thread
+wakes every EVENTS_FLUSH_SECONDS, or as soon as EVENTS_BATCH_SIZE events
+are waiting, and bulk-inserts them into ClickEvent, resolving product
+slugs to ids one batch at a time. The deque holds at most
+EVENTS_MAX_BUFFER events; past that the oldest are dropped rather than
+letting a stalled database grow the process without bound. Events still
+buffered when a process dies are lost.
+
+With EVENTS_FLUSH_SECONDS = 0 no thread is started and flush() has to be
+called explicitly, which is what the tests do.
+
+compact() rolls finished days up into DailyProductEvents and DailySearch
+and deletes raw rows older than ``keep_days``. update_rankings reads the
+raw view and cart events too, so keep them for longer than its interval.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime, time as day_start, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count, Q
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from .models import ClickEvent, DailyProductEvents, DailySearch, Product
+
+logger = logging.getLogger(__name__)
+
+_buffer = None
+_wake = threading.Event()
+_start_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_writer = None
+dropped = 0
+
+
+def record(kind, product_id=None, slug="", query="", user_id=None, session_key=""):
+    """Queue one event; costs an append, never a query."""
+    global dropped
+    if not settings.EVENTS_ENABLED:
+        return
+    if _buffer is None:
+        _start()
+    if len(_buffer) == _buffer.maxlen:
+        dropped += 1
+    _buffer.append((kind, product_id, slug, query[:200], user_id, session_key or "", time.time()))
+    if len(_buffer) >= settings.EVENTS_BATCH_SIZE:
+        _wake.set()
+
+
+def record_request(request, kind, **fields):
+    """record() with the visitor taken from ``request``."""
+    user = getattr(request, "user", None)
+    record(
+        kind,
+        user_id=user.pk if user is not None and user.is_authenticated else None,
+        session_key=request.session.session_key if hasattr(request, "session") else "",
+        **fields,
+    )
+
+
+def _start():
+    global _buffer, _writer
+    with _start_lock:
+        if _buffer is None:
+            _buffer = deque(maxlen=settings.EVENTS_MAX_BUFFER)
+            atexit.register(flush)
+        if _writer is None and settings.EVENTS_FLUSH_SECONDS > 0:
+            _writer = threading.Thread(target=_write_forever, name="urbano-events", daemon=True)
+            _writer.start()
+
+
+def _write_forever():
+    while True:
+        _wake.wait(settings.EVENTS_FLUSH_SECONDS)
+        _wake.clear()
+        close_old_connections()
+        try:
+            flush()
+        except Exception:
+            logger.exception("clickstream flush failed")
+
+
+def flush():
+    """Write everything buffered so far; returns the number of events written."""
+    written = 0
+    with _flush_lock:
+        while _buffer:
+            batch = []
+            while _buffer and len(batch) < settings.EVENTS_BATCH_SIZE:
+                batch.append(_buffer.popleft())
+            _write(batch)
+            written += len(batch)
+    return written
+
+
+def _write(batch):
+    slugs = {slug for _, product_id, slug, *_ in batch if slug and product_id is None}
+    ids = dict(Product.objects.filter(slug__in=slugs).values_list("slug", "id")) if slugs else {}
+    ClickEvent.objects.bulk_create(
+        ClickEvent(
+            kind=kind,
+            product_id=product_id or ids.get(slug),
+            query=query,
+            user_id=user_id,
+            session_key=session_key,
+            created_at=datetime.fromtimestamp(when, tz=dt_timezone.utc),
+        )
+        for kind, product_id, slug, query, user_id, session_key, when in batch
+    )
+
+
+def _day_bounds(day):
+    start = timezone.make_aware(datetime.combine(day, day_start.min))
+    return start, start + timedelta(days=1)
+
+
+def compact(keep_days=2, log=None):
+    """Roll every finished day still in ClickEvent up into the daily tables."""
+    log = log or (lambda message: None)
+    today_start, _ = _day_bounds(timezone.localdate())
+    days = ClickEvent.objects.filter(created_at__lt=today_start).dates("created_at", "day")
+    stats = {"days": 0, "products": 0, "queries": 0}
+    for day in days:
+        start, end = _day_bounds(day)
+        events = ClickEvent.objects.filter(created_at__gte=start, created_at__lt=end)
+        products = (
+            events.filter(product__isnull=False, kind__in=["view", "cart"])
+            .values("product_id")
+            .annotate(
+                views=Count("id", filter=Q(kind="view")),
+                viewers=Count("session_key", filter=Q(kind="view") & ~Q(session_key=""), distinct=True),
+                cart_adds=Count("id", filter=Q(kind="cart")),
+            )
+        )
+        searches = (
+            events.filter(kind="search").exclude(query="")
+            .values(normalized=Lower("query")).annotate(searches=Count("id"))
+        )
+        # rebuilt from scratch, so compacting a day twice is harmless
+        with transaction.atomic():
+            DailyProductEvents.objects.filter(day=day).delete()
+            created = DailyProductEvents.objects.bulk_create(
+                DailyProductEvents(day=day, **row) for row in products
+            )
+            DailySearch.objects.filter(day=day).delete()
+            found = DailySearch.objects.bulk_create(
+                DailySearch(day=day, query=row["normalized"], searches=row["searches"]) for row in searches
+            )
+        stats["days"] += 1
+        stats["products"] += len(created)
+        stats["queries"] += len(found)
+        log(f"{day}: {len(created)} products, {len(found)} queries")
+
+    stats["deleted"] = ClickEvent.objects.filter(created_at__lt=today_start - timedelta(days=keep_days)).delete()[0]
+    return stats
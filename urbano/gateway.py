@@ -0,0 +1,125 @@
+"""
+Payment gateway client.
+
+Views get their Razorpay client from ``get_client()``. With
+PAYMENT_GATEWAY_STUB on, a local stand-in is returned instead so checkout
+can be load-tested without network calls or real keys.
+
+The async payment view (urbano/async_views.py) uses ``get_async_client()``:
+the same two calls, with the order created over httpx so the round trip
+is awaited instead of holding a thread. Its connection pool lives as long
+as the event loop; ``aclose()`` shuts it down from the ASGI lifespan
+shutdown in urbano_cart/asgi.py.
+"""
+
+import asyncio
+import time
+import uuid
+import weakref
+
+import razorpay
+from django.conf import settings
+
+
+RAZORPAY_API = "https://api.razorpay.com/v1/"
+RAZORPAY_TIMEOUT = 10
+
+# one httpx client (and connection pool) per event loop
+_http_clients = weakref.WeakKeyDictionary()
+
+
+def _stub_order(data):
+    return {
+        "id": f"order_stub_{uuid.uuid4().hex[:14]}",
+        "amount": data["amount"],
+        "currency": data["currency"],
+        "status": "created",
+    }
+
+
+class _StubOrders:
+    def create(self, data):
+        delay = settings.PAYMENT_GATEWAY_STUB_LATENCY_MS
+        if delay:
+            time.sleep(delay / 1000)  # stand-in for the gateway round trip
+        return _stub_order(data)
+
+
+class _AsyncStubOrders:
+    async def create(self, data):
+        delay = settings.PAYMENT_GATEWAY_STUB_LATENCY_MS
+        if delay:
+            await asyncio.sleep(delay / 1000)
+        return _stub_order(data)
+
+
+class _AsyncOrders:
+    def __init__(self, http):
+        self.http = http
+
+    async def create(self, data):
+        response = await self.http.post("orders", json=data)
+        response.raise_for_status()
+        return response.json()
+
+
+class _StubUtility:
+    def verify_payment_signature(self, params):
+        return True
+
+
+class StubClient:
+    """Accepts every order and signature, like a sandbox that never fails."""
+
+    def __init__(self):
+        self.order = _StubOrders()
+        self.utility = _StubUtility()
+
+
+class AsyncStubClient:
+    """StubClient whose order round trip is an asyncio.sleep."""
+
+    def __init__(self):
+        self.order = _AsyncStubOrders()
+        self.utility = _StubUtility()
+
+
+class AsyncClient:
+    """
+    ``order.create`` over httpx; signatures are checked locally by
+    razorpay's own utility, which needs no network.
+    """
+
+    def __init__(self, http, key_id, key_secret):
+        self.order = _AsyncOrders(http)
+        self.utility = razorpay.Client(auth=(key_id, key_secret)).utility
+
+
+def get_client():
+    if settings.PAYMENT_GATEWAY_STUB:
+        return StubClient()
+    return razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
+
+
+def get_async_client():
+    """Call from inside the event loop the client will be used on."""
+    if settings.PAYMENT_GATEWAY_STUB:
+        return AsyncStubClient()
+    import httpx
+
+    loop = asyncio.get_running_loop()
+    http = _http_clients.get(loop)
+    if http is None:
+        http = _http_clients[loop] = httpx.AsyncClient(
+            base_url=RAZORPAY_API,
+            auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET),
+            timeout=RAZORPAY_TIMEOUT,
+        )
+    return AsyncClient(http, settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET)
+
+
+async def aclose():
+    """Close the httpx client of the running loop, if it has one."""
+    http = _http_clients.pop(asyncio.get_running_loop(), None)
+    if http is not None:
+        await http.aclose()
@@ -0,0 +1,207 @@
+"""
+Closed-loop load generator replaying weighted shopper journeys over HTTP.
+
+Each virtual shopper is a thread with its own cookie jar. It picks a
+journey by weight, walks its steps (URL names from urbano/urls.py) and
+records the latency of every request under that URL name. Redirects are
+not followed, so add_to_cart and payment are timed on their own.
+"""
+
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.cookiejar import CookieJar
+
+from django.db.models import OuterRef, Q, Subquery
+from django.urls import reverse
+
+from .benchmarks import percentile
+from .models import Category, Product, ProductVariant
+from .synthetic import USER_PASSWORD, USER_PREFIX
+
+# name -> (weight, steps); "purchase" logs in first because checkout needs it
+JOURNEYS = {
+    "browse": (50, ["home", "category_products", "product_detail"]),
+    "search": (20, ["home", "search", "product_detail"]),
+    "add_to_cart": (20, ["category_products", "product_detail", "add_to_cart", "cart"]),
+    "purchase": (10, ["home", "category_products", "product_detail", "add_to_cart",
+                      "cart", "checkout", "payment"]),
+}
+LOGIN_JOURNEYS = {"purchase"}
+
+CHECKOUT_FORM = {
+    "fullname": "Load Shopper",
+    "phone": "9999999999",
+    "address": "1 Load Street",
+    "city": "Hyderabad",
+    "state": "Telangana",
+    "pincode": "500001",
+    "delivery_method": "standard",
+}
+
+
+def sample_catalog(products_per_category=200):
+    """Category slugs, products and search terms the shoppers pick from."""
+    catalog = {}
+    for category in Category.objects.all():
+        first_size = (
+            ProductVariant.objects.filter(Q(stock__isnull=True) | Q(stock__gt=0), product=OuterRef("pk"))
+            .order_by("position", "id").values("size")[:1]
+        )
+        products = list(
+            Product.objects.filter(category=category)
+            .order_by("pk")
+            .values_list("pk", "slug", Subquery(first_size))[:products_per_category]
+        )
+        if products:
+            catalog[category.slug] = products
+    brands = list(Product.objects.exclude(brand=None).values_list("brand", flat=True).distinct()[:50])
+    return {"categories": catalog, "search_terms": brands or ["shirt"]}
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Shopper:
+    """One virtual user: a cookie jar plus the journey it is walking."""
+
+    def __init__(self, base_url, catalog, rng, username, payment_method, record):
+        self.base_url = base_url.rstrip("/")
+        self.catalog = catalog
+        self.rng = rng
+        self.username = username
+        self.payment_method = payment_method
+        self.record = record
+        self.cookies = CookieJar()
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies), _NoRedirect
+        )
+        self.logged_in = False
+        self.product = None
+
+    def _csrf_token(self):
+        for cookie in self.cookies:
+            if cookie.name == "csrftoken":
+                return cookie.value
+        return ""
+
+    def request(self, name, path, data=None):
+        url = self.base_url + path
+        body = None
+        headers = {}
+        if data is not None:
+            token = self._csrf_token()
+            body = urllib.parse.urlencode({**data, "csrfmiddlewaretoken": token}).encode()
+            headers = {"X-CSRFToken": token, "Referer": url}
+        started = time.perf_counter()
+        try:
+            with self.opener.open(urllib.request.Request(url, body, headers), timeout=60) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as exc:
+            exc.read()
+            status = exc.code
+        except OSError:
+            status = 0  # connection refused / reset / timeout
+        self.record(name, status, (time.perf_counter() - started) * 1000)
+        return status
+
+    def login(self):
+        path = reverse("login")
+        self.request("login", path)
+        status = self.request("login", path, {"username": self.username, "password": USER_PASSWORD})
+        self.logged_in = status == 302
+
+    def step(self, name):
+        if name == "category_products":
+            slug = self.rng.choice(list(self.catalog["categories"]))
+            self.product = self.rng.choice(self.catalog["categories"][slug])
+            return self.request(name, reverse(name, args=[slug]))
+        if name == "product_detail":
+            if self.product is None:
+                self.product = self.rng.choice(self.rng.choice(list(self.catalog["categories"].values())))
+            return self.request(name, reverse(name, args=[self.product[1]]))
+        if name == "add_to_cart":
+            product_id, _, size = self.product
+            data = {"quantity": "1"}
+            if size:
+                data["size"] = size
+            return self.request(name, reverse(name, args=[product_id]), data)
+        if name == "search":
+            return self.request(name, reverse(name) + "?" + urllib.parse.urlencode(
+                {"q": self.rng.choice(self.catalog["search_terms"])}
+            ))
+        if name == "payment":
+            return self.request(name, reverse(name), {**CHECKOUT_FORM, "payment_method": self.payment_method})
+        return self.request(name, reverse(name))
+
+    def walk(self, journey):
+        _, steps = JOURNEYS[journey]
+        if journey in LOGIN_JOURNEYS and not self.logged_in:
+            self.login()
+        self.product = None
+        for name in steps:
+            self.step(name)
+
+
+def run(base_url, concurrency=10, duration=30.0, think_time=0.0, seed=1,
+        payment_method="rzp", catalog=None, journeys=None):
+    """Drive ``concurrency`` shoppers for ``duration`` seconds and return the report."""
+    catalog = catalog or sample_catalog()
+    journeys = journeys or list(JOURNEYS)
+    weights = [JOURNEYS[name][0] for name in journeys]
+    samples = {}
+    completed = {name: 0 for name in journeys}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def record(name, status, elapsed_ms):
+        with lock:
+            samples.setdefault(name, []).append((status, elapsed_ms))
+
+    def shopper(number):
+        rng = random.Random(seed * 1000 + number)
+        user = Shopper(base_url, catalog, rng, f"{USER_PREFIX}{number}", payment_method, record)
+        while time.monotonic() < deadline:
+            journey = rng.choices(journeys, weights)[0]
+            user.walk(journey)
+            with lock:
+                completed[journey] += 1
+            if think_time:
+                time.sleep(rng.expovariate(1 / think_time))
+
+    threads = [threading.Thread(target=shopper, args=(n,), daemon=True) for n in range(concurrency)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    urls = {}
+    for name, results in sorted(samples.items()):
+        timings = [ms for _, ms in results]
+        urls[name] = {
+            "requests": len(results),
+            "errors": sum(1 for status, _ in results if status == 0 or status >= 400),
+            "rps": round(len(results) / elapsed, 2),
+            "p50_ms": round(percentile(timings, 0.50), 2),
+            "p95_ms": round(percentile(timings, 0.95), 2),
+            "p99_ms": round(percentile(timings, 0.99), 2),
+        }
+    total = sum(result["requests"] for result in urls.values())
+    return {
+        "base_url": base_url,
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 2),
+        "requests": total,
+        "rps": round(total / elapsed, 2),
+        "journeys": completed,
+        "urls": urls,
+    }
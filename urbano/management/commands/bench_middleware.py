@@ -0,0 +1,49 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+
+class Command(BaseCommand):
+    help = "Per-request overhead of one middleware: the same URL with and without it in MIDDLEWARE."
+
+    def add_arguments(self, parser):
+        parser.add_argument("middleware", help="dotted path, e.g. urbano.middleware.InstrumentationMiddleware")
+        parser.add_argument("--path", default="/about-us/", help="URL to request")
+        parser.add_argument("--requests", type=int, default=5000, help="requests per side")
+
+    def handle(self, *args, **opts):
+        middleware = opts["middleware"]
+        if middleware not in settings.MIDDLEWARE:
+            raise CommandError(f"{middleware} is not in MIDDLEWARE")
+        without = [m for m in settings.MIDDLEWARE if m != middleware]
+
+        setup_test_environment()
+        try:
+            clients = {}
+            for label, stack in (("with", settings.MIDDLEWARE), ("without", without)):
+                with override_settings(MIDDLEWARE=stack):
+                    clients[label] = Client()
+                    clients[label].get(opts["path"])  # builds its middleware chain now
+            timings = {"with": [], "without": []}
+            # interleave request by request so machine noise hits both sides alike
+            for n in range(opts["requests"]):
+                order = ("with", "without") if n % 2 else ("without", "with")
+                for label in order:
+                    started = time.perf_counter()
+                    clients[label].get(opts["path"])
+                    timings[label].append((time.perf_counter() - started) * 1_000_000)
+        finally:
+            teardown_test_environment()
+
+        with_us = statistics.median(timings["with"])
+        without_us = statistics.median(timings["without"])
+        overhead = with_us - without_us
+        name = middleware.rsplit(".", 1)[-1]
+        self.stdout.write(f"{opts['path']}  {opts['requests']} requests per side, median")
+        self.stdout.write(f"without {name}: {without_us:8.1f} µs/request")
+        self.stdout.write(f"with {name}:    {with_us:8.1f} µs/request")
+        self.stdout.write(f"overhead: {overhead:+.1f} µs ({overhead / without_us * 100:+.2f}%)")
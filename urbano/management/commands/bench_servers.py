@@ -0,0 +1,123 @@
+import importlib.util
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from urbano import loadgen
+
+# label -> (module run with python -m, its arguments), {workers} and {port} filled in
+SERVERS = {
+    "wsgi": ("gunicorn", ["urbano_cart.wsgi:application", "--workers", "{workers}",
+                          "--bind", "127.0.0.1:{port}", "--log-level", "warning"]),
+    "asgi": ("uvicorn", ["urbano_cart.asgi:application", "--workers", "{workers}",
+                         "--host", "127.0.0.1", "--port", "{port}", "--log-level", "warning"]),
+}
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_up(url, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError(f"server exited with {process.returncode}")
+        try:
+            urllib.request.urlopen(url, timeout=2).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise CommandError(f"server did not answer {url} within {timeout}s")
+
+
+class Command(BaseCommand):
+    help = (
+        "Start the WSGI deployment (gunicorn, sync workers) and the ASGI one "
+        "(uvicorn, async views) in turn with the same worker count, drive each "
+        "with the same shopper journeys and compare throughput and latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=2)
+        parser.add_argument("--concurrency", type=int, default=32)
+        parser.add_argument("--duration", type=float, default=20.0, help="seconds per server")
+        parser.add_argument("--journeys", nargs="+", choices=list(loadgen.JOURNEYS), help="default: all")
+        parser.add_argument(
+            "--gateway-latency-ms", type=int, default=200,
+            help="PAYMENT_GATEWAY_STUB_LATENCY_MS for both servers",
+        )
+        parser.add_argument("--servers", nargs="+", choices=list(SERVERS), default=list(SERVERS))
+        parser.add_argument("--output", help="write the JSON reports here")
+
+    def handle(self, *args, **opts):
+        for label in opts["servers"]:
+            module = SERVERS[label][0]
+            if importlib.util.find_spec(module) is None:
+                raise CommandError(f"{module} is not installed (pip install {module})")
+        catalog = loadgen.sample_catalog()
+        if not catalog["categories"]:
+            raise CommandError("No products to browse; run seed_catalog first.")
+
+        env = {
+            **os.environ,
+            "PAYMENT_GATEWAY_STUB": "1",
+            "PAYMENT_GATEWAY_STUB_LATENCY_MS": str(opts["gateway_latency_ms"]),
+        }
+        reports = {}
+        for label in opts["servers"]:
+            module, arguments = SERVERS[label]
+            port = _free_port()
+            command = [sys.executable, "-m", module] + [
+                argument.format(workers=opts["workers"], port=port) for argument in arguments
+            ]
+            base_url = f"http://127.0.0.1:{port}"
+            self.stdout.write(f"{label}: {' '.join(command[1:])}")
+            process = subprocess.Popen(
+                command, cwd=settings.BASE_DIR, env={**env, "ASYNC_VIEWS": "1" if label == "asgi" else "0"},
+            )
+            try:
+                _wait_until_up(base_url + "/about-us/", process)
+                reports[label] = loadgen.run(
+                    base_url,
+                    concurrency=opts["concurrency"],
+                    duration=opts["duration"],
+                    catalog=catalog,
+                    journeys=opts["journeys"],
+                )
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+
+        self.stdout.write(
+            f"{opts['workers']} workers, {opts['concurrency']} shoppers, "
+            f"{opts['duration']:g}s each, gateway {opts['gateway_latency_ms']} ms"
+        )
+        header = f"{'url':<20}" + "".join(f"{label + ' req/s':>12}{'p50':>8}{'p95':>8}" for label in reports)
+        self.stdout.write(header)
+        names = sorted({name for report in reports.values() for name in report["urls"]})
+        for name in names + ["total"]:
+            row = f"{name:<20}"
+            for report in reports.values():
+                result = report["urls"].get(name)
+                if name == "total":
+                    row += f"{report['rps']:>12.1f}{'':>16}"
+                elif result is None:
+                    row += f"{'-':>12}{'':>16}"
+                else:
+                    row += f"{result['rps']:>12.1f}{result['p50_ms']:>8.0f}{result['p95_ms']:>8.0f}"
+            self.stdout.write(row)
+        errors = {label: sum(r["errors"] for r in report["urls"].values()) for label, report in reports.items()}
+        self.stdout.write("errors: " + ", ".join(f"{label}={count}" for label, count in errors.items()))
+        if opts["output"]:
+            with open(opts["output"], "w") as fh:
+                json.dump(reports, fh, indent=2, sort_keys=True)
@@ -0,0 +1,122 @@
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from urbano_cart.db import SQLITE_PRAGMAS, pragma_statements
+
+
+SCHEMA = """
+CREATE TABLE product (id INTEGER PRIMARY KEY, title TEXT, price REAL, brand TEXT);
+CREATE INDEX product_price ON product (price);
+CREATE TABLE cart_item (id INTEGER PRIMARY KEY, product_id INTEGER, quantity INTEGER);
+"""
+
+
+class Command(BaseCommand):
+    help = "Concurrent read/write benchmark: default SQLite journaling vs. production (WAL) pragmas."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seconds", type=float, default=5.0)
+        parser.add_argument("--readers", type=int, default=8)
+        parser.add_argument("--writers", type=int, default=2)
+        parser.add_argument("--products", type=int, default=5000)
+
+    def handle(self, *args, **opts):
+        modes = [
+            # what Django does out of the box: rollback journal, 5s driver timeout
+            ("default", {"timeout": 5}, []),
+            ("production", {"timeout": 20}, pragma_statements(SQLITE_PRAGMAS)),
+        ]
+        self.stdout.write(
+            f"{opts['readers']} readers / {opts['writers']} writers, "
+            f"{opts['seconds']}s per mode, {opts['products']} products"
+        )
+        self.stdout.write(f"{'mode':<12}{'reads/s':>12}{'writes/s':>12}{'locked':>10}")
+        for name, connect_kwargs, pragmas in modes:
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, "bench.sqlite3")
+                self._seed(path, opts["products"])
+                reads, writes, locked = self._run(path, connect_kwargs, pragmas, opts)
+            secs = opts["seconds"]
+            self.stdout.write(f"{name:<12}{reads / secs:>12.0f}{writes / secs:>12.0f}{locked:>10}")
+
+    def _connect(self, path, connect_kwargs, pragmas):
+        conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False, **connect_kwargs)
+        for statement in pragmas:
+            conn.execute(statement)
+        return conn
+
+    def _seed(self, path, count):
+        conn = sqlite3.connect(path)
+        conn.executescript(SCHEMA)
+        conn.executemany(
+            "INSERT INTO product (title, price, brand) VALUES (?, ?, ?)",
+            [(f"Product {i}", random.uniform(100, 5000), f"Brand {i % 40}") for i in range(count)],
+        )
+        conn.commit()
+        conn.close()
+
+    def _run(self, path, connect_kwargs, pragmas, opts):
+        stop = threading.Event()
+        counts = {"reads": 0, "writes": 0, "locked": 0}
+        lock = threading.Lock()
+
+        def reader():
+            conn = self._connect(path, connect_kwargs, pragmas)
+            done = locked = 0
+            while not stop.is_set():
+                low = random.uniform(100, 4500)
+                try:
+                    conn.execute(
+                        "SELECT id, title, price FROM product WHERE price BETWEEN ? AND ? "
+                        "ORDER BY price LIMIT 24",
+                        (low, low + 500),
+                    ).fetchall()
+                    conn.execute("SELECT COUNT(*), SUM(quantity) FROM cart_item").fetchone()
+                    done += 1
+                except sqlite3.OperationalError:
+                    locked += 1
+            conn.close()
+            with lock:
+                counts["reads"] += done
+                counts["locked"] += locked
+
+        def writer():
+            conn = self._connect(path, connect_kwargs, pragmas)
+            done = locked = 0
+            while not stop.is_set():
+                try:
+                    conn.execute("BEGIN IMMEDIATE")
+                    conn.execute(
+                        "INSERT INTO cart_item (product_id, quantity) VALUES (?, ?)",
+                        (random.randint(1, opts["products"]), random.randint(1, 3)),
+                    )
+                    conn.execute(
+                        "UPDATE product SET price = price WHERE id = ?",
+                        (random.randint(1, opts["products"]),),
+                    )
+                    conn.execute("COMMIT")
+                    done += 1
+                except sqlite3.OperationalError:
+                    locked += 1
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK")
+            conn.close()
+            with lock:
+                counts["writes"] += done
+                counts["locked"] += locked
+
+        threads = [threading.Thread(target=reader) for _ in range(opts["readers"])]
+        threads += [threading.Thread(target=writer) for _ in range(opts["writers"])]
+        for t in threads:
+            t.start()
+        time.sleep(opts["seconds"])
+        stop.set()
+        for t in threads:
+            t.join()
+        return counts["reads"], counts["writes"], counts["locked"]
@@ -0,0 +1,62 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from urbano import benchmarks
+from urbano.models import Category, Product, ProductImage, CartItem, Order, OrderItem
+
+
+class Command(BaseCommand):
+    help = "Measure query count and latency for every URL in urbano/urls.py and write a JSON report."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=10, help="requests per URL")
+        parser.add_argument("--output", default="bench_report.json")
+        parser.add_argument("--baseline", help="earlier report to compare against")
+        parser.add_argument("--fail-on-budget", action="store_true")
+
+    def handle(self, *args, **opts):
+        # test environment: 'testserver' host, in-memory email backend
+        setup_test_environment()
+        try:
+            views = benchmarks.run(runs=opts["runs"])
+        finally:
+            teardown_test_environment()
+
+        report = {
+            "vendor": connection.vendor,
+            "runs": opts["runs"],
+            "dataset": {
+                model.__name__: model.objects.count()
+                for model in (Category, Product, ProductImage, CartItem, Order, OrderItem)
+            },
+            "views": views,
+        }
+        with open(opts["output"], "w") as fh:
+            json.dump(report, fh, indent=2, sort_keys=True)
+
+        baseline = {}
+        if opts["baseline"]:
+            with open(opts["baseline"]) as fh:
+                baseline = json.load(fh)["views"]
+
+        self.stdout.write(f"{'view':<20}{'status':>7}{'queries':>9}{'budget':>8}{'p50 ms':>10}{'p95 ms':>10}{'Δp95':>9}")
+        for name, result in views.items():
+            if "skipped" in result:
+                self.stdout.write(f"{name:<20}  skipped: {result['skipped']}")
+                continue
+            before = baseline.get(name, {}).get("p95_ms")
+            delta = f"{result['p95_ms'] - before:+.1f}" if before is not None else ""
+            self.stdout.write(
+                f"{name:<20}{result['status']:>7}{result['queries']:>9}{result['budget']:>8}"
+                f"{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}{delta:>9}"
+            )
+        self.stdout.write(f"Report written to {opts['output']}")
+
+        over = benchmarks.over_budget(views)
+        if over and opts["fail_on_budget"]:
+            raise CommandError("Over query budget: " + ", ".join(
+                f"{name} ({result['queries']}>{result['budget']})" for name, result in over.items()
+            ))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from urbano import recommendations
+
+
+class Command(BaseCommand):
+    help = "Count co-purchases in new orders and rebuild the frequently-bought-together lists."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="orders per batch")
+        parser.add_argument("--settle-minutes", type=int, default=60, help="skip orders younger than this")
+        parser.add_argument("--top-k", type=int, default=recommendations.TOP_K)
+        parser.add_argument("--rebuild", action="store_true", help="drop all counts and start from the first order")
+
+    def handle(self, *args, **opts):
+        started = time.perf_counter()
+        stats = recommendations.build(
+            batch_size=opts["batch_size"],
+            settle_minutes=opts["settle_minutes"],
+            top_k=opts["top_k"],
+            rebuild=opts["rebuild"],
+            log=lambda message: self.stdout.write(message) if opts["verbosity"] > 1 else None,
+        )
+        for name, value in stats.items():
+            self.stdout.write(f"{name:<14}{value:>10}")
+        self.stdout.write(self.style.SUCCESS(f"Built in {time.perf_counter() - started:.1f}s"))
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from urbano import events
+
+
+class Command(BaseCommand):
+    help = "Roll finished days of raw click events up into daily product and search totals."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--keep-days", type=int, default=2, help="raw events to keep after compacting")
+
+    def handle(self, *args, **opts):
+        started = time.perf_counter()
+        stats = events.compact(
+            keep_days=opts["keep_days"],
+            log=lambda message: self.stdout.write(message) if opts["verbosity"] > 1 else None,
+        )
+        for name, value in stats.items():
+            self.stdout.write(f"{name:<10}{value:>10}")
+        self.stdout.write(self.style.SUCCESS(f"Compacted in {time.perf_counter() - started:.1f}s"))
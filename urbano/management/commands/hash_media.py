@@ -0,0 +1,38 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from urbano import media
+from urbano.conditional import bump_categories
+from urbano.models import ProductImage
+
+
+class Command(BaseCommand):
+    help = (
+        "Move product images still stored under their upload names to "
+        "content-hashed names, so identical files are kept once, and delete the originals."
+    )
+
+    def handle(self, *args, **opts):
+        names = list(
+            ProductImage.objects.exclude(image="").order_by("image")
+            .values_list("image", flat=True).distinct()
+        )
+        moved, missing, hashed_names = 0, 0, set()
+        for name in names:
+            if media.is_hashed(name):
+                continue
+            if not default_storage.exists(name):
+                missing += 1
+                continue
+            with default_storage.open(name) as fh:
+                hashed = default_storage.save(name, fh)
+            ProductImage.objects.filter(image=name).update(image=hashed)
+            default_storage.delete(name)
+            if opts["verbosity"] > 1:
+                self.stdout.write(f"{name} -> {hashed}")
+            moved += 1
+            hashed_names.add(hashed)
+        if moved:
+            # update() skips the signals that move the page ETags and caches on
+            bump_categories()
+        self.stdout.write(f"moved {moved} files into {len(hashed_names)} distinct ones, {missing} missing")
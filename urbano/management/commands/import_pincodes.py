@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from urbano import serviceability
+
+
+class Command(BaseCommand):
+    help = (
+        "Replace the pincode serviceability table with a CSV of ranges "
+        "(start,end,zone,standard_days,express_days; blank express_days for none)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+
+    def handle(self, *args, **opts):
+        try:
+            with open(opts["path"], newline="") as fh:
+                rows = serviceability.parse(fh)
+        except OSError as error:
+            raise CommandError(str(error))
+        except ValueError as error:
+            raise CommandError(f"{opts['path']}: {error}")
+
+        started = time.perf_counter()
+        serviceability.replace(rows)
+        imported = time.perf_counter() - started
+        started = time.perf_counter()
+        index = serviceability.index()
+        loaded = time.perf_counter() - started
+        self.stdout.write(
+            f"{len(rows)} ranges in {len(index.zones)} zones imported in {imported:.2f}s; "
+            f"index loads in {loaded * 1000:.0f} ms and holds {index.nbytes / 1024:.0f} KiB"
+        )
@@ -0,0 +1,56 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from urbano import loadgen
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay weighted shopper journeys against a running server and report "
+        "throughput and p50/p95/p99 latency per URL name."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+        parser.add_argument("--concurrency", type=int, default=10)
+        parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+        parser.add_argument("--think-time", type=float, default=0.0, help="mean seconds between journeys")
+        parser.add_argument("--journeys", nargs="+", choices=list(loadgen.JOURNEYS), help="default: all")
+        parser.add_argument(
+            "--payment-method", default="rzp", choices=["rzp", "cod"],
+            help="rzp goes through the gateway; run the server with PAYMENT_GATEWAY_STUB=1",
+        )
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--output", help="write the JSON report here")
+
+    def handle(self, *args, **opts):
+        catalog = loadgen.sample_catalog()
+        if not catalog["categories"]:
+            raise CommandError("No products to browse; run seed_catalog first.")
+
+        report = loadgen.run(
+            opts["base_url"],
+            concurrency=opts["concurrency"],
+            duration=opts["duration"],
+            think_time=opts["think_time"],
+            seed=opts["seed"],
+            payment_method=opts["payment_method"],
+            catalog=catalog,
+            journeys=opts["journeys"],
+        )
+
+        self.stdout.write(
+            f"{report['requests']} requests in {report['duration_s']}s "
+            f"({report['rps']} req/s) with {report['concurrency']} shoppers"
+        )
+        self.stdout.write("journeys: " + ", ".join(f"{k}={v}" for k, v in report["journeys"].items()))
+        self.stdout.write(f"{'url':<20}{'requests':>9}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+        for name, result in report["urls"].items():
+            self.stdout.write(
+                f"{name:<20}{result['requests']:>9}{result['errors']:>8}{result['rps']:>9.1f}"
+                f"{result['p50_ms']:>9.1f}{result['p95_ms']:>9.1f}{result['p99_ms']:>9.1f}"
+            )
+        if opts["output"]:
+            with open(opts["output"], "w") as fh:
+                json.dump(report, fh, indent=2, sort_keys=True)
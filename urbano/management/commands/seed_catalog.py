@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from urbano import synthetic
+
+
+class Command(BaseCommand):
+    help = "Generate a seeded synthetic catalog (categories, products, images, users, carts, orders)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=100_000)
+        parser.add_argument("--images-per-product", type=int, default=3)
+        parser.add_argument("--users", type=int, default=200)
+        parser.add_argument("--cart-items", type=int, default=5, help="cart items per user")
+        parser.add_argument("--orders-per-user", type=int, default=5)
+        parser.add_argument("--items-per-order", type=int, default=3)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--clear", action="store_true", help="delete earlier synthetic rows first")
+
+    def handle(self, *args, **opts):
+        if opts["clear"]:
+            synthetic.clear()
+        started = time.perf_counter()
+        counts = synthetic.generate(
+            products=opts["products"],
+            images_per_product=opts["images_per_product"],
+            users=opts["users"],
+            cart_items=opts["cart_items"],
+            orders_per_user=opts["orders_per_user"],
+            items_per_order=opts["items_per_order"],
+            seed=opts["seed"],
+            batch_size=opts["batch_size"],
+            log=lambda message: self.stdout.write(message) if opts["verbosity"] > 1 else None,
+        )
+        for name, count in counts.items():
+            self.stdout.write(f"{name:<12}{count:>10}")
+        self.stdout.write(self.style.SUCCESS(f"Seeded in {time.perf_counter() - started:.1f}s"))
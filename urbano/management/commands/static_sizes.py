@@ -0,0 +1,37 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Raw, gzip and Brotli transfer sizes of the collected static files (run collectstatic first)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--include-admin", action="store_true", help="also list django.contrib.admin files")
+
+    def handle(self, *args, **opts):
+        manifest_path = os.path.join(settings.STATIC_ROOT, "staticfiles.json")
+        if not os.path.exists(manifest_path):
+            raise CommandError("No staticfiles.json; run collectstatic with STATICFILES_MANIFEST=1.")
+        with open(manifest_path) as fh:
+            paths = json.load(fh)["paths"]
+
+        def size(path):
+            return os.path.getsize(path) if os.path.exists(path) else None
+
+        totals = [0, 0, 0]
+        self.stdout.write(f"{'file':<48}{'raw':>10}{'gzip':>10}{'brotli':>10}")
+        for name, hashed in sorted(paths.items()):
+            if name.startswith("admin/") and not opts["include_admin"]:
+                continue
+            path = os.path.join(settings.STATIC_ROOT, hashed)
+            raw, gz, br = size(path), size(path + ".gz"), size(path + ".br")
+            # already-compressed formats (png, jpg) get no .gz/.br; they go out raw
+            sent = [raw, gz or raw, br or gz or raw]
+            totals = [t + s for t, s in zip(totals, sent)]
+            self.stdout.write(
+                f"{hashed[:47]:<48}{raw:>10}{gz if gz else '-':>10}{br if br else '-':>10}"
+            )
+        self.stdout.write(f"{'total sent':<48}{totals[0]:>10}{totals[1]:>10}{totals[2]:>10}")
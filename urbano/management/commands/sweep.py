@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from urbano import sweeper
+
+
+class Command(BaseCommand):
+    help = "Delete abandoned carts, expired sessions and stale unpaid orders, once or every --every seconds."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cart-days", type=int, default=sweeper.CART_DAYS)
+        parser.add_argument("--order-hours", type=int, default=sweeper.PENDING_ORDER_HOURS)
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--pause", type=float, default=0.05, help="seconds to sleep between batches")
+        parser.add_argument("--every", type=float, default=0, help="keep running, one sweep per this many seconds")
+
+    def handle(self, *args, **opts):
+        while True:
+            started = time.perf_counter()
+            run = sweeper.sweep(
+                cart_days=opts["cart_days"],
+                order_hours=opts["order_hours"],
+                batch_size=opts["batch_size"],
+                pause=opts["pause"],
+                log=lambda message: self.stdout.write(message) if opts["verbosity"] > 1 else None,
+            )
+            elapsed = time.perf_counter() - started
+            for name in ("carts", "sessions", "orders", "last_order_id"):
+                self.stdout.write(f"{name:<14}{getattr(run, name):>10}")
+            self.stdout.write(self.style.SUCCESS(f"Swept in {elapsed:.1f}s"))
+            if not opts["every"]:
+                return
+            time.sleep(max(opts["every"] - elapsed, 0))
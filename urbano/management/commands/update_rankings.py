@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from urbano import api, rankings
+
+
+class Command(BaseCommand):
+    help = (
+        "Credit new products and order lines to the best seller, trending and new arrival feeds, "
+        "once or every --every seconds."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--rebuild", action="store_true", help="drop all scores and start from the first order")
+        parser.add_argument("--every", type=float, default=0, help="keep running, one update per this many seconds")
+
+    def handle(self, *args, **opts):
+        if opts["rebuild"]:
+            rankings.reset()
+        while True:
+            started = time.perf_counter()
+            stats = rankings.update(
+                batch_size=opts["batch_size"],
+                log=lambda message: self.stdout.write(message) if opts["verbosity"] > 1 else None,
+            )
+            # the new top products are what the API will be asked for next
+            stats["api_cached"] = api.precompute_hot()
+            elapsed = time.perf_counter() - started
+            for name, value in stats.items():
+                self.stdout.write(f"{name:<10}{value:>10}")
+            self.stdout.write(self.style.SUCCESS(f"Updated in {elapsed:.1f}s"))
+            if not opts["every"]:
+                return
+            time.sleep(max(opts["every"] - elapsed, 0))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from urbano import warmup
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the worker warm-up steps in this (cold) process and report what each "
+        "cost; servers run them on start when WARMUP is on."
+    )
+    # the URL checks would import the views first and hide their cost
+    requires_system_checks = []
+
+    def handle(self, *args, **opts):
+        report = warmup.run(force=True)
+        self.stdout.write(f"{'step':<26}{'ms':>9}  detail")
+        for name, ms, detail in report:
+            self.stdout.write(f"{name:<26}{ms:>9.1f}  {detail}")
+        self.stdout.write(f"{'total':<26}{sum(ms for _, ms, _ in report):>9.1f}")
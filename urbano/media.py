@@ -0,0 +1,111 @@
+"""
+Content-addressed media.
+
+ContentAddressedStorage (STORAGES["default"]) names every upload after a
+hash of its bytes, under the field's upload_to directory:
+
+  products/multiple/3f/3f9c...e1.jpg
+
+so the same photo uploaded for ten products is stored once and all ten
+rows name the same file, and a name never changes content, so its URL can
+be cached for a year. Files are therefore shared between rows; nothing
+here deletes one while a row may still point at it.
+
+``serve`` answers MEDIA_URL. With MEDIA_SERVE=nginx (or sendfile for
+Apache/lighttpd) the worker only checks the path and hands the file to
+the web server in an X-Accel-Redirect (X-Sendfile) header; otherwise it
+returns a FileResponse, which gunicorn sends with sendfile(2).
+"""
+
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+import stat
+import tempfile
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import FileSystemStorage
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+from django.views.static import was_modified_since
+
+DIGEST_SIZE = 20
+HASHED_NAME = re.compile(rf"(^|/)([0-9a-f]{{2}})/\2[0-9a-f]{{{DIGEST_SIZE * 2 - 2}}}(\.\w+)?$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def is_hashed(name):
+    return HASHED_NAME.search(name) is not None
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage that stores each distinct file once, named by its hash."""
+
+    def get_available_name(self, name, max_length=None):
+        # _save picks the final name; a name that exists already holds these bytes
+        return name
+
+    def _save(self, name, content):
+        directory = posixpath.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        os.makedirs(self.path(directory), exist_ok=True)
+        digest = hashlib.blake2b(digest_size=DIGEST_SIZE)
+        fd, temp_path = tempfile.mkstemp(prefix=".upload-", dir=self.path(directory))
+        try:
+            with os.fdopen(fd, "wb") as temp:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    temp.write(chunk)
+            hexdigest = digest.hexdigest()
+            name = posixpath.join(directory, hexdigest[:2], hexdigest + extension)
+            full_path = self.path(name)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            if self.file_permissions_mode is not None:
+                os.chmod(temp_path, self.file_permissions_mode)
+            try:
+                # atomic: readers never see a partial file, and a racing
+                # upload of the same bytes just finds it there
+                os.link(temp_path, full_path)
+            except FileExistsError:
+                pass
+        finally:
+            os.unlink(temp_path)
+        return name
+
+
+@require_safe
+def serve(request, path):
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        status = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404("No such file")
+    if not stat.S_ISREG(status.st_mode):
+        raise Http404("No such file")
+
+    immutable = is_hashed(path)
+    # hashed names are never revalidated by browsers that honour immutable
+    if not immutable and not was_modified_since(request.META.get("HTTP_IF_MODIFIED_SINCE"), status.st_mtime):
+        return HttpResponseNotModified()
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or "application/octet-stream"
+    if settings.MEDIA_SERVE == "nginx":
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = settings.MEDIA_ACCEL_PREFIX + quote(path)
+    elif settings.MEDIA_SERVE == "sendfile":
+        response = HttpResponse(content_type=content_type)
+        response["X-Sendfile"] = full_path
+    else:
+        response = FileResponse(open(full_path, "rb"), content_type=content_type)
+    response["Last-Modified"] = http_date(status.st_mtime)
+    response["Cache-Control"] = IMMUTABLE if immutable else "public, no-cache"
+    if encoding:
+        response["Content-Encoding"] = encoding
+    return response
@@ -0,0 +1,129 @@
+"""
+In-process request metrics, exposed in Prometheus text format.
+
+InstrumentationMiddleware fills a RequestStats for every request and
+folds it into REGISTRY, keyed by URL name. Each worker process keeps its
+own registry; Prometheus sums them across scrape targets.
+"""
+
+import threading
+from bisect import bisect_left
+from contextvars import ContextVar
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# name -> (type, help, buckets)
+METRICS = {
+    "urbano_request_duration_seconds": ("histogram", "Total request latency.", DURATION_BUCKETS),
+    "urbano_db_duration_seconds": ("histogram", "Time spent in SQL per request.", DURATION_BUCKETS),
+    "urbano_db_queries": ("histogram", "SQL queries per request.", QUERY_BUCKETS),
+    "urbano_template_duration_seconds": ("histogram", "Template render time per request.", DURATION_BUCKETS),
+    "urbano_cache_hits_total": ("counter", "Cache hits.", None),
+    "urbano_cache_misses_total": ("counter", "Cache misses.", None),
+}
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_time", "template_time", "cache_hits", "cache_misses")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+# stats of the request being served in this thread / task
+current_stats = ContextVar("urbano_request_stats", default=None)
+
+
+def note_cache(hit):
+    """Count a cache lookup against the current request, if one is instrumented."""
+    stats = current_stats.get()
+    if stats is not None:
+        if hit:
+            stats.cache_hits += 1
+        else:
+            stats.cache_misses += 1
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "total", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class Registry:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+
+    def record(self, view, total_time, stats):
+        with self._lock:
+            self._observe("urbano_request_duration_seconds", view, total_time)
+            self._observe("urbano_db_duration_seconds", view, stats.db_time)
+            self._observe("urbano_db_queries", view, stats.queries)
+            self._observe("urbano_template_duration_seconds", view, stats.template_time)
+            if stats.cache_hits:
+                self._inc("urbano_cache_hits_total", view, stats.cache_hits)
+            if stats.cache_misses:
+                self._inc("urbano_cache_misses_total", view, stats.cache_misses)
+
+    def _observe(self, name, view, value):
+        key = (name, view)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = Histogram(METRICS[name][2])
+        histogram.observe(value)
+
+    def _inc(self, name, view, amount):
+        key = (name, view)
+        self._counters[key] = self._counters.get(key, 0) + amount
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            histograms = {key: (list(h.counts), h.total, h.count) for key, h in self._histograms.items()}
+            counters = dict(self._counters)
+
+        lines = []
+        for name, (kind, help_text, buckets) in METRICS.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "counter":
+                for (metric, view), value in sorted(counters.items()):
+                    if metric == name:
+                        lines.append(f'{name}{{view="{view}"}} {value}')
+                continue
+            for (metric, view), (counts, total, count) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip(buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{{view="{view}",le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{view="{view}",le="+Inf"}} {count}')
+                lines.append(f'{name}_sum{{view="{view}"}} {total:.6f}')
+                lines.append(f'{name}_count{{view="{view}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
@@ -0,0 +1,316 @@
+import math
+import random
+import threading
+import time
+from contextlib import ExitStack
+from functools import partial
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import patch_cache_control
+from django.utils.deprecation import MiddlewareMixin
+
+from . import events, pagecache, profiling, ratelimit
+from .metrics import REGISTRY, RequestStats, current_stats, note_cache
+from .routers import catalog_written, primary_pinned
+
+PIN_COOKIE = "urbano_pin_primary"
+
+
+# The middleware here subclasses MiddlewareMixin only for its sync/async
+# switch: under ASGI the chain stays async (see urbano/async_views.py)
+# instead of running every request through one worker thread.
+
+
+class ReplicaPinMiddleware(MiddlewareMixin):
+    """
+    Read-your-writes for the replica router: a browser that just changed
+    catalog rows keeps reading from the primary for REPLICA_PIN_SECONDS.
+    """
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        pinned = primary_pinned.set(PIN_COOKIE in request.COOKIES)
+        written = catalog_written.set(False)
+        try:
+            return self._pin(self.get_response(request))
+        finally:
+            primary_pinned.reset(pinned)
+            catalog_written.reset(written)
+
+    async def __acall__(self, request):
+        # the context vars are copied into (and back from) sync_to_async threads
+        pinned = primary_pinned.set(PIN_COOKIE in request.COOKIES)
+        written = catalog_written.set(False)
+        try:
+            return self._pin(await self.get_response(request))
+        finally:
+            primary_pinned.reset(pinned)
+            catalog_written.reset(written)
+
+    def _pin(self, response):
+        if catalog_written.get():
+            response.set_cookie(
+                PIN_COOKIE, "1",
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+
+def _timed_query(execute, sql, params, many, context):
+    stats = current_stats.get()
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if stats is not None:
+            stats.queries += 1
+            stats.db_time += time.perf_counter() - started
+
+
+def _install_timer(connection, **kwargs):
+    # stays on the connection; it only counts while a request's stats are set
+    if _timed_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_timed_query)
+
+
+def _install_timers():
+    for connection in connections.all():
+        _install_timer(connection)
+
+
+def _instrument_templates():
+    # Wrap the backend Template, not django.template.base.Template: includes
+    # call the latter, so only top-level renders are timed here.
+    from django.template.backends.django import Template
+
+    if getattr(Template.render, "instrumented", False):
+        return
+    original = Template.render
+
+    def render(self, context=None, request=None):
+        stats = current_stats.get()
+        if stats is None:
+            return original(self, context, request)
+        started = time.perf_counter()
+        try:
+            return original(self, context, request)
+        finally:
+            stats.template_time += time.perf_counter() - started
+
+    render.instrumented = True
+    Template.render = render
+
+
+class InstrumentationMiddleware(MiddlewareMixin):
+    """
+    Per-request SQL count/time, template time, cache hits and total latency,
+    aggregated per URL name in urbano.metrics.REGISTRY and sent back as a
+    Server-Timing header with SERVER_TIMING or to METRICS_ALLOWED_IPS. SQL
+    run while rendering counts towards both db and tpl.
+
+    Async views run their queries on sync_to_async threads, so the SQL
+    timer is installed on every connection as it is opened rather than
+    around the call; the stats reach those threads in a context var.
+    """
+
+    def __init__(self, get_response):
+        if not settings.INSTRUMENTATION_ENABLED:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        _instrument_templates()
+        connection_created.connect(_install_timer, dispatch_uid="urbano_timed_query")
+        self.installed = False
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        _install_timers()
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self._report(request, response, stats, started)
+
+    async def __acall__(self, request):
+        if not self.installed:
+            # connections the ORM thread opened before this middleware existed
+            await sync_to_async(_install_timers)()
+            self.installed = True
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self._report(request, response, stats, started)
+
+    def _report(self, request, response, stats, started):
+        total = time.perf_counter() - started
+
+        match = request.resolver_match
+        REGISTRY.record(match.view_name if match else "unresolved", total, stats)
+        # not request.user: that could cost a session query, and async views can't run it here
+        if not settings.SERVER_TIMING and request.META.get("REMOTE_ADDR") not in settings.METRICS_ALLOWED_IPS:
+            return response
+        response["Server-Timing"] = (
+            f'db;dur={stats.db_time * 1000:.2f};desc="{stats.queries} queries", '
+            f"tpl;dur={stats.template_time * 1000:.2f}, "
+            f'cache;desc="{stats.cache_hits} hits {stats.cache_misses} misses", '
+            f"total;dur={total * 1000:.2f}"
+        )
+        return response
+
+
+class SlowRequestProfilerMiddleware:
+    """
+    Opt-in (SLOW_REQUEST_PROFILING). Samples the stack of every request
+    and keeps the samples plus its SQL only for requests slower than
+    SLOW_REQUEST_THRESHOLD_MS, or a PROFILE_SAMPLE_RATE fraction of all.
+    Sync only: the sampler follows one thread, so under ASGI Django runs
+    it and the rest of the chain in a worker thread.
+    """
+
+    def __init__(self, get_response):
+        if not settings.SLOW_REQUEST_PROFILING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sampler = profiling.get_sampler()
+
+    def __call__(self, request):
+        queries = []
+        thread_id = threading.get_ident()
+        stacks = self.sampler.start(thread_id)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(partial(profiling.capture_query, queries)))
+                response = self.get_response(request)
+        finally:
+            self.sampler.stop(thread_id)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        rate = settings.PROFILE_SAMPLE_RATE
+        if elapsed_ms >= settings.SLOW_REQUEST_THRESHOLD_MS or (rate and random.random() < rate):
+            match = request.resolver_match
+            profiling.save(
+                match.view_name if match else "unresolved",
+                request.method, request.get_full_path(), elapsed_ms, stacks, queries,
+            )
+        return response
+
+
+class ClickstreamMiddleware(MiddlewareMixin):
+    """
+    Opt-in (EVENTS_ENABLED). Records product views and searches, including
+    the ones answered from the page cache or with a 304, since those never
+    reach the view. Cart adds are recorded by the cart views.
+    """
+
+    def __init__(self, get_response):
+        if not settings.EVENTS_ENABLED:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def process_response(self, request, response):
+        match = request.resolver_match
+        if match is None or request.method != "GET" or response.status_code not in (200, 304):
+            return response
+        if match.url_name in ("product_detail", "api_product"):
+            events.record_request(request, "view", slug=match.kwargs["slug"])
+        elif match.url_name in ("search", "api_search"):
+            query = request.GET.get("q", "").strip()
+            if query:
+                events.record_request(request, "search", query=query)
+        return response
+
+
+class PageCacheMiddleware(MiddlewareMixin):
+    """
+    Opt-in (PAGE_CACHE_SECONDS). Anonymous GETs of catalog pages are served
+    from cache without running the view; see urbano/pagecache.py. Sits
+    after the message middleware so holes can render flash messages, and
+    inside CSRF so a token handed out from a hole still sets its cookie.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PAGE_CACHE_SECONDS:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def process_response(self, request, response):
+        cache_key = getattr(request, "page_cache_key", None)
+        if cache_key and not response.streaming and response.get("Content-Type", "").startswith("text/html"):
+            content = response.content.decode(response.charset)
+            if response.status_code == 200:
+                pagecache.store(cache_key, content)
+            response.content = pagecache.punch(request, content)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not pagecache.cacheable(request):
+            return None
+        cache_key = pagecache.key(request)
+        content = cache.get(cache_key)
+        note_cache(content is not None)
+        if content is None:
+            request.page_cache_key = cache_key
+            request.page_cache_fill = True
+            return None
+        response = HttpResponse(pagecache.punch(request, content))
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+class RateLimitMiddleware(MiddlewareMixin):
+    """
+    Opt-in (RATE_LIMITS). A token bucket per client IP, and one per user
+    once logged in, for each URL name in RATE_LIMITS; see
+    urbano/ratelimit.py. Checked in process_view, so a refused request is
+    answered 429 before the view, the page cache or any query runs; the
+    session is only read once the IP's bucket has let the request through.
+    Behind a proxy, REMOTE_ADDR must be set to the client address.
+    """
+
+    def __init__(self, get_response):
+        if not settings.RATE_LIMITS:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        name = request.resolver_match.url_name
+        limit = settings.RATE_LIMITS.get(name)
+        if limit is None:
+            return None
+        burst, rate = limit
+        # the IP first, so a flood is refused without loading its session
+        wait = ratelimit.take(f"{name}:ip:{request.META.get('REMOTE_ADDR', '')}", burst, rate)
+        if not wait:
+            # the view loads the session anyway; the user row isn't needed
+            user_id = request.session.get(SESSION_KEY)
+            if user_id:
+                wait = ratelimit.take(f"{name}:user:{user_id}", burst, rate)
+        if not wait:
+            return None
+        message = "Too many requests, please try again shortly."
+        if name.startswith("api_"):
+            response = JsonResponse({"error": message}, status=429)
+        else:
+            response = HttpResponse(message, status=429, content_type="text/plain")
+        response["Retry-After"] = str(math.ceil(wait))
+        return response
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:28
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('urbano', '0002_catalog_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='productimage',
+            options={'ordering': ['id']},
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:52
+
+import datetime
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('urbano', '0005_bought_together'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankingState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('epoch', models.DateTimeField()),
+                ('last_product_id', models.PositiveBigIntegerField(default=0)),
+                ('last_item_id', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='created_at',
+            # existing products are not new arrivals
+            field=models.DateTimeField(auto_now_add=True, default=datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc)),
+            preserve_default=False,
+        ),
+        migrations.CreateModel(
+            name='ProductRank',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('feed', models.CharField(choices=[('best_sellers', 'Best sellers'), ('trending', 'Trending'), ('new_arrivals', 'New arrivals')], max_length=20)),
+                ('score', models.FloatField(default=0)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='urbano.category')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rankings', to='urbano.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['feed', '-score'], name='productrank_feed_score_idx'), models.Index(fields=['feed', 'category', '-score'], name='productrank_category_idx')],
+                'constraints': [models.UniqueConstraint(fields=('feed', 'product'), name='productrank_feed_product_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.8 on 2026-10-19 13:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def split_sizes(apps, schema_editor):
+    Product = apps.get_model("urbano", "Product")
+    ProductVariant = apps.get_model("urbano", "ProductVariant")
+    variants = []
+    for product_id, sizes in Product.objects.exclude(sizes=None).exclude(sizes="").values_list("id", "sizes").iterator():
+        # dict keeps the first of any repeated size, in order
+        names = dict.fromkeys(s.strip()[:10] for s in sizes.split(",") if s.strip())
+        variants += [
+            ProductVariant(product_id=product_id, size=size, position=n) for n, size in enumerate(names)
+        ]
+    ProductVariant.objects.bulk_create(variants, batch_size=5000)
+
+
+def join_sizes(apps, schema_editor):
+    Product = apps.get_model("urbano", "Product")
+    ProductVariant = apps.get_model("urbano", "ProductVariant")
+    sizes = {}
+    for product_id, size in ProductVariant.objects.order_by("product_id", "position", "id").values_list("product_id", "size"):
+        sizes.setdefault(product_id, []).append(size)
+    for product_id, names in sizes.items():
+        Product.objects.filter(pk=product_id).update(sizes=",".join(names)[:200])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('urbano', '0007_clickstream'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductVariant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('size', models.CharField(max_length=10)),
+                ('position', models.PositiveSmallIntegerField(default=0)),
+                ('price', models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True)),
+                ('stock', models.PositiveIntegerField(blank=True, null=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='variants', to='urbano.product')),
+            ],
+            options={
+                'ordering': ['position', 'id'],
+                'indexes': [models.Index(fields=['size', 'stock', 'product'], name='variant_size_stock_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'size'), name='variant_product_size_uniq')],
+            },
+        ),
+        migrations.RunPython(split_sizes, join_sizes),
+        migrations.RemoveField(
+            model_name='product',
+            name='sizes',
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-19 14:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('urbano', '0009_sweeper'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PincodeRange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.PositiveIntegerField(unique=True)),
+                ('end', models.PositiveIntegerField()),
+                ('zone', models.CharField(max_length=50)),
+                ('standard_days', models.PositiveSmallIntegerField()),
+                ('express_days', models.PositiveSmallIntegerField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['start'],
+            },
+        ),
+    ]
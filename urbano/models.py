@@ -2,11 +2,16 @@ from django.db import models
 from django.urls import reverse
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
 from decimal import Decimal
 
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     slug = models.SlugField(unique=True)
+    # bumped whenever the category or any of its products/images change;
+    # listing pages derive their ETag from it (see urbano/conditional.py)
+    generation = models.PositiveIntegerField(default=0, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name_plural = "Categories"
@@ -18,7 +23,6 @@ class Category(models.Model):
 class Product(models.Model):
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name="products", null=True, blank=True)
     title = models.CharField(max_length=200)
-    sizes = models.CharField(max_length=200, blank=True, null=True)
     price = models.DecimalField(max_digits=8, decimal_places=2)
     brand = models.CharField(max_length=100, blank=True, null=True)
     old_price = models.DecimalField(max_digits=8, decimal_places=2, blank=True, null=True)
@@ -37,7 +41,22 @@ class Product(models.Model):
     )
     is_best_seller = models.BooleanField(default=False)
     is_featured = models.BooleanField(default=False)
-    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # matched to the listing views' filters and price sorting
+        indexes = [
+            models.Index(fields=["category", "price"], name="product_category_price_idx"),
+            models.Index(fields=["tag", "price"], name="product_tag_price_idx"),
+            # partial: the flags are sparse and filtered as bare booleans
+            models.Index(fields=["price"], condition=models.Q(is_best_seller=True), name="product_bestseller_price_idx"),
+            models.Index(fields=["price"], condition=models.Q(is_featured=True), name="product_featured_price_idx"),
+            models.Index(fields=["old_price"], name="product_old_price_idx"),
+            models.Index(fields=["price"], name="product_price_idx"),
+            models.Index(fields=["brand"], name="product_brand_idx"),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -49,7 +68,15 @@ class Product(models.Model):
 
     @property
     def size_list(self):
-        return [s.strip() for s in (self.sizes or "").split(",") if s.strip()]
+        """Sizes that can be ordered now; prefetch ``variants`` when listing."""
+        return [variant.size for variant in self.variants.all() if variant.in_stock]
+
+    def variant(self, size):
+        return next((variant for variant in self.variants.all() if variant.size == size), None)
+
+    def price_for(self, size):
+        variant = self.variant(size) if size else None
+        return variant.price if variant and variant.price is not None else self.price
 
     def get_absolute_url(self):
         return reverse("product_detail", kwargs={"slug": self.slug})
@@ -58,20 +85,62 @@ class ProductImage(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='images')
     image = models.ImageField(upload_to='products/multiple/')
 
+    class Meta:
+        # ordered so images.first in templates is served from a prefetch
+        ordering = ["id"]
+
     def __str__(self):
         return f"{self.product.title} Image"
 
+class ProductVariant(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="variants")
+    size = models.CharField(max_length=10)
+    position = models.PositiveSmallIntegerField(default=0)
+    # overrides Product.price when set
+    price = models.DecimalField(max_digits=8, decimal_places=2, blank=True, null=True)
+    # None when stock isn't tracked for this size; it's always available
+    stock = models.PositiveIntegerField(blank=True, null=True)
+
+    class Meta:
+        ordering = ["position", "id"]
+        constraints = [
+            models.UniqueConstraint(fields=["product", "size"], name="variant_product_size_uniq"),
+        ]
+        indexes = [
+            # "size=M in stock" listing filters, answered from the index alone
+            models.Index(fields=["size", "stock", "product"], name="variant_size_stock_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.product.title} ({self.size})"
+
+    @property
+    def in_stock(self):
+        return self.stock is None or self.stock > 0
+
+
+def in_stock_size(size):
+    """Products with ``size`` in stock, joined on variant_size_stock_idx."""
+    # one Q, so both conditions apply to the same variant row
+    return models.Q(variants__size=size) & (models.Q(variants__stock__isnull=True) | models.Q(variants__stock__gt=0))
+
 class CartItem(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     size = models.CharField(max_length=10, null=True, blank=True)
     quantity = models.PositiveIntegerField(default=0)
+    # the sweeper drops carts nobody has touched in a while
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         unique_together = ('user', 'product', 'size')  # ensures unique per user/product/size
 
     def __str__(self):
         return f"{self.user.username} - {self.product.title} ({self.size}) x {self.quantity}"
+
+    @property
+    def unit_price(self):
+        return self.product.price_for(self.size)
     
 # ---- Order models ----
 class Order(models.Model):
@@ -108,10 +177,35 @@ class Order(models.Model):
     cancelled_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # my_orders: filter by user, newest first
+        indexes = [
+            models.Index(fields=["user", "-created_at"], name="order_user_created_idx"),
+        ]
+
     def __str__(self):
         return f"Order {self.id} by {self.user}"
 
 
+# the checkout form posts "cod"; COD is the choice's own value
+COD_METHODS = ("cod", "COD")
+
+
+def paid_or_cod(prefix=""):
+    """
+    Orders that are real sales so far: paid, or cash on delivery. A Razorpay
+    order nobody paid for is still pending or was abandoned; status stays
+    "Placed" either way. ``prefix`` reaches an order through a relation,
+    e.g. "order__".
+    """
+    return models.Q(**{f"{prefix}is_paid": True}) | models.Q(**{f"{prefix}payment_method__in": COD_METHODS})
+
+
+def counted_sale(prefix=""):
+    """Orders that rankings and recommendations count: paid_or_cod() and not cancelled."""
+    return paid_or_cod(prefix) & models.Q(**{f"{prefix}is_cancelled": False})
+
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, related_name="items", on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
@@ -135,6 +229,155 @@ class ContactMessage(models.Model):
         return f"Message from {self.name} ({self.email})"
 
 
+class CoPurchase(models.Model):
+    """How many counted orders held both products. Stored in both directions."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="+")
+    other = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="+")
+    orders = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["product", "other"], name="copurchase_pair_uniq"),
+        ]
 
 
+class BoughtTogether(models.Model):
+    """Top CoPurchase neighbours of each product, rebuilt by urbano.recommendations."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="bought_together")
+    other = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="+")
+    rank = models.PositiveSmallIntegerField()
+    orders = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ["product", "rank"]
+        constraints = [
+            models.UniqueConstraint(fields=["product", "rank"], name="boughttogether_rank_uniq"),
+        ]
 
+
+class CoPurchaseRun(models.Model):
+    """One build_recommendations run over orders (start_order_id, last_order_id]."""
+    start_order_id = models.PositiveBigIntegerField()
+    last_order_id = models.PositiveBigIntegerField()
+    orders = models.PositiveIntegerField(default=0)
+    pairs = models.PositiveIntegerField(default=0)
+    started_at = models.DateTimeField(auto_now_add=True)
+    # null until the run's top-K lists are rebuilt
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+
+class SweepRun(models.Model):
+    """One urbano.sweeper run: rows removed per kind and how far through Order it got."""
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    carts = models.PositiveIntegerField(default=0)
+    sessions = models.PositiveIntegerField(default=0)
+    orders = models.PositiveIntegerField(default=0)
+    # orders up to here were checked; the next run starts after it
+    last_order_id = models.PositiveBigIntegerField(default=0)
+
+
+class PincodeRange(models.Model):
+    """Pincodes start..end (inclusive) we deliver to; see urbano.serviceability."""
+    start = models.PositiveIntegerField(unique=True)
+    end = models.PositiveIntegerField()
+    zone = models.CharField(max_length=50)
+    standard_days = models.PositiveSmallIntegerField()
+    # no express delivery to these pincodes when null
+    express_days = models.PositiveSmallIntegerField(null=True, blank=True)
+
+    # six digits, no leading zero
+    FIRST, LAST = 100000, 999999
+
+    class Meta:
+        ordering = ["start"]
+
+    def __str__(self):
+        return f"{self.start}-{self.end} {self.zone}"
+
+    def clean(self):
+        # the lookup bisects on start, so ranges must not overlap; parse() checks imports the same way
+        if self.start is None or self.end is None:
+            return
+        if not self.FIRST <= self.start <= self.end <= self.LAST:
+            raise ValidationError(f"{self.start}-{self.end} is not a pincode range")
+        other = (
+            PincodeRange.objects.filter(start__lte=self.end, end__gte=self.start)
+            .exclude(pk=self.pk).order_by("start").first()
+        )
+        if other is not None:
+            raise ValidationError(f"ranges {self.start}-{self.end} and {other.start}-{other.end} overlap")
+
+
+class ProductRank(models.Model):
+    """A product's score in one ranked feed; see urbano.rankings."""
+    FEEDS = (
+        ("best_sellers", "Best sellers"),
+        ("trending", "Trending"),
+        ("new_arrivals", "New arrivals"),
+    )
+
+    feed = models.CharField(max_length=20, choices=FEEDS)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="rankings")
+    # copy of product.category so a category's feed is one index walk
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, null=True, blank=True, related_name="+")
+    score = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["feed", "product"], name="productrank_feed_product_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["feed", "-score"], name="productrank_feed_score_idx"),
+            models.Index(fields=["feed", "category", "-score"], name="productrank_category_idx"),
+        ]
+
+
+class RankingState(models.Model):
+    """Single row: how far urbano.rankings has read and the epoch its scores are relative to."""
+    epoch = models.DateTimeField()
+    last_product_id = models.PositiveBigIntegerField(default=0)
+    last_item_id = models.PositiveBigIntegerField(default=0)
+    last_event_id = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class ClickEvent(models.Model):
+    """Raw clickstream, written in batches by urbano.events and rolled up by compact_events."""
+    KINDS = (
+        ("view", "Product view"),
+        ("search", "Search"),
+        ("cart", "Add to cart"),
+    )
+
+    kind = models.CharField(max_length=10, choices=KINDS)
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    query = models.CharField(max_length=200, blank=True)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    session_key = models.CharField(max_length=40, blank=True)
+    # when it happened, not when the buffer was written
+    created_at = models.DateTimeField(db_index=True)
+
+
+class DailyProductEvents(models.Model):
+    day = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="+")
+    views = models.PositiveIntegerField(default=0)
+    viewers = models.PositiveIntegerField(default=0)  # distinct sessions
+    cart_adds = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["day", "product"], name="dailyproductevents_day_product_uniq"),
+        ]
+
+
+class DailySearch(models.Model):
+    day = models.DateField()
+    query = models.CharField(max_length=200)  # lower-cased
+    searches = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["day", "query"], name="dailysearch_day_query_uniq"),
+        ]
@@ -0,0 +1,101 @@
+"""
+Full-page cache for anonymous catalog pages.
+
+The first anonymous GET of a catalog URL runs the view with
+``request.page_cache_fill`` set, so every ``{% hole %}`` in the templates
+renders as a marker and CSRF token values are swapped for one too. That
+body is cached; later anonymous GETs of the same URL skip the view and
+only render the holes (flash messages, session cart count, CSRF token)
+for the visitor at hand.
+
+Logged-in visitors always get a fresh render: their header differs in
+more places than is worth punching holes for.
+
+Cached bodies are keyed by a catalog version that bump_categories()
+replaces whenever products, images or categories change, so a catalog
+edit retires every cached page at once.
+"""
+
+import hashlib
+import re
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+
+# the views decorated with catalog_condition in urbano/views.py
+PAGE_CACHE_URLS = frozenset({
+    "home",
+    "categories",
+    "category_products",
+    "product_detail",
+    "best_sellers",
+    "new_arrivals",
+    "on_sale",
+    "summer_edit",
+    "workspace",
+    "gifts",
+    "featured_product",
+    "search",
+})
+
+VERSION_KEY = "pagecache:version"
+CSRF_HOLE = "csrf"
+HOLE = re.compile(r"<!--hole:([\w./-]+)-->")
+CSRF_INPUT = re.compile(r'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+
+
+def hole_marker(name):
+    return f"<!--hole:{name}-->"
+
+
+def cacheable(request):
+    match = request.resolver_match
+    return (
+        request.method in ("GET", "HEAD")
+        and match is not None
+        and match.url_name in PAGE_CACHE_URLS
+        and not request.user.is_authenticated
+    )
+
+
+def version():
+    current = cache.get(VERSION_KEY)
+    if current is None:
+        # evicted or never set: start a fresh namespace rather than reuse one
+        cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+        current = cache.get(VERSION_KEY)
+    return current
+
+
+def invalidate():
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def key(request):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f"pagecache:{version()}:{path}"
+
+
+def store(cache_key, content):
+    """Cache a page rendered with holes, CSRF tokens included."""
+    content = CSRF_INPUT.sub(rf"\g<1>{hole_marker(CSRF_HOLE)}\g<2>", content)
+    cache.set(cache_key, content, settings.PAGE_CACHE_SECONDS)
+
+
+def punch(request, content):
+    """Fill every hole in ``content`` for this visitor."""
+    fragments = {}
+
+    def fill(match):
+        name = match.group(1)
+        if name not in fragments:
+            if name == CSRF_HOLE:
+                fragments[name] = get_token(request)
+            else:
+                fragments[name] = render_to_string(name, request=request)
+        return fragments[name]
+
+    return HOLE.sub(fill, content)
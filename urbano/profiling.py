@@ -0,0 +1,154 @@
+"""
+Sampling profiler for slow requests.
+
+One background thread wakes every PROFILE_INTERVAL_MS and records the
+stack of each thread currently serving a request. When a request ends
+past SLOW_REQUEST_THRESHOLD_MS (or is picked by PROFILE_SAMPLE_RATE) its
+stacks and SQL are written to PROFILE_DIR; otherwise they are dropped.
+A fast request only pays for registering itself and logging its queries.
+
+Files come in pairs sharing a name:
+  <name>.collapsed  "frame;frame;frame count" lines (flamegraph.pl, speedscope)
+  <name>.sql        every query with its duration
+"""
+
+import os
+import queue
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from functools import lru_cache
+
+from django.conf import settings
+
+
+@lru_cache(maxsize=4096)
+def _frame_label(code):
+    path = code.co_filename
+    for marker in ("site-packages" + os.sep, str(settings.BASE_DIR) + os.sep):
+        if marker in path:
+            path = path.split(marker, 1)[1]
+            break
+    return f"{code.co_name} ({path}:{code.co_firstlineno})"
+
+
+class Sampler:
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._active = {}  # thread id -> Counter of collapsed stacks
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self, thread_id):
+        stacks = Counter()
+        with self._lock:
+            self._active[thread_id] = stacks
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="urbano-sampler", daemon=True)
+                self._thread.start()
+        return stacks
+
+    def stop(self, thread_id):
+        with self._lock:
+            self._active.pop(thread_id, None)
+
+    def _run(self):
+        own = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    continue
+                frames = sys._current_frames()
+                for thread_id, stacks in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is None or thread_id == own:
+                        continue
+                    labels = []
+                    while frame is not None:
+                        labels.append(_frame_label(frame.f_code))
+                        frame = frame.f_back
+                    labels.reverse()
+                    stacks[";".join(labels)] += 1
+
+
+def capture_query(queries, execute, sql, params, many, context):
+    """execute_wrapper that keeps (sql, params, seconds); bind ``queries`` with partial()."""
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        queries.append((sql, params, time.perf_counter() - started))
+
+
+_sampler = None
+_sampler_lock = threading.Lock()
+_pending = queue.Queue()
+_writer = None
+
+
+def get_sampler():
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = Sampler(settings.PROFILE_INTERVAL_MS / 1000)
+        return _sampler
+
+
+def save(view, method, path, elapsed_ms, stacks, queries):
+    """Queue a profile for the writer thread; the request doesn't wait on disk."""
+    global _writer
+    _pending.put((datetime.now(), view, method, path, elapsed_ms, dict(stacks), list(queries)))
+    with _sampler_lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_write_forever, name="urbano-profile-writer", daemon=True)
+            _writer.start()
+
+
+def flush():
+    """Block until every queued profile is on disk."""
+    _pending.join()
+
+
+def _write_forever():
+    while True:
+        item = _pending.get()
+        try:
+            _write(*item)
+        finally:
+            _pending.task_done()
+
+
+def _write(when, view, method, path, elapsed_ms, stacks, queries):
+    directory = settings.PROFILE_DIR
+    os.makedirs(directory, exist_ok=True)
+    safe_view = re.sub(r"[^\w.-]+", "_", view)
+    name = f"{when:%Y%m%d-%H%M%S-%f}-{safe_view}-{elapsed_ms:.0f}ms"
+
+    with open(os.path.join(directory, name + ".collapsed"), "w") as fh:
+        for stack, count in sorted(stacks.items()):
+            fh.write(f"{stack} {count}\n")
+
+    with open(os.path.join(directory, name + ".sql"), "w") as fh:
+        db_ms = sum(seconds for _, _, seconds in queries) * 1000
+        fh.write(f"-- {method} {path}\n")
+        fh.write(f"-- {elapsed_ms:.1f} ms total, {len(queries)} queries, {db_ms:.1f} ms in SQL\n\n")
+        for sql, params, seconds in queries:
+            fh.write(f"-- {seconds * 1000:.2f} ms  params={params!r}\n{sql};\n\n")
+
+    _rotate(directory, settings.PROFILE_KEEP)
+
+
+def _rotate(directory, keep):
+    # names start with a timestamp, so sorted order is oldest first
+    names = sorted({f.rsplit(".", 1)[0] for f in os.listdir(directory) if f.endswith((".collapsed", ".sql"))})
+    for old in names[:-keep] if keep else names:
+        for suffix in (".collapsed", ".sql"):
+            try:
+                os.remove(os.path.join(directory, old + suffix))
+            except FileNotFoundError:
+                pass
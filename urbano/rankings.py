@@ -0,0 +1,222 @@
+"""
+Sales-ranked product feeds.
+
+ProductRank keeps one score per (feed, product). Every sale, cart add or
+view credits  weight * 2 ** ((when - epoch) / half_life)  to each feed that
+weighs that kind of event, with the epoch fixed in RankingState. Decaying
+all scores by the same factor never changes their order, so a run leaves
+old rows alone and only adds credit for what happened since the last run.
+Once the factors get large, rebase() decays everything once and moves the
+epoch to now.
+
+A sale is a line of a paid or cash on delivery order (models.counted_sale).
+An unpaid Razorpay order holds the walk over order lines for up to
+SETTLE_MINUTES, so a payment that lands in time is still credited and an
+abandoned basket never is.
+
+  best_sellers  units sold, two-week half-life
+  trending      units sold plus cart adds and views (urbano.events),
+                two-day half-life
+  new_arrivals  products listed in the last NEW_ARRIVAL_DAYS; being listed
+                is worth LISTING_CREDIT sales so new products start high
+
+Pages read a feed with ranked(): one walk of the (feed, category, score)
+index for the ids, then the products by primary key. Until update_rankings
+has scored anything in a feed, ranked() falls back to what the pages showed
+before: the admin's is_best_seller picks, or the newest products.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+from itertools import takewhile
+
+from django.db import connection, transaction
+from django.db.models import BooleanField, Case, ExpressionWrapper, F, OuterRef, Subquery, When
+from django.utils import timezone
+
+from .conditional import bump_categories
+from .models import Category, ClickEvent, OrderItem, Product, ProductRank, RankingState, counted_sale
+
+LISTING_CREDIT = 5.0
+FEEDS = {
+    "best_sellers": {"half_life_days": 14, "weights": {"sale": 1.0}},
+    "trending": {"half_life_days": 2, "weights": {"sale": 1.0, "cart": 0.25, "view": 0.02}},
+    "new_arrivals": {
+        "half_life_days": 7,
+        "weights": {"listed": LISTING_CREDIT, "sale": 1.0, "cart": 0.25, "view": 0.02},
+    },
+}
+NEW_ARRIVAL_DAYS = 30
+FEED_SIZE = 48
+# how long an unpaid Razorpay order may still be paid for
+SETTLE_MINUTES = 60
+# 2 ** (30 / 2) is the largest factor trending reaches before a rebase
+REBASE_AFTER = timedelta(days=30)
+# scores this small after a rebase are dropped
+PRUNE_BELOW = 1e-3
+
+
+def _fallback(feed, category):
+    products = Product.objects.all() if category is None else Product.objects.filter(category=category)
+    if feed == "new_arrivals":
+        return products.order_by("-id")
+    # off the is_best_seller partial index
+    return products.filter(is_best_seller=True).order_by("-price")
+
+
+def ranked(feed, category=None, limit=FEED_SIZE):
+    """The top ``limit`` products of ``feed``, best first, as a filterable queryset."""
+    ranks = ProductRank.objects.filter(feed=feed)
+    if category is not None:
+        ranks = ranks.filter(category=category)
+    ids = list(ranks.order_by("-score").values_list("product_id", flat=True)[:limit])
+    if not ids:
+        ids = list(_fallback(feed, category).values_list("id", flat=True)[:limit])
+    position = Case(*[When(id=product_id, then=n) for n, product_id in enumerate(ids)])
+    return Product.objects.filter(id__in=ids).order_by(position)
+
+
+def top_per_category(feed, category_ids):
+    """{category id: its top product in ``feed``}, one index seek per category."""
+    top = ProductRank.objects.filter(feed=feed, category=OuterRef("pk")).order_by("-score").values("product_id")[:1]
+    top_ids = dict(
+        Category.objects.filter(pk__in=category_ids).annotate(top_id=Subquery(top)).values_list("pk", "top_id")
+    )
+    products = Product.objects.prefetch_related("images").in_bulk([pk for pk in top_ids.values() if pk])
+    return {category_id: products[pk] for category_id, pk in top_ids.items() if pk in products}
+
+
+def load_state():
+    state, _ = RankingState.objects.get_or_create(pk=1, defaults={"epoch": timezone.now()})
+    return state
+
+
+def _upsert(scores):
+    """Add {(feed, product_id): (category_id, score)} to ProductRank."""
+    table = connection.ops.quote_name(ProductRank._meta.db_table)
+    sql = (
+        f"INSERT INTO {table} (feed, product_id, category_id, score) VALUES (%s, %s, %s, %s) "
+        f"ON CONFLICT (feed, product_id) DO UPDATE SET "
+        f"score = {table}.score + excluded.score, category_id = excluded.category_id"
+    )
+    rows = [(feed, product_id, category_id, score) for (feed, product_id), (category_id, score) in scores.items()]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def credit(events, epoch):
+    """Credit (kind, product_id, amount, when) events to every feed that weighs ``kind``."""
+    events = list(events)
+    products = {
+        product_id: (category_id, created_at)
+        for product_id, category_id, created_at in Product.objects.filter(
+            id__in={product_id for _, product_id, _, _ in events}
+        ).values_list("id", "category_id", "created_at")
+    }
+    new_since = timezone.now() - timedelta(days=NEW_ARRIVAL_DAYS)
+    scores = defaultdict(lambda: [None, 0.0])
+    for kind, product_id, amount, when in events:
+        if product_id not in products:
+            continue
+        category_id, created_at = products[product_id]
+        age_days = (when - epoch).total_seconds() / 86400
+        for feed, spec in FEEDS.items():
+            weight = spec["weights"].get(kind)
+            if not weight or (feed == "new_arrivals" and created_at < new_since):
+                continue
+            entry = scores[feed, product_id]
+            entry[0] = category_id
+            entry[1] += weight * amount * 2 ** (age_days / spec["half_life_days"])
+    _upsert(scores)
+    return len(scores)
+
+
+def rebase(state, now):
+    """Decay every score to ``now`` and make it the new epoch."""
+    days = (now - state.epoch).total_seconds() / 86400
+    with transaction.atomic():
+        for feed, spec in FEEDS.items():
+            factor = 2 ** (-days / spec["half_life_days"])
+            ProductRank.objects.filter(feed=feed).update(score=F("score") * factor)
+        ProductRank.objects.filter(score__lt=PRUNE_BELOW).delete()
+        state.epoch = now
+        state.save(update_fields=["epoch", "updated_at"])
+
+
+def update(batch_size=5000, log=None):
+    """Fold products, order lines and click events added since the last run into the feeds."""
+    log = log or (lambda message: None)
+    state = load_state()
+    now = timezone.now()
+    if now - state.epoch > REBASE_AFTER:
+        rebase(state, now)
+        log(f"rebased scores to {now:%Y-%m-%d %H:%M}")
+    credited = {"listed": 0, "sales": 0, "clicks": 0}
+
+    while True:
+        batch = list(
+            Product.objects.filter(id__gt=state.last_product_id).order_by("id")
+            .values_list("id", "created_at")[:batch_size]
+        )
+        if not batch:
+            break
+        with transaction.atomic():
+            credit((("listed", product_id, 1, created_at) for product_id, created_at in batch), state.epoch)
+            state.last_product_id = batch[-1][0]
+            state.save(update_fields=["last_product_id", "updated_at"])
+        credited["listed"] += len(batch)
+        log(f"products up to {state.last_product_id}")
+
+    settled_before = now - timedelta(minutes=SETTLE_MINUTES)
+    while True:
+        batch = list(
+            OrderItem.objects.filter(id__gt=state.last_item_id).order_by("id")
+            .annotate(counted=ExpressionWrapper(counted_sale("order__"), output_field=BooleanField()))
+            .values_list("id", "product_id", "quantity", "order__created_at", "counted", "order__is_cancelled")
+            [:batch_size]
+        )
+        # a line waiting on its payment holds the walk, or a later payment would never be credited
+        batch = list(takewhile(
+            lambda line: line[4] or line[5] or line[3] < settled_before, batch,
+        ))
+        if not batch:
+            break
+        sales = [
+            ("sale", product_id, quantity, created_at)
+            for _, product_id, quantity, created_at, counted, _ in batch if counted
+        ]
+        with transaction.atomic():
+            credit(sales, state.epoch)
+            state.last_item_id = batch[-1][0]
+            state.save(update_fields=["last_item_id", "updated_at"])
+        credited["sales"] += len(sales)
+        log(f"order lines up to {state.last_item_id}")
+
+    while True:
+        batch = list(
+            ClickEvent.objects.filter(id__gt=state.last_event_id).order_by("id")
+            .values_list("id", "kind", "product_id", "created_at")[:batch_size]
+        )
+        if not batch:
+            break
+        clicks = [(kind, product_id, 1, created_at) for _, kind, product_id, created_at in batch if product_id]
+        with transaction.atomic():
+            credit(clicks, state.epoch)
+            state.last_event_id = batch[-1][0]
+            state.save(update_fields=["last_event_id", "updated_at"])
+        credited["clicks"] += len(clicks)
+        log(f"events up to {state.last_event_id}")
+
+    aged_out = ProductRank.objects.filter(
+        feed="new_arrivals", product__created_at__lt=now - timedelta(days=NEW_ARRIVAL_DAYS),
+    ).delete()[0]
+    if any(credited.values()) or aged_out:
+        # listing pages are served from ETags and the page cache
+        bump_categories()
+    return dict(credited, aged_out=aged_out)
+
+
+def reset():
+    with transaction.atomic():
+        ProductRank.objects.all().delete()
+        RankingState.objects.all().delete()
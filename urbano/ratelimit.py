@@ -0,0 +1,63 @@
+"""
+Token buckets for RateLimitMiddleware.
+
+A bucket holds up to ``burst`` tokens and refills at ``rate`` tokens per
+second; every request takes one and a request finding it empty is refused.
+A bucket is (tokens, updated) under one cache key, so with Redis every
+worker shares a client's buckets. Reading and writing it isn't atomic: two
+workers racing on one bucket can both take its last token, which lets a
+client slightly over the limit and never blocks one wrongly.
+
+If the cache can't be reached the buckets are kept in this process, so
+each worker still enforces the limit on its own share of the traffic.
+"""
+
+import logging
+import math
+import threading
+import time
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# past this many local buckets start over; an idle bucket is full anyway
+LOCAL_MAX = 100_000
+
+_local = {}
+_local_lock = threading.Lock()
+
+
+def _refill(state, burst, rate, now):
+    if state is None:
+        return burst
+    tokens, updated = state
+    return min(burst, tokens + (now - updated) * rate)
+
+
+def _take_local(key, burst, rate, now):
+    with _local_lock:
+        tokens = _refill(_local.get(key), burst, rate, now)
+        if tokens < 1:
+            return (1 - tokens) / rate
+        if len(_local) >= LOCAL_MAX:
+            _local.clear()
+        _local[key] = (tokens - 1, now)
+        return 0
+
+
+def take(key, burst, rate, now=None):
+    """Take a token from bucket ``key``: 0 if granted, else seconds until one is free."""
+    now = time.time() if now is None else now
+    key = f"ratelimit:{key}"
+    try:
+        tokens = _refill(cache.get(key), burst, rate, now)
+        if tokens < 1:
+            # refused requests leave the bucket as it was: no write under a flood
+            return (1 - tokens) / rate
+        # expires once it would have refilled completely
+        cache.set(key, (tokens - 1, now), math.ceil(burst / rate) + 1)
+        return 0
+    except Exception:
+        logger.warning("rate limit cache unavailable, using in-process buckets", exc_info=True)
+        return _take_local(key, burst, rate, now)
@@ -0,0 +1,191 @@
+"""
+"Frequently bought together" from order co-occurrence.
+
+build() walks orders in id order, a batch at a time, and adds one to
+CoPurchase(a, b) and CoPurchase(b, a) for every pair of distinct products
+in a paid or cash on delivery order (models.counted_sale). Only the pairs
+of one batch are held in memory, and counts are added in the database with
+an upsert, so a run covers any number of order lines. Each run starts after
+the last order the previous one reached, so repeated runs are incremental;
+the newest orders are left alone for ``settle_minutes`` so a Razorpay order
+has time to be paid, and one still unpaid after that counts as abandoned.
+
+When the counts are in, BoughtTogether is rebuilt with the TOP_K best
+neighbours of every product the run touched. Pages read it through
+for_product()/for_cart(), which cache small product cards.
+
+Orders cancelled after they were counted stay counted; ``--rebuild``
+starts over from scratch.
+"""
+
+from collections import Counter, defaultdict
+from datetime import timedelta
+from itertools import combinations
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import BooleanField, ExpressionWrapper, F, Max, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from . import pagecache
+from .metrics import note_cache
+from .models import BoughtTogether, CoPurchase, CoPurchaseRun, Order, OrderItem, Product, counted_sale
+
+TOP_K = 8
+# a bulk order of 500 products would add 125k pairs and say little
+MAX_ITEMS_PER_ORDER = 50
+CACHE_SECONDS = 60 * 60
+
+
+def _add_pairs(counts):
+    table = connection.ops.quote_name(CoPurchase._meta.db_table)
+    sql = (
+        f"INSERT INTO {table} (product_id, other_id, orders) VALUES (%s, %s, %s) "
+        f"ON CONFLICT (product_id, other_id) DO UPDATE SET orders = {table}.orders + excluded.orders"
+    )
+    rows = []
+    for (a, b), n in counts.items():
+        rows.append((a, b, n))
+        rows.append((b, a, n))
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def _refresh_top_k(product_ids, top_k, chunk_size=500):
+    product_ids = sorted(product_ids)
+    for start in range(0, len(product_ids), chunk_size):
+        chunk = product_ids[start:start + chunk_size]
+        ranked = (
+            CoPurchase.objects.filter(product_id__in=chunk)
+            .annotate(rank=Window(
+                RowNumber(),
+                partition_by=F("product_id"),
+                order_by=[F("orders").desc(), F("other_id").asc()],
+            ))
+            .filter(rank__lte=top_k)
+            .values_list("product_id", "other_id", "orders", "rank")
+        )
+        with transaction.atomic():
+            BoughtTogether.objects.filter(product_id__in=chunk).delete()
+            BoughtTogether.objects.bulk_create(
+                BoughtTogether(product_id=product, other_id=other, orders=orders, rank=rank)
+                for product, other, orders, rank in ranked
+            )
+            # product pages show the list, so their ETags must move
+            Product.objects.filter(id__in=chunk).update(updated_at=timezone.now())
+
+
+def _products_in_orders(start, end):
+    return set(
+        OrderItem.objects.filter(order_id__gt=start, order_id__lte=end)
+        .values_list("product_id", flat=True).distinct()
+    )
+
+
+def build(batch_size=1000, settle_minutes=60, top_k=TOP_K, rebuild=False, log=None):
+    """Count co-purchases in orders not seen yet and refresh the top-K lists."""
+    log = log or (lambda message: None)
+    if rebuild:
+        with transaction.atomic():
+            CoPurchase.objects.all().delete()
+            BoughtTogether.objects.all().delete()
+            CoPurchaseRun.objects.all().delete()
+
+    touched = set()
+    # a run that died before its top-K step left lists behind its counts
+    for run in CoPurchaseRun.objects.filter(finished_at__isnull=True):
+        touched |= _products_in_orders(run.start_order_id, run.last_order_id)
+
+    last = CoPurchaseRun.objects.aggregate(last=Max("last_order_id"))["last"] or 0
+    cutoff = timezone.now() - timedelta(minutes=settle_minutes)
+    end = Order.objects.filter(id__gt=last, created_at__lte=cutoff).aggregate(end=Max("id"))["end"]
+    run = CoPurchaseRun(start_order_id=last, last_order_id=last)
+    if end is not None:
+        run.save()
+
+    while end is not None and last < end:
+        batch = list(
+            Order.objects.filter(id__gt=last, id__lte=end).order_by("id")
+            .annotate(counted=ExpressionWrapper(counted_sale(), output_field=BooleanField()))
+            .values_list("id", "counted")[:batch_size]
+        )
+        counted = [order_id for order_id, is_sale in batch if is_sale]
+        baskets = defaultdict(set)
+        for order_id, product_id in OrderItem.objects.filter(order_id__in=counted).values_list("order_id", "product_id"):
+            baskets[order_id].add(product_id)
+
+        counts = Counter()
+        for basket in baskets.values():
+            for pair in combinations(sorted(basket)[:MAX_ITEMS_PER_ORDER], 2):
+                counts[pair] += 1
+            touched |= basket
+
+        last = batch[-1][0]
+        with transaction.atomic():
+            _add_pairs(counts)
+            run.last_order_id = last
+            run.orders += len(counted)
+            run.pairs += len(counts)
+            run.save(update_fields=["last_order_id", "orders", "pairs"])
+        log(f"orders up to {last}: {run.orders} counted, {run.pairs} pairs")
+
+    _refresh_top_k(touched, top_k)
+    CoPurchaseRun.objects.filter(finished_at__isnull=True).update(finished_at=timezone.now())
+    if touched:
+        pagecache.invalidate()
+    return {"orders": run.orders, "pairs": run.pairs, "products": len(touched), "last_order_id": last}
+
+
+def _card(row):
+    other = row.other
+    images = list(other.images.all())
+    return {
+        "id": other.id,
+        "slug": other.slug,
+        "title": other.title,
+        "price": other.price,
+        "image": images[0].image.url if images else "",
+        "orders": row.orders,
+    }
+
+
+def _cards(product_ids):
+    """BoughtTogether cards per product id, read through the cache."""
+    version = pagecache.version()
+    keys = {product_id: f"fbt:{version}:{product_id}" for product_id in product_ids}
+    cached = cache.get_many(keys.values())
+    found = {product_id: cached[key] for product_id, key in keys.items() if key in cached}
+    missing = [product_id for product_id in keys if product_id not in found]
+    for product_id in keys:
+        note_cache(product_id in found)
+    if missing:
+        fresh = {product_id: [] for product_id in missing}
+        rows = (
+            BoughtTogether.objects.filter(product_id__in=missing)
+            .select_related("other").prefetch_related("other__images")
+        )
+        for row in rows:
+            fresh[row.product_id].append(_card(row))
+        cache.set_many({keys[product_id]: cards for product_id, cards in fresh.items()}, CACHE_SECONDS)
+        found.update(fresh)
+    return found
+
+
+def for_product(product_id, limit=4):
+    return _cards([product_id])[product_id][:limit]
+
+
+def for_cart(product_ids, limit=4):
+    """Neighbours of everything in the cart, best combined count first."""
+    product_ids = set(product_ids)
+    if not product_ids:
+        return []
+    scores = Counter()
+    cards = {}
+    for neighbours in _cards(product_ids).values():
+        for card in neighbours:
+            if card["id"] not in product_ids:
+                scores[card["id"]] += card["orders"]
+                cards[card["id"]] = card
+    return [cards[product_id] for product_id, _ in scores.most_common(limit)]
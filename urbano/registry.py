@@ -0,0 +1,86 @@
+"""
+Process-local category registry.
+
+Categories are a handful of rows read on nearly every request (home, the
+category pages and the nav in base.html), so each worker keeps
+them in memory: slug -> CategoryEntry with the id, name, whether any of its
+products come in sizes, and how many products it has.
+
+The registry is tagged with the catalog version from urbano/pagecache.py,
+which bump_categories() replaces on every catalog change, and reloads (one
+query) once that moves on. With Redis every worker sees the new version;
+with a per-process cache another worker's edits only move its own, so the
+registry is also reloaded after MAX_AGE seconds. Category signals drop
+this process's copy straight away.
+
+ETags still come from the database (urbano/conditional.py): a 304 must
+never rest on a copy that may be MAX_AGE seconds old.
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+
+from django.db.models import Count, Exists, OuterRef, Subquery
+
+from . import pagecache
+from .models import Category, Product, ProductVariant
+
+MAX_AGE = 60
+
+_lock = threading.Lock()
+# (catalog version, monotonic load time, by slug)
+_loaded = None
+
+
+@dataclass(frozen=True)
+class CategoryEntry:
+    id: int
+    slug: str
+    name: str
+    requires_size: bool
+    product_count: int
+
+    @property
+    def pk(self):
+        return self.id
+
+
+def _load():
+    # correlated per category, so each is one seek on the category index
+    counts = (
+        Product.objects.filter(category=OuterRef("pk")).order_by()
+        .values("category").annotate(n=Count("id")).values("n")
+    )
+    sized = ProductVariant.objects.filter(product__category=OuterRef("pk"))
+    rows = Category.objects.annotate(product_count=Subquery(counts), requires_size=Exists(sized)).order_by("name")
+    return {
+        row.slug: CategoryEntry(row.id, row.slug, row.name, row.requires_size, row.product_count or 0)
+        for row in rows
+    }
+
+
+def _current():
+    global _loaded
+    version = pagecache.version()
+    loaded = _loaded
+    if loaded is None or loaded[0] != version or time.monotonic() - loaded[1] > MAX_AGE:
+        with _lock:
+            loaded = _loaded
+            if loaded is None or loaded[0] != version or time.monotonic() - loaded[1] > MAX_AGE:
+                loaded = _loaded = (version, time.monotonic(), _load())
+    return loaded
+
+
+def entries():
+    """Every category, by name."""
+    return list(_current()[2].values())
+
+
+def get(slug):
+    return _current()[2].get(slug)
+
+
+def invalidate():
+    global _loaded
+    _loaded = None
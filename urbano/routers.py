@@ -0,0 +1,46 @@
+from contextvars import ContextVar
+from itertools import cycle
+
+from django.conf import settings
+
+# models served from read replicas; everything else stays on the primary
+CATALOG_MODELS = {"product", "category", "productimage"}
+
+# Set once the current request (or script) writes catalog rows, so its
+# later reads go to the primary. Reset per request by ReplicaPinMiddleware.
+primary_pinned = ContextVar("urbano_primary_pinned", default=False)
+catalog_written = ContextVar("urbano_catalog_written", default=False)
+
+
+def is_catalog_model(model):
+    return model._meta.app_label == "urbano" and model._meta.model_name in CATALOG_MODELS
+
+
+class CatalogReplicaRouter:
+    """
+    Sends Product / Category / ProductImage reads round-robin to the
+    replicas in settings.DATABASE_REPLICAS. Cart, order and auth traffic
+    and all writes use ``default``.
+    """
+
+    def __init__(self):
+        self.replicas = list(getattr(settings, "DATABASE_REPLICAS", []))
+        self._next_replica = cycle(self.replicas) if self.replicas else None
+
+    def db_for_read(self, model, **hints):
+        if not self.replicas or not is_catalog_model(model) or primary_pinned.get():
+            return "default"
+        return next(self._next_replica)
+
+    def db_for_write(self, model, **hints):
+        if is_catalog_model(model):
+            catalog_written.set(True)
+            primary_pinned.set(True)
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same rows as the primary
+        pool = {"default", *self.replicas}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
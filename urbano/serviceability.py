@@ -0,0 +1,171 @@
+"""
+Where we deliver, and how fast.
+
+PincodeRange rows (imported with ``import_pincodes``) map inclusive
+pincode ranges to a zone and its delivery days, standard and, where it is
+offered, express. Each worker keeps them as sorted arrays of range starts
+and ends plus the few distinct (zone, standard, express) tuples, and a
+lookup is one bisect: 50k ranges take under 1 MB.
+
+The index is tagged with a version in the cache, which import_pincodes and
+edits in the admin replace, and reloads (one query) once that moves on, or
+after MAX_AGE seconds when the cache is per process.
+
+Until any ranges are imported every pincode is served with DEFAULT_DAYS,
+the fixed promise checkout made before.
+"""
+
+import csv
+import re
+import threading
+import time
+import uuid
+from array import array
+from bisect import bisect_right
+from dataclasses import dataclass
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Order, PincodeRange
+
+DEFAULT_DAYS = {"standard": 5, "express": 2}
+VERSION_KEY = "serviceability:version"
+MAX_AGE = 300
+PINCODE = re.compile(r"^[1-9]\d{5}$")
+METHODS = dict(Order.DELIVERY_CHOICES)
+
+_lock = threading.Lock()
+# (version, monotonic load time, Index)
+_loaded = None
+
+
+@dataclass(frozen=True)
+class Zone:
+    name: str
+    standard_days: int
+    express_days: int | None
+
+
+class Index:
+    """Sorted, non-overlapping ranges; ``lookup`` is a bisect over the starts."""
+
+    def __init__(self, rows):
+        self.starts, self.ends, self.zone_ids = array("I"), array("I"), array("I")
+        self.zones = []
+        ids = {}
+        for start, end, *zone in rows:
+            zone = Zone(*zone)
+            if zone not in ids:
+                ids[zone] = len(self.zones)
+                self.zones.append(zone)
+            self.starts.append(start)
+            self.ends.append(end)
+            self.zone_ids.append(ids[zone])
+
+    def __len__(self):
+        return len(self.starts)
+
+    @property
+    def nbytes(self):
+        return sum(a.itemsize * len(a) for a in (self.starts, self.ends, self.zone_ids))
+
+    def lookup(self, pincode):
+        i = bisect_right(self.starts, pincode) - 1
+        if i >= 0 and pincode <= self.ends[i]:
+            return self.zones[self.zone_ids[i]]
+        return None
+
+
+def _version():
+    current = cache.get(VERSION_KEY)
+    if current is None:
+        cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+        current = cache.get(VERSION_KEY)
+    return current
+
+
+def _load():
+    rows = PincodeRange.objects.order_by("start").values_list(
+        "start", "end", "zone", "standard_days", "express_days",
+    )
+    return Index(rows.iterator(chunk_size=10_000))
+
+
+def index():
+    global _loaded
+    version = _version()
+    loaded = _loaded
+    if loaded is None or loaded[0] != version or time.monotonic() - loaded[1] > MAX_AGE:
+        with _lock:
+            loaded = _loaded
+            if loaded is None or loaded[0] != version or time.monotonic() - loaded[1] > MAX_AGE:
+                loaded = _loaded = (version, time.monotonic(), _load())
+    return loaded[2]
+
+
+def invalidate():
+    """Make every worker reload its index."""
+    global _loaded
+    _loaded = None
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def estimate(pincode):
+    """{"zone", "standard", "express"} days for a pincode we deliver to, else None."""
+    if not PINCODE.match(pincode):
+        return None
+    current = index()
+    if not len(current):
+        return {"zone": None, **DEFAULT_DAYS}
+    zone = current.lookup(int(pincode))
+    if zone is None:
+        return None
+    return {"zone": zone.name, "standard": zone.standard_days, "express": zone.express_days}
+
+
+def delivery_days(pincode, method):
+    """Days to deliver to ``pincode`` by ``method``; None if we can't."""
+    # method comes straight from the form; estimate() also has a "zone" key
+    if method not in METHODS:
+        return None
+    found = estimate(pincode or "")
+    return found and found.get(method)
+
+
+def parse(lines):
+    """
+    Rows from CSV ``lines`` with a header naming start, end, zone,
+    standard_days and express_days (blank for none). Raises ValueError,
+    with the line number, on a bad row or overlapping ranges.
+    """
+    rows = []
+    reader = csv.DictReader(lines)
+    for row in reader:
+        try:
+            start, end = int(row["start"]), int(row["end"])
+            express = row["express_days"].strip()
+            rows.append((
+                start, end, row["zone"].strip(), int(row["standard_days"]), int(express) if express else None,
+            ))
+        except (KeyError, TypeError, ValueError) as error:
+            raise ValueError(f"line {reader.line_num}: {error}") from None
+        if not PincodeRange.FIRST <= start <= end <= PincodeRange.LAST:
+            raise ValueError(f"line {reader.line_num}: {start}-{end} is not a pincode range")
+    rows.sort()
+    for previous, row in zip(rows, rows[1:]):
+        if row[0] <= previous[1]:
+            raise ValueError(f"ranges {previous[0]}-{previous[1]} and {row[0]}-{row[1]} overlap")
+    return rows
+
+
+def replace(rows):
+    """Swap the whole table for ``rows`` from parse(), in one transaction."""
+    with transaction.atomic():
+        PincodeRange.objects.all().delete()
+        PincodeRange.objects.bulk_create(
+            (PincodeRange(start=start, end=end, zone=zone, standard_days=standard, express_days=express)
+             for start, end, zone, standard, express in rows),
+            batch_size=5000,
+        )
+    invalidate()
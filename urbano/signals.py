@@ -0,0 +1,83 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import registry
+from .conditional import bump_categories
+from .models import Category, Product, ProductImage, ProductRank, ProductVariant
+
+_paused = ContextVar("stamps_paused", default=False)
+
+
+@contextmanager
+def stamps_paused():
+    """Skip per-row bumps for a bulk change; every category is bumped once at the end."""
+    token = _paused.set(True)
+    try:
+        yield
+    finally:
+        _paused.reset(token)
+        bump_categories()
+
+
+def _bump_for(*category_ids):
+    if _paused.get():
+        return
+    # uncategorised products still show up on the catalog-wide listings
+    ids = {pk for pk in category_ids if pk is not None}
+    bump_categories(ids if ids and None not in category_ids else None)
+
+
+@receiver(pre_save, sender=Product)
+def remember_category(sender, instance, raw, **kwargs):
+    if instance.pk and not raw and not _paused.get():
+        instance._previous_category_id = (
+            Product.objects.filter(pk=instance.pk).values_list("category_id", flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, raw, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, "_previous_category_id", instance.category_id)
+    if previous != instance.category_id:
+        ProductRank.objects.filter(product=instance).update(category_id=instance.category_id)
+    _bump_for(instance.category_id, previous)
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    _bump_for(instance.category_id)
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+def product_part_changed(sender, instance, raw=False, **kwargs):
+    if raw or _paused.get():
+        return
+    product = Product.objects.filter(pk=instance.product_id)
+    category_ids = list(product.values_list("category_id", flat=True))
+    if category_ids:  # empty when the product itself is being deleted
+        product.update(updated_at=timezone.now())
+        _bump_for(*category_ids)
+
+
+@receiver(post_save, sender=Category)
+def category_saved(sender, instance, raw, **kwargs):
+    registry.invalidate()
+    if not raw and not _paused.get():
+        bump_categories([instance.pk])
+
+
+@receiver(post_delete, sender=Category)
+def category_deleted(sender, instance, **kwargs):
+    registry.invalidate()
+    # its products went with it, and their pages drop out of every listing
+    if not _paused.get():
+        bump_categories()
@@ -0,0 +1,77 @@
+"""
+Clears out rows nobody will come back for:
+
+  carts     CartItem rows untouched for CART_DAYS
+  sessions  expired sessions, and with them the guest carts they hold
+  orders    orders that went to Razorpay and were never paid, after
+            PENDING_ORDER_HOURS; cash on delivery orders are left alone
+
+Every kind is deleted a batch at a time, each batch in its own short
+transaction, with an optional pause in between so checkouts waiting on the
+SQLite write lock get their turn. Orders are walked in id order from where
+the previous run stopped (SweepRun.last_order_id), so a run only reads the
+orders created since.
+"""
+
+import time
+from datetime import timedelta
+
+from django.contrib.sessions.models import Session
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import CartItem, Order, SweepRun, paid_or_cod
+
+CART_DAYS = 30
+PENDING_ORDER_HOURS = 48
+
+
+def stale_orders():
+    return Order.objects.filter(status="Placed", payment_id__isnull=True).exclude(paid_or_cod())
+
+
+def _delete_in_batches(queryset, batch_size, pause, log, label):
+    """Delete ``queryset`` in primary key order; returns the number of rows."""
+    deleted, last = 0, None
+    while True:
+        batch = queryset if last is None else queryset.filter(pk__gt=last)
+        ids = list(batch.order_by("pk").values_list("pk", flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        # filtered again, so a row touched since it was picked is kept
+        with transaction.atomic():
+            deleted += queryset.filter(pk__in=ids).delete()[1].get(queryset.model._meta.label, 0)
+        last = ids[-1]
+        log(f"{label}: {deleted}")
+        if pause:
+            time.sleep(pause)
+
+
+def sweep(cart_days=CART_DAYS, order_hours=PENDING_ORDER_HOURS, batch_size=500, pause=0.0, log=None):
+    """Delete abandoned carts, expired sessions and stale unpaid orders; returns the SweepRun."""
+    log = log or (lambda message: None)
+    now = timezone.now()
+    start = SweepRun.objects.aggregate(last=Max("last_order_id"))["last"] or 0
+    run = SweepRun.objects.create(last_order_id=start)
+
+    run.carts = _delete_in_batches(
+        CartItem.objects.filter(updated_at__lt=now - timedelta(days=cart_days)), batch_size, pause, log, "carts",
+    )
+    run.sessions = _delete_in_batches(
+        Session.objects.filter(expire_date__lt=now), batch_size, pause, log, "sessions",
+    )
+    # ids grow with created_at, so everything up to the newest old order is settled
+    end = (
+        Order.objects.filter(created_at__lt=now - timedelta(hours=order_hours))
+        .order_by("-id").values_list("id", flat=True).first()
+    )
+    if end is not None and end > start:
+        run.orders = _delete_in_batches(
+            stale_orders().filter(pk__gt=start, pk__lte=end), batch_size, pause, log, "orders",
+        )
+        run.last_order_id = end
+
+    run.finished_at = timezone.now()
+    run.save()
+    return run
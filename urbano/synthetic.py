@@ -0,0 +1,160 @@
+"""
+Seeded synthetic catalog for benchmarks and query-budget tests.
+
+Everything is generated from one ``random.Random(seed)`` so two runs with
+the same arguments produce the same rows, and rows are written with
+``bulk_create`` in fixed-size batches so 100k products fit in bounded memory.
+"""
+
+import random
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from .conditional import bump_categories
+from .models import Category, Product, ProductImage, ProductVariant, CartItem, Order, OrderItem
+from .signals import stamps_paused
+
+SLUG_PREFIX = "syn-"
+USER_PREFIX = "shopper"
+USER_PASSWORD = "Shopper@123"
+
+CATEGORIES = {
+    "clothing": ("Clothing", "S,M,L,XL"),
+    "accessories": ("Accessories", ""),
+    "electronics": ("Electronics", ""),
+    "footwear": ("Footwear", "6,7,8,9,10"),
+    "home-living": ("Home & Living", ""),
+    "health-beauty": ("Health & Beauty", ""),
+}
+BRANDS = [f"Brand {n:02d}" for n in range(50)]
+TAGS = ["summer", "workspace", "gifts", None, None, None]
+PLACEHOLDER_IMAGE = "products/multiple/placeholder-product.png"
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def clear():
+    """Delete everything a previous ``generate`` run created."""
+    User.objects.filter(username__startswith=USER_PREFIX).delete()
+    with stamps_paused():
+        Product.objects.filter(slug__startswith=SLUG_PREFIX).delete()
+
+
+def generate(products=100_000, images_per_product=3, users=200, cart_items=5,
+             orders_per_user=5, items_per_order=3, seed=42, batch_size=5000, log=None):
+    """Create the dataset and return row counts per model."""
+    rng = random.Random(seed)
+    log = log or (lambda message: None)
+    counts = {}
+
+    categories = []
+    for slug, (name, _) in CATEGORIES.items():
+        category, _ = Category.objects.get_or_create(slug=slug, defaults={"name": name})
+        categories.append(category)
+    counts["categories"] = len(categories)
+
+    def product_rows():
+        for i in range(products):
+            category = categories[i % len(categories)]
+            price = Decimal(rng.randrange(199, 9999))
+            on_sale = rng.random() < 0.3
+            yield Product(
+                category=category,
+                title=f"{category.name} item {i}",
+                slug=f"{SLUG_PREFIX}{category.slug}-{i}",
+                price=price,
+                old_price=price + rng.randrange(100, 2000) if on_sale else None,
+                brand=rng.choice(BRANDS),
+                short_description=f"Synthetic {category.name.lower()} product {i}",
+                tag=rng.choice(TAGS),
+                is_best_seller=rng.random() < 0.05,
+                is_featured=rng.random() < 0.02,
+            )
+
+    sizes = {category.pk: CATEGORIES[category.slug][1] for category in categories}
+    product_ids = []
+    variant_count = 0
+    for batch in _batches(product_rows(), batch_size):
+        with transaction.atomic():
+            created = Product.objects.bulk_create(batch)
+            product_ids.extend(p.pk for p in created)
+            ProductImage.objects.bulk_create(
+                ProductImage(product=p, image=PLACEHOLDER_IMAGE)
+                for p in created
+                for _ in range(images_per_product)
+            )
+            variants = ProductVariant.objects.bulk_create(
+                ProductVariant(product=p, size=size, position=n, stock=rng.choice([0, 5, 20, None]))
+                for p in created
+                for n, size in enumerate(filter(None, sizes[p.category_id].split(",")))
+            )
+            variant_count += len(variants)
+        log(f"products: {len(product_ids)}/{products}")
+    bump_categories()  # bulk_create sends no signals
+    counts["products"] = len(product_ids)
+    counts["images"] = len(product_ids) * images_per_product
+    counts["variants"] = variant_count
+
+    # one hash for every shopper; hashing per user would dominate the run
+    password = make_password(USER_PASSWORD)
+    shoppers = User.objects.bulk_create(
+        User(username=f"{USER_PREFIX}{n}", email=f"{USER_PREFIX}{n}@example.com", password=password)
+        for n in range(users)
+    )
+    counts["users"] = len(shoppers)
+
+    cart_rows = []
+    for user in shoppers:
+        for product_id in rng.sample(product_ids, min(cart_items, len(product_ids))):
+            cart_rows.append(CartItem(user=user, product_id=product_id, quantity=rng.randint(1, 3)))
+    CartItem.objects.bulk_create(cart_rows, batch_size=batch_size)
+    counts["cart_items"] = len(cart_rows)
+
+    orders = Order.objects.bulk_create(
+        (
+            Order(
+                user=user,
+                fullname=user.username,
+                phone="9999999999",
+                address="1 Synthetic Street",
+                city="Hyderabad",
+                state="Telangana",
+                pincode=f"5000{rng.randrange(10, 99)}",
+                payment_method=rng.choice(["RZP", "COD"]),
+                is_paid=rng.random() < 0.8,
+            )
+            for user in shoppers
+            for _ in range(orders_per_user)
+        ),
+        batch_size=batch_size,
+    )
+    counts["orders"] = len(orders)
+
+    def order_item_rows():
+        for order in orders:
+            for product_id in rng.sample(product_ids, min(items_per_order, len(product_ids))):
+                yield OrderItem(
+                    order=order,
+                    product_id=product_id,
+                    quantity=rng.randint(1, 3),
+                    price=Decimal(rng.randrange(199, 9999)),
+                )
+
+    counts["order_items"] = 0
+    for batch in _batches(order_item_rows(), batch_size):
+        OrderItem.objects.bulk_create(batch)
+        counts["order_items"] += len(batch)
+
+    return counts
@@ -0,0 +1,18 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from ..pagecache import hole_marker
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, template_name):
+    """
+    Include a per-visitor fragment. While a page is rendered for the page
+    cache only a marker is written; urbano.pagecache.punch fills it in.
+    """
+    request = context.get("request")
+    if getattr(request, "page_cache_fill", False):
+        return mark_safe(hole_marker(template_name))
+    return context.template.engine.get_template(template_name).render(context)
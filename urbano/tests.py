@@ -1,3 +1,1017 @@
-from django.test import TestCase
+import io
+import os
+import re
+import tempfile
+import unittest
+from unittest import mock
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, SimpleTestCase, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.http import HttpResponse
+from django.urls import include, path, reverse
+from django.utils import timezone
+
+from . import (
+    api, async_views, benchmarks, events, gateway, media, pagecache, profiling, rankings, ratelimit, recommendations,
+    registry, serviceability, sweeper, synthetic, warmup,
+)
+from .metrics import REGISTRY
+from .middleware import PIN_COOKIE, ReplicaPinMiddleware
+from .models import (
+    Product, Category, ProductImage, ProductVariant, CartItem, Order, OrderItem, CoPurchase, ProductRank, RankingState,
+    ClickEvent, DailyProductEvents, DailySearch, SweepRun, PincodeRange,
+)
+from .routers import CatalogReplicaRouter, primary_pinned
+from .views import FIXED_CATEGORY_SLUGS
+
+
+class AsyncUrls:
+    """The URLs as urbano_cart/asgi.py serves them (ASYNC_VIEWS on)."""
+    urlpatterns = [
+        path("category/<slug:slug>/", async_views.category_products, name="category_products"),
+        path("product/<slug:slug>/", async_views.product_detail, name="product_detail"),
+        path("search/", async_views.search_products, name="search"),
+        path("payment/", async_views.payment, name="payment"),
+        path("", include("urbano_cart.urls")),
+    ]
+
+
+@override_settings(DATABASE_REPLICAS=["replica1", "replica2"], REPLICA_PIN_SECONDS=5)
+class CatalogReplicaRouterTests(SimpleTestCase):
+
+    def setUp(self):
+        self.router = CatalogReplicaRouter()
+        self.token = primary_pinned.set(False)
+
+    def tearDown(self):
+        primary_pinned.reset(self.token)
+
+    def test_catalog_reads_round_robin_over_replicas(self):
+        reads = [self.router.db_for_read(model) for model in (Product, Category, ProductImage, Product)]
+        self.assertEqual(reads, ["replica1", "replica2", "replica1", "replica2"])
+
+    def test_cart_and_order_reads_stay_on_primary(self):
+        self.assertEqual(self.router.db_for_read(CartItem), "default")
+        self.assertEqual(self.router.db_for_read(Order), "default")
+
+    def test_reads_pinned_to_primary_after_catalog_write(self):
+        self.assertEqual(self.router.db_for_write(Product), "default")
+        self.assertEqual(self.router.db_for_read(Product), "default")
+
+    def test_middleware_sets_pin_cookie_only_after_catalog_write(self):
+        def writes_product(request):
+            self.router.db_for_write(Product)
+            return HttpResponse()
+
+        factory = RequestFactory()
+        response = ReplicaPinMiddleware(lambda request: HttpResponse())(factory.get("/"))
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+        response = ReplicaPinMiddleware(writes_product)(factory.get("/"))
+        self.assertEqual(response.cookies[PIN_COOKIE]["max-age"], 5)
+
+    def test_pin_cookie_routes_next_request_to_primary(self):
+        def reads_product(request):
+            return HttpResponse(self.router.db_for_read(Product))
+
+        request = RequestFactory().get("/")
+        request.COOKIES[PIN_COOKIE] = "1"
+        response = ReplicaPinMiddleware(reads_product)(request)
+        self.assertEqual(response.content, b"default")
+
+
+# Hot catalog / order URLs whose queries must stay on indexes. Search is left
+# out on purpose: its ``icontains`` LIKE '%q%' filters can't use a b-tree.
+HOT_URLS = [
+    ("home", {}, {}),
+    ("categories", {}, {}),
+    ("category_products", {"slug": "clothing"}, {}),
+    ("category_products", {"slug": "clothing"}, {"min_price": "100", "max_price": "900"}),
+    ("category_products", {"slug": "clothing"}, {"sort": "low_to_high"}),
+    ("category_products", {"slug": "clothing"}, {"sort": "high_to_low", "brand": "Urbano"}),
+    ("product_detail", {"slug": "product-1"}, {}),
+    ("best_sellers", {}, {}),
+    ("best_sellers", {}, {"sort": "high_to_low"}),
+    ("best_sellers", {}, {"sort": "discount"}),
+    ("new_arrivals", {}, {}),
+    ("new_arrivals", {}, {"sort": "discount", "min_price": "nan"}),
+    ("on_sale", {}, {}),
+    ("on_sale", {}, {"sort": "discount", "brand": "Urbano"}),
+    ("summer_edit", {}, {"sort": "low_to_high"}),
+    ("workspace", {}, {}),
+    ("gifts", {}, {}),
+    ("featured_product", {}, {"sort": "low_to_high"}),
+    ("cart", {}, {}),
+    ("checkout", {}, {}),
+    ("my_orders", {}, {}),
+]
+
+# a plain rowid walk is fine when it is bounded by ORDER BY id ... LIMIT
+PK_ORDERED_LIMIT = re.compile(r'ORDER BY ("urbano_\w+"\."id"|1) (ASC|DESC) LIMIT', re.I)
+
+# ranked feeds sort at most FEED_SIZE rows fetched by primary key
+BOUNDED_BY_IDS = re.compile(r'WHERE "urbano_product"\."id" IN \(')
+
+# a dozen rows at most; the catalog ETag sums them on every listing request
+SMALL_TABLES = {"urbano_category"}
+
+
+@unittest.skipUnless(connection.vendor == "sqlite", "query plans are checked with SQLite's EXPLAIN QUERY PLAN")
+class QueryPlanTests(TestCase):
+    """
+    Renders every hot view, then runs EXPLAIN QUERY PLAN on each catalog and
+    order query it issued. Fails if one regresses to a full table scan or to
+    sorting on a temp b-tree where an index should give the order.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("shopper", password="pw")
+        categories = [
+            Category.objects.create(name=slug.replace("-", " ").title(), slug=slug)
+            for slug in FIXED_CATEGORY_SLUGS
+        ]
+        tags = ["summer", "workspace", "gift", None]
+        for i in range(1, 41):
+            Product.objects.create(
+                category=categories[i % len(categories)],
+                title=f"Product {i}",
+                slug=f"product-{i}",
+                price=100 + i * 10,
+                old_price=(200 + i * 10) if i % 3 == 0 else None,
+                brand="Urbano" if i % 2 else "Other",
+                tag=tags[i % len(tags)],
+                is_best_seller=i % 5 == 0,
+                is_featured=i % 7 == 0,
+            )
+        product = Product.objects.get(slug="product-1")
+        CartItem.objects.create(user=cls.user, product=product, quantity=1)
+        order = Order.objects.create(
+            user=cls.user, fullname="Shopper", phone="1", address="a", city="c",
+            state="s", pincode="500001", payment_method="COD",
+        )
+        for product in Product.objects.filter(slug__in=["product-5", "product-12", "product-20"]):
+            OrderItem.objects.create(order=order, product=product, price=product.price)
+        rankings.update()
+
+    def plan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assert_indexed(self, url_name, sql, plan):
+        for step in plan:
+            table = re.match(r"SCAN (urbano_\w+)$", step)
+            if table and table.group(1) not in SMALL_TABLES and not PK_ORDERED_LIMIT.search(sql):
+                self.fail(f"{url_name}: full scan of {table.group(1)}\n{sql}\n{plan}")
+            # ORDER BY price / created_at should come straight off the index
+            if "TEMP B-TREE FOR ORDER BY" in step and not BOUNDED_BY_IDS.search(sql) and re.search(r'ORDER BY "urbano_(product|order)"\."(price|created_at)"', sql):
+                self.fail(f"{url_name}: sort not served by an index\n{sql}\n{plan}")
+
+    def test_hot_queries_use_indexes(self):
+        self.client.force_login(self.user)
+        for url_name, kwargs, params in HOT_URLS:
+            with self.subTest(url=url_name, params=params):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(reverse(url_name, kwargs=kwargs), params)
+                self.assertEqual(response.status_code, 200)
+                for query in queries.captured_queries:
+                    sql = query["sql"]
+                    if sql.startswith("SELECT") and "urbano_" in sql:
+                        self.assert_indexed(url_name, sql, self.plan(sql))
+
+
+class QueryBudgetTests(TestCase):
+    """Every URL in urbano/urls.py stays within its QUERY_BUDGETS entry."""
+
+    @classmethod
+    def setUpTestData(cls):
+        # enough rows per page that an N+1 would blow any budget
+        synthetic.generate(products=120, images_per_product=2, users=2, cart_items=4,
+                           orders_per_user=3, items_per_order=3, batch_size=50)
+        rankings.update()
+
+    def test_every_url_is_benchmarked(self):
+        covered = set(benchmarks.QUERY_BUDGETS) | set(benchmarks.SKIPPED)
+        self.assertEqual(set(benchmarks.url_names()), covered)
+
+    def test_views_within_query_budget(self):
+        report = benchmarks.run(runs=1)
+        for name, result in report.items():
+            if "skipped" in result:
+                continue
+            with self.subTest(view=name):
+                self.assertLess(result["status"], 500)
+                self.assertLessEqual(result["queries"], result["budget"])
+
+
+class InstrumentationTests(TestCase):
+
+    def setUp(self):
+        REGISTRY.reset()
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse("categories"))
+        timing = response["Server-Timing"]
+        for metric in ("db;dur=", "tpl;dur=", "cache;desc=", "total;dur="):
+            self.assertIn(metric, timing)
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+
+    @override_settings(SERVER_TIMING=False, METRICS_ALLOWED_IPS=[])
+    def test_server_timing_only_for_allowed_ips(self):
+        self.assertNotIn("Server-Timing", self.client.get(reverse("categories")))
+        with self.settings(METRICS_ALLOWED_IPS=["127.0.0.1"]):
+            self.assertIn("Server-Timing", self.client.get(reverse("categories")))
+
+    @override_settings(METRICS_ALLOWED_IPS=["127.0.0.1"])
+    def test_metrics_endpoint_aggregates_by_url_name(self):
+        self.client.get(reverse("categories"))
+        self.client.get(reverse("categories"))
+        body = self.client.get(reverse("metrics")).content.decode()
+        self.assertIn('urbano_request_duration_seconds_count{view="categories"} 2', body)
+        self.assertIn('urbano_db_queries_bucket{view="categories",le="+Inf"} 2', body)
+        self.assertIn("# TYPE urbano_template_duration_seconds histogram", body)
+
+    def test_metrics_endpoint_needs_allowed_ip_or_staff(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+        staff = User.objects.create_user("ops", password="pw", is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 200)
+
+
+class SlowRequestProfilerTests(TestCase):
+
+    def setUp(self):
+        profile_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(profile_dir.cleanup)
+        self.profile_dir = profile_dir.name
+
+    def profiles(self):
+        profiling.flush()
+        return sorted(os.listdir(self.profile_dir))
+
+    def test_fast_requests_leave_no_profile(self):
+        with override_settings(SLOW_REQUEST_PROFILING=True, SLOW_REQUEST_THRESHOLD_MS=60_000,
+                               PROFILE_SAMPLE_RATE=0, PROFILE_DIR=self.profile_dir):
+            self.client.get(reverse("categories"))
+        self.assertEqual(self.profiles(), [])
+
+    def test_slow_requests_write_stacks_and_sql_with_rotation(self):
+        with override_settings(SLOW_REQUEST_PROFILING=True, SLOW_REQUEST_THRESHOLD_MS=0,
+                               PROFILE_KEEP=2, PROFILE_DIR=self.profile_dir):
+            for _ in range(3):
+                self.client.get(reverse("categories"))
+            files = self.profiles()
+        self.assertEqual(len(files), 4)  # two kept profiles, .collapsed + .sql each
+        sql_file = next(name for name in files if name.endswith(".sql"))
+        self.assertIn("-categories-", sql_file)
+        with open(os.path.join(self.profile_dir, sql_file)) as fh:
+            self.assertIn('FROM "urbano_category"', fh.read())
+
+
+class ConditionalGetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.clothing = Category.objects.create(name="Clothing", slug="clothing")
+        cls.footwear = Category.objects.create(name="Footwear", slug="footwear")
+        cls.shirt = Product.objects.create(category=cls.clothing, title="Shirt", slug="shirt", price=500)
+        cls.shoe = Product.objects.create(category=cls.footwear, title="Shoe", slug="shoe", price=900)
+
+    def revalidate(self, url):
+        # the first response sets the CSRF cookie, which is part of the ETag
+        self.client.get(url)
+        return self.client.get(url)["ETag"]
+
+    def test_unchanged_product_page_is_304_without_loading_it(self):
+        url = reverse("product_detail", args=["shirt"])
+        etag = self.revalidate(url)
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+        response = self.client.get(url)
+        self.assertIn("no-cache", response["Cache-Control"])
+        self.assertIn("private", response["Cache-Control"])
+
+    def test_product_and_image_changes_invalidate_pages(self):
+        product_url = reverse("product_detail", args=["shirt"])
+        clothing_url = reverse("category_products", args=["clothing"])
+        footwear_url = reverse("category_products", args=["footwear"])
+        before = {url: self.revalidate(url) for url in (product_url, clothing_url, footwear_url, reverse("on_sale"))}
+
+        self.shirt.price = 450
+        self.shirt.save()
+        after = {url: self.client.get(url)["ETag"] for url in before}
+        self.assertNotEqual(before[product_url], after[product_url])
+        self.assertNotEqual(before[clothing_url], after[clothing_url])
+        self.assertNotEqual(before[reverse("on_sale")], after[reverse("on_sale")])
+        self.assertEqual(before[footwear_url], after[footwear_url])
+
+        ProductImage.objects.create(product=self.shirt, image="products/shirt.jpg")
+        response = self.client.get(product_url, HTTP_IF_NONE_MATCH=after[product_url])
+        self.assertEqual(response.status_code, 200)
+
+    def test_moving_a_product_invalidates_both_categories(self):
+        footwear_url = reverse("category_products", args=["footwear"])
+        etag = self.revalidate(footwear_url)
+        self.shirt.category = self.footwear
+        self.shirt.save()
+        self.assertNotEqual(self.client.get(footwear_url)["ETag"], etag)
+
+    def test_etag_follows_the_viewer_and_query_string(self):
+        url = reverse("best_sellers")
+        etag = self.revalidate(url)
+        self.assertNotEqual(self.client.get(url, {"sort": "low_to_high"})["ETag"], etag)
+
+        self.client.post(reverse("add_to_cart", args=[self.shoe.id]))
+        self.assertNotEqual(self.client.get(url)["ETag"], etag)
+
+        self.client.force_login(User.objects.create_user("shopper", password="pw"))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(PAGE_CACHE_SECONDS=60)
+class PageCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        accessories = Category.objects.create(name="Accessories", slug="accessories")
+        cls.belt = Product.objects.create(category=accessories, title="Belt", slug="belt", price=300)
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse("product_detail", args=["belt"])
+
+    def test_anonymous_hit_skips_the_view_and_fills_holes(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        content = response.content.decode()
+        self.assertIn("Belt", content)
+        self.assertNotIn("<!--hole:", content)
+        token = re.search(r'name="csrfmiddlewaretoken" value="(\w+)"', content).group(1)
+        self.assertIn("csrftoken", response.cookies)
+
+        # the token handed out from the cached page is accepted
+        client = type(self.client)(enforce_csrf_checks=True)
+        client.cookies = self.client.cookies
+        response = client.post(reverse("add_to_cart", args=[self.belt.id]), {"csrfmiddlewaretoken": token})
+        self.assertEqual(response.status_code, 302)
+
+    def test_cart_count_is_per_visitor(self):
+        self.client.get(self.url)
+        shopper = type(self.client)()
+        shopper.post(reverse("add_to_cart", args=[self.belt.id]))
+        self.assertIn('class="cart-count">1<', shopper.get(self.url).content.decode())
+        self.assertNotIn("cart-count", self.client.get(self.url).content.decode())
+
+    def test_catalog_change_retires_cached_pages(self):
+        self.client.get(self.url)
+        self.belt.title = "Leather Belt"
+        self.belt.save()
+        self.assertIn("Leather Belt", self.client.get(self.url).content.decode())
+
+    def test_logged_in_visitors_bypass_the_cache(self):
+        self.client.get(self.url)
+        self.client.force_login(User.objects.create_user("shopper", password="pw"))
+        content = self.client.get(self.url).content.decode()
+        self.assertIn("Hello, shopper", content)
+
+
+class RecommendationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("shopper", password="pw")
+        category = Category.objects.create(name="Accessories", slug="accessories")
+        cls.a, cls.b, cls.c, cls.d = (
+            Product.objects.create(category=category, title=name, slug=name.lower(), price=100)
+            for name in ("Alpha", "Bravo", "Charlie", "Delta")
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def order(self, *products, **fields):
+        order = Order.objects.create(
+            user=self.user, fullname="Shopper", phone="1", address="a", city="c",
+            state="s", pincode="500001", **{"payment_method": "COD", **fields},
+        )
+        for product in products:
+            OrderItem.objects.create(order=order, product=product, price=product.price)
+        return order
+
+    def pair(self, product, other):
+        return CoPurchase.objects.get(product=product, other=other).orders
+
+    def test_counts_pairs_incrementally_and_ranks_neighbours(self):
+        self.order(self.a, self.b)
+        self.order(self.a, self.b, self.c)
+        self.order(self.a, self.c, self.c)
+        self.order(self.a, self.d, is_cancelled=True)
+        stats = recommendations.build(settle_minutes=0, batch_size=2)
+        self.assertEqual(stats["orders"], 3)
+        self.assertEqual((self.pair(self.a, self.b), self.pair(self.b, self.a), self.pair(self.a, self.c)), (2, 2, 2))
+        self.assertEqual([card["slug"] for card in recommendations.for_product(self.a.id)], ["bravo", "charlie"])
+
+        self.order(self.a, self.d)
+        self.assertEqual(recommendations.build(settle_minutes=0)["orders"], 1)
+        self.assertEqual((self.pair(self.a, self.b), self.pair(self.a, self.d)), (2, 1))
+        self.assertEqual(
+            [card["slug"] for card in recommendations.for_product(self.a.id)], ["bravo", "charlie", "delta"],
+        )
+
+    def test_recent_orders_wait_to_settle(self):
+        self.order(self.a, self.b)
+        self.assertEqual(recommendations.build(settle_minutes=60)["orders"], 0)
+        self.assertFalse(CoPurchase.objects.exists())
+
+    def test_unpaid_razorpay_orders_are_not_counted(self):
+        self.order(self.a, self.b, payment_method="RZP")
+        self.order(self.a, self.c, payment_method="RZP", is_paid=True)
+        self.assertEqual(recommendations.build(settle_minutes=0)["orders"], 1)
+        self.assertFalse(CoPurchase.objects.filter(product=self.a, other=self.b).exists())
+        self.assertEqual(self.pair(self.a, self.c), 1)
+
+    def test_cart_and_product_page_are_served_from_cache(self):
+        self.order(self.a, self.b)
+        self.order(self.b, self.c)
+        recommendations.build(settle_minutes=0)
+        self.assertEqual([card["slug"] for card in recommendations.for_cart([self.b.id, self.c.id])], ["alpha"])
+        with self.assertNumQueries(0):
+            recommendations.for_cart([self.b.id, self.c.id])
+
+        response = self.client.get(reverse("product_detail", args=["alpha"]))
+        self.assertContains(response, "Frequently bought together")
+        self.assertContains(response, reverse("product_detail", args=["bravo"]))
+
+
+class RankingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("shopper", password="pw")
+        cls.shoes = Category.objects.create(name="Footwear", slug="footwear")
+        cls.bags = Category.objects.create(name="Accessories", slug="accessories")
+        cls.classic = Product.objects.create(category=cls.shoes, title="Classic", slug="classic", price=100)
+        cls.runner = Product.objects.create(category=cls.shoes, title="Runner", slug="runner", price=100)
+        cls.tote = Product.objects.create(category=cls.bags, title="Tote", slug="tote", price=100)
+
+    def sell(self, product, quantity, days_ago=0, **fields):
+        order = Order.objects.create(
+            user=self.user, fullname="Shopper", phone="1", address="a", city="c",
+            state="s", pincode="500001", **{"payment_method": "COD", **fields},
+        )
+        Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+        OrderItem.objects.create(order=order, product=product, quantity=quantity, price=product.price)
+
+    def slugs(self, feed, **kwargs):
+        return [product.slug for product in rankings.ranked(feed, **kwargs)]
+
+    def test_recent_sales_outrank_older_ones(self):
+        self.sell(self.classic, 5, days_ago=20)
+        self.sell(self.runner, 2)
+        self.sell(self.tote, 1)
+        self.sell(self.tote, 50, is_cancelled=True)
+        rankings.update()
+        self.assertEqual(self.slugs("best_sellers"), ["runner", "classic", "tote"])
+        self.assertEqual(self.slugs("best_sellers", category=self.shoes, limit=1), ["runner"])
+        self.assertEqual(self.slugs("trending", limit=2), ["runner", "tote"])
+
+        self.tote.category = self.shoes
+        self.tote.save()
+        self.assertEqual(self.slugs("best_sellers", category=self.shoes), ["runner", "classic", "tote"])
+
+    def test_incremental_runs_match_a_rebuild(self):
+        self.sell(self.classic, 3, days_ago=3)
+        rankings.update()
+        self.sell(self.runner, 1)
+        self.sell(self.classic, 1)
+        rankings.update()
+        incremental = dict(ProductRank.objects.filter(feed="best_sellers").values_list("product_id", "score"))
+
+        epoch = RankingState.objects.get().epoch
+        rankings.reset()
+        RankingState.objects.create(pk=1, epoch=epoch)
+        rankings.update()
+        rebuilt = dict(ProductRank.objects.filter(feed="best_sellers").values_list("product_id", "score"))
+        self.assertEqual(incremental.keys(), rebuilt.keys())
+        for product_id, score in rebuilt.items():
+            self.assertAlmostEqual(incremental[product_id], score)
+
+    def test_rebase_keeps_order_and_new_arrivals_age_out(self):
+        Product.objects.filter(pk=self.classic.pk).update(created_at=timezone.now() - timedelta(days=40))
+        self.sell(self.runner, 1, days_ago=2)
+        self.sell(self.tote, 4, days_ago=10)
+        rankings.update()
+        self.assertEqual(sorted(self.slugs("new_arrivals")), ["runner", "tote"])
+        before = self.slugs("best_sellers")
+
+        RankingState.objects.update(epoch=timezone.now() - timedelta(days=45))
+        rankings.update()
+        self.assertGreater(RankingState.objects.get().epoch, timezone.now() - timedelta(minutes=1))
+        self.assertEqual(self.slugs("best_sellers"), before)
+
+    def test_unpaid_razorpay_lines_wait_for_payment_then_are_skipped(self):
+        self.sell(self.tote, 1, payment_method="RZP")
+        self.sell(self.runner, 1)
+        rankings.update()
+        self.assertFalse(ProductRank.objects.filter(feed="best_sellers").exists())
+
+        Order.objects.filter(payment_method="RZP").update(is_paid=True)
+        self.sell(self.classic, 3, days_ago=1, payment_method="RZP")  # abandoned
+        rankings.update()
+        self.assertEqual(self.slugs("best_sellers"), ["runner", "tote"])
+
+    def test_empty_feeds_fall_back_to_the_flag_and_newest(self):
+        Product.objects.filter(pk=self.classic.pk).update(is_best_seller=True)
+        self.assertEqual(self.slugs("best_sellers"), ["classic"])
+        self.assertEqual(self.slugs("new_arrivals", limit=2), ["tote", "runner"])
+
+    def test_brand_filter_lists_each_brand_once(self):
+        Product.objects.update(brand="Acme")
+        for product in (self.classic, self.runner, self.tote):
+            self.sell(product, 1)
+        rankings.update()
+        response = self.client.get(reverse("best_sellers"), {"sort": "high_to_low"})
+        self.assertEqual(list(response.context["brands"]), ["Acme"])
+
+
+class CategoryRegistryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.bags = Category.objects.create(name="Bags", slug="bags")
+        Product.objects.create(category=cls.bags, title="Tote", slug="tote", price=400)
+        Category.objects.create(name="Empty", slug="empty")
+
+    def setUp(self):
+        # test rollbacks don't move the catalog version
+        registry.invalidate()
+
+    def test_nav_comes_from_memory_and_follows_edits(self):
+        registry.entries()
+        with CaptureQueriesContext(connection) as queries:
+            body = self.client.get(reverse("about")).content.decode()
+        self.assertIn(reverse("category_products", args=["bags"]), body)
+        self.assertNotIn(reverse("category_products", args=["empty"]), body)
+        self.assertFalse([q for q in queries.captured_queries if "urbano_category" in q["sql"]])
+
+        self.bags.name = "Handbags"
+        self.bags.save()
+        self.assertEqual(registry.get("bags").name, "Handbags")
+        self.assertEqual(registry.get("bags").product_count, 1)
+
+    def test_reloads_when_another_process_moves_the_version(self):
+        registry.entries()
+        Category.objects.filter(pk=self.bags.pk).update(name="Totes")  # no signal here
+        self.assertEqual(registry.get("bags").name, "Bags")
+        pagecache.invalidate()
+        self.assertEqual(registry.get("bags").name, "Totes")
+
+
+class ProductVariantTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        clothing = Category.objects.create(name="Clothing", slug="clothing")
+        cls.tee = Product.objects.create(category=clothing, title="Tee", slug="tee", price=500)
+        cls.polo = Product.objects.create(category=clothing, title="Polo", slug="polo", price=900)
+        ProductVariant.objects.create(product=cls.tee, size="S", position=0, stock=0)
+        ProductVariant.objects.create(product=cls.tee, size="M", position=1, price=550)
+        ProductVariant.objects.create(product=cls.polo, size="M", position=0, stock=3)
+        ProductVariant.objects.create(product=cls.polo, size="S", position=1, stock=2)
+
+    def test_size_filter_keeps_only_products_with_that_size_in_stock(self):
+        url = reverse("category_products", args=["clothing"])
+        self.assertEqual([p.slug for p in self.client.get(url, {"size": "S"}).context["products"]], ["polo"])
+        self.assertEqual(len(self.client.get(url, {"size": "M"}).context["products"]), 2)
+        self.assertEqual(list(self.client.get(url).context["sizes"]), ["M", "S"])
+
+    def test_cart_takes_only_in_stock_sizes_at_their_price(self):
+        add = reverse("add_to_cart", args=[self.tee.id])
+        self.assertTemplateUsed(self.client.post(add, {"size": "S"}), "select_size.html")
+        self.assertTemplateUsed(self.client.post(add, {"size": "XXL"}), "select_size.html")
+        self.assertRedirects(self.client.post(add, {"size": "M", "quantity": "2"}), reverse("cart"))
+        self.assertEqual(self.client.get(reverse("cart")).context["total_price"], 1100)
+
+    def test_sizes_checked_even_when_the_registry_is_stale_or_uncategorised(self):
+        loose = Product.objects.create(title="Loose Tee", slug="loose-tee", price=400)
+        ProductVariant.objects.create(product=loose, size="L")
+        hat = Product.objects.create(category=Category.objects.create(name="Hats", slug="hats"),
+                                     title="Hat", slug="hat", price=200)
+        registry.entries()  # "hats" is loaded without sizes
+        ProductVariant.objects.bulk_create([ProductVariant(product=hat, size="M")])
+        for product in (loose, hat):
+            with self.subTest(product=product.slug):
+                add = reverse("add_to_cart", args=[product.id])
+                self.assertTemplateUsed(self.client.post(add), "select_size.html")
+
+
+@override_settings(EVENTS_ENABLED=True, EVENTS_FLUSH_SECONDS=0)
+class ClickstreamTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        accessories = Category.objects.create(name="Accessories", slug="accessories")
+        cls.belt = Product.objects.create(category=accessories, title="Belt", slug="belt", price=300)
+        cls.cap = Product.objects.create(category=accessories, title="Cap", slug="cap", price=200)
+
+    def setUp(self):
+        events.flush()
+
+    def test_views_searches_and_cart_adds_are_buffered_then_written(self):
+        url = reverse("product_detail", args=["belt"])
+        self.client.get(url)
+        etag = self.client.get(url)["ETag"]
+        # answered with 304, still a view
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.client.get(reverse("search"), {"q": "Belt"})
+        self.client.post(reverse("add_to_cart", args=[self.cap.id]))
+        # only adds are cart events
+        self.assertEqual(self.client.get(reverse("remove_from_cart", args=["missing"])).status_code, 302)
+        self.assertFalse(ClickEvent.objects.exists())
+
+        self.assertEqual(events.flush(), 5)
+        self.assertEqual(list(ClickEvent.objects.order_by("id").values_list("kind", "product__slug", "query")), [
+            ("view", "belt", ""), ("view", "belt", ""), ("view", "belt", ""),
+            ("search", None, "Belt"), ("cart", "cap", ""),
+        ])
+
+        rankings.update()
+        self.assertEqual([product.slug for product in rankings.ranked("trending")], ["cap", "belt"])
+
+    def test_compaction_rolls_up_finished_days(self):
+        yesterday = timezone.now() - timedelta(days=1)
+        old = timezone.now() - timedelta(days=5)
+        ClickEvent.objects.bulk_create([
+            ClickEvent(kind="view", product=self.belt, session_key="a", created_at=yesterday),
+            ClickEvent(kind="view", product=self.belt, session_key="a", created_at=yesterday),
+            ClickEvent(kind="view", product=self.belt, session_key="b", created_at=yesterday),
+            ClickEvent(kind="cart", product=self.belt, session_key="b", created_at=yesterday),
+            ClickEvent(kind="search", query="Belt", created_at=yesterday),
+            ClickEvent(kind="search", query="belt", created_at=yesterday),
+            ClickEvent(kind="view", product=self.cap, created_at=old),
+            ClickEvent(kind="view", product=self.cap, created_at=timezone.now()),
+        ])
+        events.compact(keep_days=2)
+        events.compact(keep_days=2)
+
+        day = timezone.localdate(yesterday)
+        self.assertEqual(
+            list(DailyProductEvents.objects.filter(day=day).values_list("product__slug", "views", "viewers", "cart_adds")),
+            [("belt", 3, 2, 1)],
+        )
+        self.assertEqual(list(DailySearch.objects.filter(day=day).values_list("query", "searches")), [("belt", 2)])
+        self.assertTrue(DailyProductEvents.objects.filter(day=timezone.localdate(old), product=self.cap).exists())
+        # the old day's raw rows are gone, today's are untouched
+        self.assertEqual(ClickEvent.objects.filter(product=self.cap).count(), 1)
+
+
+class CatalogApiTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.shoes = Category.objects.create(name="Footwear", slug="footwear")
+        for n, price in enumerate([500, 300, 300, 900, 100]):
+            Product.objects.create(category=cls.shoes, title=f"Runner {n}", slug=f"runner-{n}", price=price, brand="Urbano")
+
+    def setUp(self):
+        cache.clear()
+
+    def test_sparse_fields(self):
+        response = self.client.get(reverse("api_products"), {"fields": "slug,price,category", "limit": 1})
+        self.assertEqual(response.json()["results"], [
+            {"slug": "runner-4", "price": "100.00", "category": {"slug": "footwear", "name": "Footwear"}},
+        ])
+        self.assertEqual(self.client.get(reverse("api_products"), {"fields": "slug,secret"}).status_code, 400)
+
+    def test_cursor_walks_every_product_once(self):
+        slugs, url, params = [], reverse("api_products"), {"ordering": "price", "limit": 2, "fields": "slug"}
+        while url:
+            page = self.client.get(url, params).json()
+            slugs += [row["slug"] for row in page["results"]]
+            url, params = page["next"], None
+        # ties on price broken by id
+        self.assertEqual(slugs, ["runner-4", "runner-1", "runner-2", "runner-0", "runner-3"])
+        bad = self.client.get(reverse("api_products"), {"cursor": "not-a-cursor"})
+        self.assertEqual(bad.status_code, 400)
+
+    def test_crafted_cursors_and_prices_are_rejected(self):
+        cursor = api._encode_cursor
+        for params in [
+            {"cursor": cursor(["abc"])},
+            {"cursor": cursor([2 ** 64])},
+            {"cursor": cursor(["abc", 1]), "ordering": "price"},
+            {"cursor": cursor(["NaN", 1]), "ordering": "price"},
+            {"cursor": cursor([{"a": 1}, 1]), "ordering": "price"},
+            {"cursor": cursor({"a": 1})},
+            {"min_price": "nan"},
+            {"max_price": "Infinity"},
+            {"min_price": "1e40"},
+        ]:
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(reverse("api_products"), params).status_code, 400)
+        page = self.client.get(reverse("api_products"), {"cursor": cursor(["300.00", 2]), "ordering": "price",
+                                                          "min_price": " 1e2 ", "fields": "slug"})
+        self.assertEqual([row["slug"] for row in page.json()["results"]], ["runner-2", "runner-0", "runner-3"])
+
+    def test_lists_are_gzipped(self):
+        response = self.client.get(reverse("api_products"), HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+
+    def test_detail_is_cached_and_revalidated(self):
+        url = reverse("api_product", args=["runner-0"])
+        response = self.client.get(url, {"fields": "title,brand"})
+        self.assertEqual(response.json(), {"title": "Runner 0", "brand": "Urbano"})
+        self.assertEqual(response["Cache-Control"], "no-cache, public")
+        self.assertEqual(self.client.get(url, {"fields": "title,brand"}, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+
+        with self.assertNumQueries(1):  # the ETag stamp only
+            self.assertEqual(self.client.get(url, {"fields": "title"}).json(), {"title": "Runner 0"})
+        Product.objects.filter(slug="runner-0").update(title="Trail 0")
+        Category.objects.get(slug="footwear").save()
+        self.assertEqual(self.client.get(url, {"fields": "title"}).json(), {"title": "Trail 0"})
+        self.assertEqual(self.client.get(reverse("api_product", args=["nope"])).status_code, 404)
+
+    @override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}})
+    def test_detail_without_a_cache(self):
+        url = reverse("api_product", args=["runner-1"])
+        self.assertEqual(self.client.get(url, {"fields": "slug,price"}).json(), {"slug": "runner-1", "price": "300.00"})
+
+
+@override_settings(RATE_LIMITS={"search": (2, 0.5), "api_search": (2, 0.5)})
+class RateLimitTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_excess_requests_get_429_before_any_query(self):
+        search = reverse("search")
+        for _ in range(2):
+            self.assertEqual(self.client.get(search, {"q": "x"}).status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(search, {"q": "x"})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "2")
+        self.assertEqual(len(queries), 0)
+        # buckets are per URL name and per address
+        self.assertEqual(self.client.get(reverse("api_search"), {"q": "x"}).status_code, 200)
+        self.assertEqual(self.client.get(search, {"q": "x"}, REMOTE_ADDR="10.0.0.2").status_code, 200)
+
+    def test_logged_in_user_is_limited_across_addresses(self):
+        self.client.force_login(User.objects.create_user("bot", password="pw"))
+        for n in range(2):
+            self.client.get(reverse("search"), REMOTE_ADDR=f"10.0.1.{n}")
+        self.assertEqual(self.client.get(reverse("search"), REMOTE_ADDR="10.0.1.9").status_code, 429)
+
+    def test_ip_refused_before_its_session_is_loaded(self):
+        self.client.force_login(User.objects.create_user("bot", password="pw"))
+        for _ in range(2):
+            self.client.get(reverse("search"))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(reverse("search")).status_code, 429)
+        self.assertEqual(len(queries), 0)
+
+    def test_buckets_refill_and_survive_a_cache_outage(self):
+        self.assertEqual([ratelimit.take("k", 2, 0.5, now=100) for _ in range(3)], [0, 0, 2.0])
+        self.assertEqual(ratelimit.take("k", 2, 0.5, now=102), 0)
+        with mock.patch.object(ratelimit, "cache") as broken, self.assertLogs("urbano.ratelimit", "WARNING"):
+            broken.get.side_effect = ConnectionError
+            self.assertEqual([ratelimit.take("k", 1, 1, now=100) for _ in range(2)], [0, 1.0])
+
+
+class SweeperTests(TestCase):
+
+    def test_sweeps_old_carts_sessions_and_unpaid_orders_only(self):
+        user = User.objects.create_user("shopper", password="pw")
+        tee = Product.objects.create(title="Tee", slug="tee", price=500)
+        cap = Product.objects.create(title="Cap", slug="cap", price=200)
+        old = timezone.now() - timedelta(days=40)
+        CartItem.objects.create(user=user, product=tee, quantity=1)
+        stale_cart = CartItem.objects.create(user=user, product=cap, quantity=1)
+        CartItem.objects.filter(pk=stale_cart.pk).update(updated_at=old)
+
+        def order(**fields):
+            created = Order.objects.create(user=user, fullname="S", phone="1", address="a", city="c", state="s",
+                                           pincode="500001", **fields)
+            Order.objects.filter(pk=created.pk).update(created_at=old)
+            OrderItem.objects.create(order=created, product=tee, price=500)
+            return created
+
+        abandoned = order(payment_method="razorpay")
+        paid = order(payment_method="razorpay", is_paid=True, payment_id="pay_1")
+        cod = order(payment_method="cod")
+        recent = Order.objects.create(user=user, fullname="S", phone="1", address="a", city="c", state="s",
+                                      pincode="500001", payment_method="razorpay")
+        self.client.force_login(user)
+        Session.objects.update(expire_date=old)
+
+        run = sweeper.sweep(batch_size=1)
+        self.assertEqual((run.carts, run.sessions, run.orders, run.last_order_id), (1, 1, 1, cod.pk))
+        self.assertEqual(list(CartItem.objects.values_list("product__slug", flat=True)), ["tee"])
+        self.assertEqual(set(Order.objects.values_list("pk", flat=True)), {paid.pk, cod.pk, recent.pk})
+        self.assertFalse(OrderItem.objects.filter(order_id=abandoned.pk).exists())
+
+        # the next run starts after the orders this one checked
+        Order.objects.filter(pk=recent.pk).update(created_at=old)
+        run = sweeper.sweep()
+        self.assertEqual((run.orders, run.last_order_id), (1, recent.pk))
+        self.assertEqual(SweepRun.objects.count(), 2)
+
+
+@override_settings(ROOT_URLCONF=AsyncUrls, PAYMENT_GATEWAY_STUB=True, PAYMENT_GATEWAY_STUB_LATENCY_MS=0)
+class AsyncViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.clothing = Category.objects.create(name="Clothing", slug="clothing")
+        cls.shirt = Product.objects.create(category=cls.clothing, title="Linen Shirt", slug="linen-shirt",
+                                           price=500, old_price=1000)
+        cls.tee = Product.objects.create(category=cls.clothing, title="Plain Tee", slug="plain-tee", price=300)
+        ProductVariant.objects.create(product=cls.shirt, size="M")
+
+    def setUp(self):
+        registry.invalidate()
+
+    async def test_product_page_through_async_middleware(self):
+        url = reverse("product_detail", args=["linen-shirt"])
+        await self.async_client.get(url)  # sets the CSRF cookie, part of the ETag
+        response = await self.async_client.get(url)
+        self.assertContains(response, "Linen Shirt")
+        self.assertRegex(response["Server-Timing"], r'desc="[1-9]\d* queries"')
+        revalidated = await self.async_client.get(url, headers={"if-none-match": response["ETag"]})
+        self.assertEqual(revalidated.status_code, 304)
+
+    async def test_listings(self):
+        response = await self.async_client.get(reverse("category_products", args=["clothing"]), {"sort": "discount"})
+        self.assertEqual([p.slug for p in response.context["products"]], ["linen-shirt", "plain-tee"])
+        self.assertEqual(list(response.context["sizes"]), ["M"])
+        response = await self.async_client.get(reverse("search"), {"q": "tee"})
+        self.assertEqual([p.slug for p in response.context["products"]], ["plain-tee"])
+
+    async def test_payment_creates_order_through_async_gateway(self):
+        user = await User.objects.acreate_user("buyer", password="pw")
+        await CartItem.objects.acreate(user=user, product=self.shirt, size="M", quantity=2)
+        await self.async_client.aforce_login(user)
+        response = await self.async_client.post(reverse("payment"), {
+            "fullname": "B", "phone": "1", "address": "a", "city": "c", "state": "s", "pincode": "500001",
+            "delivery_method": "express", "payment_method": "rzp",
+        })
+        self.assertTrue(response.context["razorpay_order_id"].startswith("order_stub_"))
+        order = await Order.objects.aget(user=user)
+        self.assertEqual((order.total_price, order.delivery_days), (1000, 2))
+        self.assertEqual(await OrderItem.objects.filter(order=order, size="M", quantity=2).acount(), 1)
+
+    @override_settings(PAYMENT_GATEWAY_STUB=False, RAZORPAY_KEY_ID="key", RAZORPAY_KEY_SECRET="secret")
+    async def test_gateway_client_is_shared_per_loop_and_closed(self):
+        http = gateway.get_async_client().order.http
+        self.assertIs(gateway.get_async_client().order.http, http)
+        await gateway.aclose()
+        self.assertTrue(http.is_closed)
+        self.assertIsNot(gateway.get_async_client().order.http, http)
+        await gateway.aclose()
+
+
+class WarmupTests(TestCase):
+
+    @override_settings(WARMUP=False)
+    def test_warms_urls_templates_and_registry(self):
+        self.assertIsNone(warmup.run())
+        Category.objects.create(name="Clothing", slug="clothing")
+        registry.invalidate()
+        with mock.patch.object(warmup.connections, "close_all") as close_all, \
+                self.assertLogs("urbano.warmup", "INFO") as logs:
+            report = warmup.run(force=True)
+        self.assertIn("warm-up total", logs.output[-1])
+        details = {name: detail for name, _, detail in report}
+        self.assertNotIn("failed", details.values())
+        self.assertRegex(details["templates"], r"^[1-9]\d* templates$")
+        self.assertEqual(details["catalog"], "1 categories")
+        self.assertEqual(warmup.REPORT, report)
+        close_all.assert_called_once()
+
+
+class MediaTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root.name))
+        self.media_root = media_root.name
+        self.product = Product.objects.create(title="Tee", slug="tee", price=500)
+
+    def upload(self, content, name="photo.JPG"):
+        return ProductImage.objects.create(product=self.product, image=SimpleUploadedFile(name, content))
+
+    def test_identical_uploads_are_stored_once(self):
+        first, second = self.upload(b"same bytes"), self.upload(b"same bytes", "other.jpg")
+        other = self.upload(b"different bytes")
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertNotEqual(first.image.name, other.image.name)
+        self.assertTrue(media.is_hashed(first.image.name))
+        self.assertRegex(first.image.name, r"^products/multiple/[0-9a-f]{2}/[0-9a-f]{40}\.jpg$")
+        stored = [name for _, _, names in os.walk(self.media_root) for name in names]
+        self.assertEqual(len(stored), 2)
+
+    def test_serves_hashed_files_as_immutable(self):
+        name = self.upload(b"jpeg bytes").image.name
+        response = self.client.get(reverse("media", args=[name]))
+        self.assertEqual(b"".join(response.streaming_content), b"jpeg bytes")
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+        self.assertEqual(response["Cache-Control"], "public, max-age=31536000, immutable")
+        with override_settings(MEDIA_SERVE="nginx", MEDIA_ACCEL_PREFIX="/protected-media/"):
+            response = self.client.get(reverse("media", args=[name]))
+        self.assertEqual(response["X-Accel-Redirect"], f"/protected-media/{name}")
+        self.assertEqual(response.content, b"")
+        self.assertEqual(self.client.get("/media/../manage.py").status_code, 404)
+        self.assertEqual(self.client.get(reverse("media", args=["products/missing.jpg"])).status_code, 404)
+
+    def test_hash_media_moves_existing_files(self):
+        os.makedirs(os.path.join(self.media_root, "products", "multiple"))
+        for name in ("a.png", "b.png"):
+            with open(os.path.join(self.media_root, "products", "multiple", name), "wb") as fh:
+                fh.write(b"duplicate")
+        for name in ("a.png", "a.png", "b.png", "gone.png"):
+            ProductImage.objects.create(product=self.product, image=f"products/multiple/{name}")
+
+        call_command("hash_media", stdout=io.StringIO())
+        names = set(ProductImage.objects.exclude(image__endswith="gone.png").values_list("image", flat=True))
+        self.assertEqual(len(names), 1)
+        self.assertTrue(media.is_hashed(names.pop()))
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, "products", "multiple", "a.png")))
+
+
+class ServiceabilityTests(TestCase):
+    CSV = [
+        "start,end,zone,standard_days,express_days",
+        "560001,560099,Bengaluru,3,1",
+        "500001,500099,Hyderabad,4,2",
+        "799001,799999,North East,9,",
+    ]
+
+    def setUp(self):
+        serviceability.replace(serviceability.parse(self.CSV))
+        self.addCleanup(serviceability.invalidate)
+
+    def test_lookup_by_range(self):
+        self.assertEqual(serviceability.delivery_days("500001", "express"), 2)
+        self.assertEqual(serviceability.delivery_days("500099", "standard"), 4)
+        self.assertEqual(serviceability.delivery_days("799500", "standard"), 9)
+        self.assertIsNone(serviceability.delivery_days("799500", "express"))
+        self.assertIsNone(serviceability.delivery_days("500100", "standard"))
+        self.assertIsNone(serviceability.delivery_days("100000", "standard"))
+        self.assertIsNone(serviceability.delivery_days("50001", "standard"))
+        self.assertIsNone(serviceability.delivery_days("500001", "zone"))
+        self.assertEqual(len(serviceability.index().zones), 3)
+
+    def test_parse_rejects_overlaps_and_bad_rows(self):
+        with self.assertRaisesMessage(ValueError, "overlap"):
+            serviceability.parse(self.CSV + ["560050,560200,Bengaluru,3,1"])
+        with self.assertRaisesMessage(ValueError, "line 2"):
+            serviceability.parse([self.CSV[0], "560001,abc,Bengaluru,3,1"])
+
+    def test_admin_edits_are_validated_like_imports(self):
+        PincodeRange.objects.create(start=100000, end=200000, zone="Wide", standard_days=5)
+        for start, end in [(150000, 160000), (90000, 95000), (300000, 299999), (560050, 560200)]:
+            with self.subTest(start=start, end=end), self.assertRaises(ValidationError):
+                PincodeRange(start=start, end=end, zone="Z", standard_days=3).full_clean()
+        existing = PincodeRange.objects.get(start=560001)
+        existing.end = 560050
+        existing.full_clean()
+
+    def test_empty_table_keeps_fixed_days(self):
+        serviceability.replace([])
+        self.assertEqual(serviceability.delivery_days("799500", "express"), 2)
+
+    def test_api_lookup(self):
+        data = self.client.get(reverse("api_pincode", args=["799001"])).json()
+        self.assertEqual(data, {"pincode": "799001", "serviceable": True, "zone": "North East",
+                                "delivery_days": {"standard": 9, "express": None}})
+        self.assertFalse(self.client.get(reverse("api_pincode", args=["110001"])).json()["serviceable"])
+        self.assertEqual(self.client.get(reverse("api_pincode", args=["abc"])).status_code, 400)
+
+    def test_payment_uses_zone_days_and_refuses_unserviceable(self):
+        user = User.objects.create_user("buyer", password="pw")
+        CartItem.objects.create(user=user, product=Product.objects.create(title="Tee", slug="tee", price=300))
+        self.client.force_login(user)
+        form = {"fullname": "B", "phone": "1", "address": "a", "city": "c", "state": "s",
+                "payment_method": "cod"}
+
+        for method in ("express", "zone", "drone"):
+            response = self.client.post(reverse("payment"), {**form, "pincode": "799500", "delivery_method": method})
+            self.assertRedirects(response, reverse("checkout"), fetch_redirect_response=False)
+        self.assertFalse(Order.objects.exists())
+
+        self.client.post(reverse("payment"), {**form, "pincode": "799500", "delivery_method": "standard"})
+        self.assertEqual(Order.objects.get().delivery_days, 9)
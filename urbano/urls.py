@@ -1,18 +1,22 @@
+from django.conf import settings
 from django.urls import path
 from django.contrib.auth import views as auth_views
-from . import views
+from . import api, async_views, media, views
+
+# under ASGI (settings.ASYNC_VIEWS) these views are the async ones
+served = async_views if settings.ASYNC_VIEWS else views
 
 urlpatterns = [
     path('', views.home, name='home'),
     #Auth
     path('signup/', views.signup_view, name='signup'),
-    path('login/', auth_views.LoginView.as_view(template_name='templates/login.html'), name='login'),
+    path('login/', auth_views.LoginView.as_view(template_name='registration/login.html'), name='login'),
     path('logout/', views.safe_logout, name='logout'),
     path('account/', views.account, name='account'),
     # category pages
     path("categories/", views.categories, name="categories"),
-    path("category/<slug:slug>/", views.category_products, name="category_products"),
-    path('product/<slug:slug>/', views.product_detail, name='product_detail'),
+    path("category/<slug:slug>/", served.category_products, name="category_products"),
+    path('product/<slug:slug>/', served.product_detail, name='product_detail'),
     # trending pages
     path("best-sellers/", views.best_sellers, name="best_sellers"),
     path("new-arrivals/", views.new_arrivals, name="new_arrivals"),
@@ -26,11 +30,11 @@ urlpatterns = [
     #cart
     path("add-to-cart/<int:product_id>/", views.add_to_cart, name="add_to_cart"),
     path("cart/", views.cart, name="cart"),
-    path("search/", views.search_products, name="search"),
+    path("search/", served.search_products, name="search"),
     path("update-cart/<str:key>/", views.update_cart, name="update_cart"),
     path("remove-cart/<str:key>/", views.remove_from_cart, name="remove_from_cart"),
     path("checkout/", views.checkout, name="checkout"),
-    path("payment/", views.payment, name="payment"),
+    path("payment/", served.payment, name="payment"),
     path("payment-callback/", views.payment_callback, name="payment_callback"),
     path("order-success/<str:order_id>/", views.order_success, name="order_success"),
     path("payment-failed/", views.payment_failed, name="payment_failed"),
@@ -38,6 +42,15 @@ urlpatterns = [
     path("cancel-order/<int:order_id>/", views.cancel_order, name="cancel_order"),
     path("about-us/", views.about, name="about"),
     path("contact/", views.contact_view, name="contact"),
+    path("metrics/", views.metrics, name="metrics"),
+    # JSON catalog API
+    path("api/categories/", api.categories, name="api_categories"),
+    path("api/products/", api.products, name="api_products"),
+    path("api/products/<slug:slug>/", api.product, name="api_product"),
+    path("api/search/", api.search, name="api_search"),
+    path("api/pincodes/<str:pincode>/", api.pincode, name="api_pincode"),
+    # uploads, by content hash; see urbano/media.py
+    path(settings.MEDIA_URL.lstrip("/") + "<path:path>", media.serve, name="media"),
 ]
 
 
@@ -7,10 +7,15 @@ from django.conf import settings
 from django.contrib import messages
 from django.core.mail import send_mail
 from django.views.decorators.csrf import csrf_exempt
-import razorpay
-from .models import Product, Category, Order, OrderItem, ContactMessage, CartItem
-from django.db.models import Q
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from .conditional import catalog_condition
+from .gateway import get_client
+from . import events, rankings, recommendations, registry, serviceability
+from .metrics import REGISTRY
+from .models import Product, ProductVariant, Order, OrderItem, ContactMessage, CartItem, in_stock_size
+from django.db.models import Min, Q, prefetch_related_objects
 from django.utils import timezone
+from decimal import Decimal, InvalidOperation
 
 # Create your views here.
 @require_http_methods(["GET", "POST"])
@@ -28,18 +33,27 @@ FIXED_CATEGORY_SLUGS = [
     "health-beauty",
 ]
 
+@catalog_condition("catalog")
 def home(request):
+    categories = {slug: registry.get(slug) for slug in FIXED_CATEGORY_SLUGS}
+    top_sellers = rankings.top_per_category("best_sellers", [c.pk for c in categories.values() if c])
     hero_categories = []
     for slug in FIXED_CATEGORY_SLUGS:
-        category = get_object_or_404(Category, slug=slug)
-        product = Product.objects.filter(category=category).first()
+        category = categories[slug]
+        if category is None:
+            raise Http404(f"No category {slug}")
+        # the category's best seller, or any product before its first sale
+        product = (
+            top_sellers.get(category.pk)
+            or Product.objects.filter(category_id=category.id).prefetch_related("images").first()
+        )
         if product:
             hero_categories.append({
                 "category": category,
                 "product": product
             })
-    new_arrivals = Product.objects.all().order_by('-id')[:4]
-    trending = Product.objects.filter(is_best_seller=True)[:3]
+    new_arrivals = rankings.ranked("new_arrivals", limit=4).prefetch_related("images")
+    trending = rankings.ranked("trending", limit=3).prefetch_related("images")
     context = {
         "hero_categories":hero_categories,
         "new_arrivals": new_arrivals,
@@ -63,33 +77,53 @@ def account(request):
     return render(request, 'account.html')
 
 
+@catalog_condition("catalog")
 def categories(request):
-    categories = Category.objects.filter(
-        slug__in=FIXED_CATEGORY_SLUGS
-    ).order_by("name")
+    categories = [c for c in registry.entries() if c.slug in FIXED_CATEGORY_SLUGS]
 
     context = {
         "categories": categories
     }
     return render(request, "categories.html", context)
 
+@catalog_condition("category")
 def category_products(request, slug):
 
-    category = get_object_or_404(Category, slug=slug)
-    products = Product.objects.filter(category=category)
+    category = registry.get(slug)
+    if category is None:
+        raise Http404(f"No category {slug}")
+    products, brands = listing(request, Product.objects.filter(category_id=category.id))
+
+    return render(request, "category_products.html", {
+        "category": category,
+        "products": products,
+        "brands": brands,
+        "sizes": category_sizes(category) if category.requires_size else [],
+        "page_title": category.name,
+    })
 
-    # filters
-    min_price = request.GET.get("min_price")
-    max_price = request.GET.get("max_price")
+def _price(value):
+    try:
+        price = Decimal(value)
+    except InvalidOperation:
+        return None
+    return price if price.is_finite() else None
+
+def listing_filters(request, products):
+    """Price, brand and size filters plus every sort but discount, which listing() applies."""
+    min_price = _price(request.GET.get("min_price") or "")
+    max_price = _price(request.GET.get("max_price") or "")
     brand = request.GET.get("brand")
     sort = request.GET.get("sort")
 
-    if min_price:
+    if min_price is not None:
         products = products.filter(price__gte=min_price)
-    if max_price:
+    if max_price is not None:
         products = products.filter(price__lte=max_price)
     if brand and brand != "all":
         products = products.filter(brand__iexact=brand)
+    if request.GET.get("size"):
+        products = products.filter(in_stock_size(request.GET["size"]))
 
     if sort == "low_to_high":
         products = products.order_by("price")
@@ -97,50 +131,32 @@ def category_products(request, slug):
         products = products.order_by("-price")
     elif sort == "newest":
         products = products.order_by("-id")
-    elif sort == "discount":
+    return products
+
+def listing(request, products):
+    """
+    The filtered, sorted ``products`` for a listing page and the brands among
+    them. Brands are read first: the discount sort happens in Python and
+    leaves a list.
+    """
+    # listing cards show the first image of every product
+    products = listing_filters(request, products.prefetch_related("images"))
+    brands = products.order_by().values_list("brand", flat=True).distinct()
+    if request.GET.get("sort") == "discount":
         products = sorted(products, key=lambda p: p.discount_percentage, reverse=True)
+    return products, brands
 
-    brands = products.values_list("brand", flat=True).distinct()
-
-    return render(request, "category_products.html", {
-        "category": category,
-        "products": products,
-        "brands": brands,
-        "page_title": category.name,
-    })
-
-def filter_and_sort_products(request, queryset):
-    # --- PRICE FILTER ---
-    min_price = request.GET.get("min_price")
-    max_price = request.GET.get("max_price")
-    if min_price:
-        queryset = queryset.filter(price__gte=min_price)
-    if max_price:
-        queryset = queryset.filter(price__lte=max_price)
-
-    # --- BRAND FILTER ---
-    brand = request.GET.get("brand")
-    if brand and brand != "all":
-        queryset = queryset.filter(brand=brand)
-
-    # --- SORTING ---
-    sort = request.GET.get("sort")
-    if sort == "low_to_high":
-        queryset = queryset.order_by("price")
-    elif sort == "high_to_low":
-        queryset = queryset.order_by("-price")
-    elif sort == "newest":
-        queryset = queryset.order_by("-id")
-    elif sort == "discount":
-        queryset = sorted(queryset, key=lambda p: p.discount_percentage, reverse=True)
-
-    return queryset
+def category_sizes(category):
+    return (
+        ProductVariant.objects.filter(product__category_id=category.id)
+        .values("size").annotate(first=Min("position")).order_by("first", "size")
+        .values_list("size", flat=True)
+    )
 
 #Trending pages
+@catalog_condition("catalog")
 def best_sellers(request):
-    products = Product.objects.filter(is_best_seller=True)
-    products = filter_and_sort_products(request, products)
-    brands = products.values_list("brand", flat=True).distinct()
+    products, brands = listing(request, rankings.ranked("best_sellers"))
 
     return render(request, "best_sellers.html", {
         "products": products,
@@ -148,10 +164,9 @@ def best_sellers(request):
         "page_title": "Best Sellers",
     })
 
+@catalog_condition("catalog")
 def new_arrivals(request):
-    products = Product.objects.order_by("-id")[:12]
-    products = filter_and_sort_products(request, products)
-    brands = products.values_list("brand", flat=True).distinct()
+    products, brands = listing(request, rankings.ranked("new_arrivals", limit=12))
 
     return render(request, "new_arrivals.html", {
         "products": products,
@@ -159,10 +174,9 @@ def new_arrivals(request):
         "page_title": "New Arrivals",
     })
 
+@catalog_condition("catalog")
 def on_sale(request):
-    products = Product.objects.filter(old_price__gt=0)
-    products = filter_and_sort_products(request, products)
-    brands = products.values_list("brand", flat=True).distinct()
+    products, brands = listing(request, Product.objects.filter(old_price__gt=0))
 
     return render(request, "on_sale.html", {
         "products": products,
@@ -171,10 +185,9 @@ def on_sale(request):
     })
 
 #Collections pages
+@catalog_condition("catalog")
 def summer_edit(request):
-    products = Product.objects.filter(tag="summer")
-    products = filter_and_sort_products(request, products)
-    brands = products.values_list("brand", flat=True).distinct()
+    products, brands = listing(request, Product.objects.filter(tag="summer"))
 
     return render(request, "summer_edit.html", {
         "products": products,
@@ -182,10 +195,9 @@ def summer_edit(request):
         "page_title": "Summer Edit",
     })
 
+@catalog_condition("catalog")
 def workspace(request):
-    products = Product.objects.filter(tag="workspace")
-    products = filter_and_sort_products(request, products)
-    brands = products.values_list("brand", flat=True).distinct()
+    products, brands = listing(request, Product.objects.filter(tag="workspace"))
 
     return render(request, "workspace.html", {
         "products": products,
@@ -193,10 +205,9 @@ def workspace(request):
         "page_title": "Workspace",
     })
 
+@catalog_condition("catalog")
 def gifts(request):
-    products = Product.objects.filter(tag="gift")
-    products = filter_and_sort_products(request, products)
-    brands = products.values_list("brand", flat=True).distinct()
+    products, brands = listing(request, Product.objects.filter(tag="gift"))
 
     return render(request, "gifts.html", {
         "products": products,
@@ -205,10 +216,9 @@ def gifts(request):
     })
 
 #Featured preview page
+@catalog_condition("catalog")
 def featured_product(request):
-    products = Product.objects.filter(is_featured=True)
-    products = filter_and_sort_products(request, products)
-    brands = products.values_list("brand", flat=True).distinct()
+    products, brands = listing(request, Product.objects.filter(is_featured=True))
     return render(request, "featured.html", {
         "products": products,
         "brands": brands,
@@ -216,10 +226,16 @@ def featured_product(request):
     })
 
 #product details page
+@catalog_condition("product")
 def product_detail(request, slug):
     product = get_object_or_404(Product, slug=slug)
     images = product.images.all()  # Fetch all related images
-    return render(request, "product_detail.html", {"product": product, "images": images})
+    return render(request, "product_detail.html", {
+        "product": product,
+        "images": images,
+        "variants": product.variants.all(),
+        "bought_together": recommendations.for_product(product.id),
+    })
 
 #cart
 def add_to_cart(request, product_id):
@@ -235,11 +251,13 @@ def add_to_cart(request, product_id):
     else:
         quantity = 1
     product = Product.objects.get(id=product_id)
-    # categories that require a size
-    categories_with_sizes = ["Clothing", "Footwear"]
-    # check if size was not sent but product requires size
-    size = request.POST.get("size")
-    if product.category.name in categories_with_sizes and not size:
+    # sized products need one of their in-stock sizes; others never carry one
+    # decided from the product's own variants: the registry may be a minute stale
+    size = request.POST.get("size") or None
+    prefetch_related_objects([product], "variants")
+    if not product.variants.all():
+        size = None
+    elif size not in product.size_list:
         # store quantity temporarily so it doesn't get lost
         request.session["pending_quantity"] = quantity
         return render(request, "select_size.html", {
@@ -254,6 +272,7 @@ def add_to_cart(request, product_id):
         )
         cart_item.quantity += quantity
         cart_item.save()
+        events.record_request(request, "cart", product_id=product.id)
         return redirect("cart")
     
     # Unique cart key → product + size
@@ -271,18 +290,23 @@ def add_to_cart(request, product_id):
         }
 
     request.session["cart"] = cart
+    events.record_request(request, "cart", product_id=product.id)
     return redirect("cart")
 
 def cart(request):
     if request.user.is_authenticated:
-        items = CartItem.objects.filter(user=request.user)
-        total_price = sum(i.product.price * i.quantity for i in items)
+        items = (
+            CartItem.objects.filter(user=request.user).select_related("product")
+            .prefetch_related("product__images", "product__variants")
+        )
+        total_price = sum(i.unit_price * i.quantity for i in items)
         total_items = sum(i.quantity for i in items)
 
         return render(request, "cart.html", {
             "cart_items": items,
             "total_price": total_price,
             "total_items": total_items,
+            "bought_together": recommendations.for_cart(i.product_id for i in items),
         })
     cart = request.session.get("cart", {})
     cart_items = []
@@ -290,13 +314,17 @@ def cart(request):
     total_price = 0
     total_items = 0
 
+    products = Product.objects.prefetch_related("images", "variants").in_bulk(
+        {int(key.split("-")[0]) for key in cart}
+    )
     for key, data in cart.items():
-        product_id = key.split("-")[0]
+        product_id = int(key.split("-")[0])
         qty = data.get("qty", 1)
         size = data.get("size", None)
 
-        product = Product.objects.get(id=product_id)
-        item_total = product.price * qty
+        product = products[product_id]
+        unit_price = product.price_for(size)
+        item_total = unit_price * qty
         total_price += item_total
         total_items += qty
 
@@ -305,56 +333,37 @@ def cart(request):
             "product": product,
             "quantity": qty,
             "size": size,
+            "unit_price": unit_price,
             "total": item_total
         })
 
     return render(request, "cart.html", {
         "cart_items": cart_items,
         "total_price": total_price,
-        "total_items": total_items
+        "total_items": total_items,
+        "bought_together": recommendations.for_cart(products),
     })
 
+@catalog_condition("catalog")
 def search_products(request):
     query = request.GET.get("q", "").strip()
+    products, brands = listing(request, search_queryset(query))
 
-    products = Product.objects.all()
+    return render(request, "search_results.html", {
+        "products": products,
+        "brands": brands,
+        "page_title": f"Search results for: {query}",
+    })
 
+def search_queryset(query):
+    products = Product.objects.prefetch_related("images")
     if query:
         products = products.filter(
             Q(title__icontains=query) |
             Q(short_description__icontains=query) |
             Q(brand__icontains=query)
         )
-
-    # Filters
-    min_price = request.GET.get("min_price")
-    max_price = request.GET.get("max_price")
-    brand = request.GET.get("brand")
-    sort = request.GET.get("sort")
-
-    if min_price:
-        products = products.filter(price__gte=min_price)
-    if max_price:
-        products = products.filter(price__lte=max_price)
-    if brand and brand != "all":
-        products = products.filter(brand__iexact=brand)
-
-    if sort == "low_to_high":
-        products = products.order_by("price")
-    elif sort == "high_to_low":
-        products = products.order_by("-price")
-    elif sort == "newest":
-        products = products.order_by("-id")
-    elif sort == "discount":
-        products = sorted(products, key=lambda p: p.discount_percentage, reverse=True)
-
-    brands = products.values_list("brand", flat=True).distinct()
-
-    return render(request, "search_results.html", {
-        "products": products,
-        "brands": brands,
-        "page_title": f"Search results for: {query}",
-    })
+    return products
 
 def update_cart(request, key):
     if request.method == "POST":
@@ -385,7 +394,7 @@ def remove_from_cart(request, key):
 
 @login_required(login_url='login')
 def checkout(request):
-    items = CartItem.objects.filter(user=request.user)
+    items = CartItem.objects.filter(user=request.user).select_related("product").prefetch_related("product__variants")
     if not items.exists():
         return redirect("cart")
 
@@ -400,7 +409,7 @@ def checkout(request):
             "pincode": "500000",
         }
 
-    total_price = sum(i.product.price * i.quantity for i in items)
+    total_price = sum(i.unit_price * i.quantity for i in items)
     total_items = sum(i.quantity for i in items)
 
     return render(request, "checkout.html", {
@@ -409,58 +418,59 @@ def checkout(request):
         "total_items": total_items,
     })
 
+UNSERVICEABLE = "Sorry, we can't deliver to that pincode by the chosen method."
+
+def order_fields(post, items, delivery_days):
+    """Order columns from the checkout form and the cart ``items``."""
+    return {
+        "fullname": post.get("fullname"),
+        "phone": post.get("phone"),
+        "address": post.get("address"),
+        "city": post.get("city"),
+        "state": post.get("state"),
+        "pincode": post.get("pincode"),
+        "delivery_method": post.get("delivery_method"),
+        "delivery_days": delivery_days,
+        "payment_method": post.get("payment_method"),
+        "total_price": sum(item.unit_price * item.quantity for item in items),
+        "is_paid": False,
+    }
+
+def order_lines(order, items):
+    return [
+        OrderItem(
+            order=order,
+            product=item.product,
+            quantity=item.quantity,
+            price=item.unit_price,
+            size=item.size,
+        )
+        for item in items
+    ]
+
 #Razorpay Order & Redirect to Payment Page
 def payment(request):
     if request.method != "POST":
         return redirect("checkout")
 
-    items = CartItem.objects.filter(user=request.user)
+    items = CartItem.objects.filter(user=request.user).select_related("product").prefetch_related("product__variants")
     if not items.exists():
         return redirect("cart")
 
-    fullname = request.POST.get("fullname")
-    phone = request.POST.get("phone")
-    address = request.POST.get("address")
-    city = request.POST.get("city")
-    state = request.POST.get("state")
-    pincode = request.POST.get("pincode")
-    delivery_method = request.POST.get("delivery_method")
-    if delivery_method == "standard":
-        delivery_days = 5
-    elif delivery_method == "express":
-        delivery_days = 2
-    payment_method = request.POST.get("payment_method")
-
-    # Calculate totals
-    total_price = 0
-    for item in items:
-        total_price += item.product.price * item.quantity
+    delivery_days = serviceability.delivery_days(request.POST.get("pincode"), request.POST.get("delivery_method"))
+    if delivery_days is None:
+        messages.error(request, UNSERVICEABLE)
+        return redirect("checkout")
+
+    fields = order_fields(request.POST, items, delivery_days)
+    payment_method = fields["payment_method"]
+    total_price = fields["total_price"]
 
     # Creating Order in DB
-    order = Order.objects.create(
-        user=request.user,
-        fullname=fullname,
-        phone=phone,
-        address=address,
-        city=city,
-        state=state,
-        pincode=pincode,
-        delivery_method=delivery_method,
-        delivery_days=delivery_days,
-        payment_method=payment_method,
-        total_price=total_price,
-        is_paid=False,
-    )
+    order = Order.objects.create(user=request.user, **fields)
 
     # Save Order Items
-    for item in items:
-        OrderItem.objects.create(
-            order=order,
-            product=item.product,
-            quantity=item.quantity,
-            price=item.product.price,
-            size=item.size,  
-        )
+    OrderItem.objects.bulk_create(order_lines(order, items))
 
     if request.user.username == "demo@example.com":
         # Do not trigger Razorpay
@@ -481,7 +491,7 @@ def payment(request):
         return redirect("order_success", order_id=order.id)
 
     # RAZORPAY FLOW -------------------------
-    client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
+    client = get_client()
 
     razorpay_order = client.order.create({
         "amount": int(total_price * 100), 
@@ -509,7 +519,7 @@ def payment_callback(request):
 
         order = Order.objects.get(razorpay_order_id=order_id)
 
-        client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
+        client = get_client()
 
         try:
             client.utility.verify_payment_signature({
@@ -539,7 +549,7 @@ def payment_failed(request):
 
 @login_required(login_url='login')
 def my_orders(request):
-    orders = Order.objects.filter(user=request.user).order_by('-created_at')
+    orders = Order.objects.filter(user=request.user).order_by('-created_at').prefetch_related("items__product__images")
     return render(request, "my_orders.html", {"orders": orders})
 
 @login_required(login_url='login')
@@ -581,3 +591,9 @@ def contact_view(request):
         return redirect("contact")
 
     return render(request, "contact.html")
+
+def metrics(request):
+    # checked in this order so a scraper on an allowed IP never touches the session
+    if request.META.get("REMOTE_ADDR") not in settings.METRICS_ALLOWED_IPS and not request.user.is_staff:
+        return HttpResponseForbidden()
+    return HttpResponse(REGISTRY.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
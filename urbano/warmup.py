@@ -0,0 +1,111 @@
+"""
+Worker warm-up, run by urbano_cart/wsgi.py and asgi.py once the
+application is built and before the server hands it any traffic.
+
+Without it the first requests a worker serves pay for importing the views
+and the razorpay/requests chain, building the URL resolver, compiling
+every template they touch and loading the category registry and the
+pincode index. Each step is timed and the report logged under
+"urbano.warmup"; ``warmup`` prints it.
+
+With ``gunicorn --preload`` this runs once in the master and the workers
+fork already warm. Database connections are closed at the end so no
+worker inherits the master's.
+"""
+
+import importlib
+import logging
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.template import engines
+from django.template.loaders.cached import Loader as CachedLoader
+
+logger = logging.getLogger(__name__)
+
+# in the order they'd otherwise be imported, so each shows its own cost
+IMPORTS = ["requests", "razorpay", "urbano.gateway", "urbano_cart.urls"]
+
+# last report of this process: [(step, milliseconds, detail)]
+REPORT = []
+
+
+def _import(name):
+    def step():
+        importlib.import_module(name)
+    return step
+
+
+def _urls():
+    from django.urls import resolve, reverse
+
+    reverse("home")  # fills the reverse lookup tables
+    resolve(reverse("product_detail", args=["warmup"]))
+    return ""
+
+
+def _templates():
+    engine = engines["django"].engine
+    if not isinstance(engine.template_loaders[0], CachedLoader):
+        return "skipped, cached loader off"
+    # the project's own templates; admin ones are left to compile on use
+    compiled = 0
+    for directory in map(Path, engine.dirs):
+        for path in directory.rglob("*.html"):
+            engine.get_template(path.relative_to(directory).as_posix())
+            compiled += 1
+    return f"{compiled} templates"
+
+
+def _catalog():
+    from . import pagecache, registry
+
+    pagecache.version()
+    return f"{len(registry.entries())} categories"
+
+
+def _serviceability():
+    from . import serviceability
+
+    return f"{len(serviceability.index())} pincode ranges"
+
+
+def steps():
+    """(name, callable) pairs; a callable may return a detail string."""
+    imports = IMPORTS + (["httpx"] if settings.ASYNC_VIEWS else [])
+    return [(f"import {name}", _import(name)) for name in imports] + [
+        ("urls", _urls),
+        ("templates", _templates),
+        ("catalog", _catalog),
+        ("serviceability", _serviceability),
+    ]
+
+
+def run(started=None, force=False):
+    """
+    Warm this process up and return the report. ``started`` is a
+    perf_counter() taken before Django was set up, reported as "setup".
+    """
+    if not (settings.WARMUP or force):
+        return None
+    report = []
+    if started is not None:
+        report.append(("setup", (time.perf_counter() - started) * 1000, "settings, apps, middleware"))
+    for name, step in steps():
+        step_started = time.perf_counter()
+        try:
+            detail = step() or ""
+        except Exception:
+            # a cold worker still beats one that won't start
+            logger.exception("warm-up step %s failed", name)
+            detail = "failed"
+        report.append((name, (time.perf_counter() - step_started) * 1000, detail))
+    connections.close_all()
+
+    REPORT[:] = report
+    for name, ms, detail in report:
+        logger.info("warm-up %-24s %8.1f ms  %s", name, ms, detail)
+    logger.info("warm-up total %.1f ms", sum(ms for _, ms, _ in report))
+    return report
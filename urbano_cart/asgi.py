@@ -8,9 +8,58 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
 
 import os
+import time
 
-from django.core.asgi import get_asgi_application
+started = time.perf_counter()
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'urbano_cart.settings')
+# the async catalog, search and payment views; see ASYNC_VIEWS in settings
+os.environ.setdefault('ASYNC_VIEWS', '1')
+
+from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
+from django.core.asgi import get_asgi_application
+from django.http import HttpResponseNotFound
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+
+class StaticFiles(ASGIStaticFilesHandler):
+    """WhiteNoise, in front of Django instead of in its middleware chain."""
+
+    def __init__(self, application):
+        super().__init__(application)
+        self.whitenoise = WhiteNoiseMiddleware(lambda request: HttpResponseNotFound())
+
+    def serve(self, request):
+        return self.whitenoise(request)
+
+
+class Lifespan:
+    """
+    Answers the ASGI lifespan protocol, which Django refuses, and closes
+    the payment gateway's httpx connections when the server shuts down.
+    """
+
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "lifespan":
+            return await self.application(scope, receive, send)
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await gateway.aclose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
 
 application = get_asgi_application()
+if os.environ['ASYNC_VIEWS'] == '1':
+    application = StaticFiles(application)
+application = Lifespan(application)
+
+from urbano import gateway, warmup  # noqa: E402
+
+warmup.run(started)
@@ -12,8 +12,13 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 from dotenv import load_dotenv
+import math
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
+from .db import replica_databases, sqlite_options
+
 load_dotenv()
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -46,15 +51,87 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # serve static files before sessions, auth and CSRF run
+    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'urbano.middleware.InstrumentationMiddleware',
+    'urbano.middleware.SlowRequestProfilerMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'urbano.middleware.ReplicaPinMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    # before the page cache, so cached search pages are limited too
+    'urbano.middleware.RateLimitMiddleware',
+    'urbano.middleware.ClickstreamMiddleware',
+    'urbano.middleware.PageCacheMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
 ]
 
+# Set by urbano_cart/asgi.py: the catalog, search and payment URLs go to
+# urbano/async_views.py. WhiteNoise is sync-only middleware, which would
+# put every request back on one thread, so asgi.py serves static files
+# ahead of the middleware chain instead.
+ASYNC_VIEWS = os.getenv("ASYNC_VIEWS", "0") == "1"
+if ASYNC_VIEWS:
+    MIDDLEWARE.remove('whitenoise.middleware.WhiteNoiseMiddleware')
+
+# Per-view histograms, scraped from /metrics/ in Prometheus text format by
+# staff users and METRICS_ALLOWED_IPS. Never list the reverse proxy's own
+# address: every proxied request comes from it. The Server-Timing header
+# (SQL counts and timings) goes to those IPs, or to everyone with SERVER_TIMING.
+INSTRUMENTATION_ENABLED = os.getenv("INSTRUMENTATION_ENABLED", "1") == "1"
+METRICS_ALLOWED_IPS = [ip.strip() for ip in os.getenv("METRICS_ALLOWED_IPS", "").split(",") if ip.strip()]
+SERVER_TIMING = os.getenv("SERVER_TIMING", "1" if DEBUG else "0") == "1"
+
+# Opt-in sampling profiler: stacks + SQL of requests slower than the
+# threshold (or a random fraction of all) land in PROFILE_DIR.
+SLOW_REQUEST_PROFILING = os.getenv("SLOW_REQUEST_PROFILING", "0") == "1"
+SLOW_REQUEST_THRESHOLD_MS = float(os.getenv("SLOW_REQUEST_THRESHOLD_MS", "1000"))
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", BASE_DIR / "profiles"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "200"))
+
+# Shared by every worker when REDIS_URL is set (needs the redis package);
+# otherwise each process keeps its own in-memory cache.
+REDIS_URL = os.getenv("REDIS_URL")
+CACHES = {
+    'default': (
+        {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL}
+        if REDIS_URL
+        else {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+    ),
+}
+
+# Full-page cache for anonymous catalog GETs, 0 turns it off.
+PAGE_CACHE_SECONDS = int(os.getenv("PAGE_CACHE_SECONDS", "0" if DEBUG else "60"))
+
+# Clickstream (product views, searches, cart adds) buffered in memory and
+# written in batches by a background thread; see urbano/events.py.
+EVENTS_ENABLED = os.getenv("EVENTS_ENABLED", "0" if DEBUG else "1") == "1"
+EVENTS_FLUSH_SECONDS = float(os.getenv("EVENTS_FLUSH_SECONDS", "2"))
+EVENTS_BATCH_SIZE = int(os.getenv("EVENTS_BATCH_SIZE", "500"))
+EVENTS_MAX_BUFFER = int(os.getenv("EVENTS_MAX_BUFFER", "50000"))
+
+# Token buckets per client IP and per user, as "url_name=burst/refill per
+# second" pairs; see urbano/ratelimit.py. Empty turns limiting off.
+RATE_LIMITS = {}
+for _item in os.getenv(
+    "RATE_LIMITS", "" if DEBUG else "search=30/1,api_search=30/1,checkout=10/0.2,payment=5/0.05"
+).split(","):
+    if not _item.strip():
+        continue
+    try:
+        _name, _bucket = _item.split("=")
+        _burst, _rate = (float(n) for n in _bucket.split("/"))
+    except ValueError:
+        _name, _burst, _rate = "", 0, 0
+    # a zero rate would never refill, and divides by zero in urbano/ratelimit.py
+    if not (_name.strip() and 0 < _burst < math.inf and 0 < _rate < math.inf):
+        raise ImproperlyConfigured(f"RATE_LIMITS entry {_item.strip()!r} is not url_name=burst/rate, both positive")
+    RATE_LIMITS[_name.strip()] = (_burst, _rate)
+
 ROOT_URLCONF = 'urbano_cart.urls'
 
 TEMPLATES = [
@@ -67,6 +144,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'urbano.context_processors.nav_categories',
             ],
         },
     },
@@ -74,16 +152,72 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'urbano_cart.wsgi.application'
 
+# Warm each worker up before it takes traffic (urbano/warmup.py) and log
+# what every step cost. Off under DEBUG, where runserver reloads anyway.
+WARMUP = os.getenv("WARMUP", "0" if DEBUG else "1") == "1"
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "loggers": {"urbano.warmup": {"handlers": ["console"], "level": "INFO"}},
+}
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+DB_ENGINE = os.getenv("DB_ENGINE", "sqlite")
+
+if DB_ENGINE == "postgres":
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv("DB_NAME", "urbano_cart"),
+            'USER': os.getenv("DB_USER", "postgres"),
+            'PASSWORD': os.getenv("DB_PASSWORD", ""),
+            'HOST': os.getenv("DB_HOST", "localhost"),
+            'PORT': os.getenv("DB_PORT", "5432"),
+        }
     }
-}
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
+    }
+
+# Persistent connections: reuse a worker's connection for DB_CONN_MAX_AGE
+# seconds instead of reconnecting per request.
+DATABASES['default']['CONN_MAX_AGE'] = int(os.getenv("DB_CONN_MAX_AGE", "60"))
+DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+# psycopg 3 connection pool (Postgres only); replaces CONN_MAX_AGE.
+if DB_ENGINE == "postgres" and os.getenv("DB_POOL", "0") == "1":
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS'] = {"pool": True}
+
+# High-concurrency SQLite: WAL journaling, busy timeout, mmap and cache
+# pragmas on every connection (see urbano_cart/db.py).
+SQLITE_PRODUCTION_MODE = os.getenv("SQLITE_PRODUCTION_MODE", "0") == "1"
+
+if DB_ENGINE != "postgres" and SQLITE_PRODUCTION_MODE:
+    DATABASES['default']['OPTIONS'] = sqlite_options()
+
+# Read replicas for catalog pages, e.g. DB_REPLICAS=replica1.sqlite3,replica2.sqlite3
+# (SQLite files) or DB_REPLICAS=10.0.0.2,10.0.0.3:5433 (Postgres hosts).
+DATABASES.update(replica_databases(
+    DATABASES['default'],
+    [location.strip() for location in os.getenv("DB_REPLICAS", "").split(",") if location.strip()],
+))
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+
+DATABASE_ROUTERS = ['urbano.routers.CatalogReplicaRouter']
+
+# After a request writes catalog rows, that browser reads from the primary
+# for this many seconds so it never sees a lagging replica.
+REPLICA_PIN_SECONDS = 5
 
 
 # Password validation
@@ -128,10 +262,39 @@ STATICFILES_DIRS = [
 
 STATIC_ROOT = BASE_DIR / "staticfiles"
 
+# collectstatic writes content-hashed copies plus .gz and .br (Brotli)
+# versions; WhiteNoise serves the hashed names with a ten-year immutable
+# Cache-Control. Needs collectstatic to have run, so it is off under DEBUG.
+STATICFILES_MANIFEST = os.getenv("STATICFILES_MANIFEST", "0" if DEBUG else "1") == "1"
+
+STORAGES = {
+    # uploads are stored once per distinct content, named by hash (urbano/media.py)
+    "default": {
+        "BACKEND": "urbano.media.ContentAddressedStorage",
+    },
+    "staticfiles": {
+        "BACKEND": (
+            "whitenoise.storage.CompressedManifestStaticFilesStorage"
+            if STATICFILES_MANIFEST
+            else "django.contrib.staticfiles.storage.StaticFilesStorage"
+        ),
+    },
+}
+
+# unhashed files (favicon, direct links) are cached for a day
+WHITENOISE_MAX_AGE = 24 * 60 * 60 if STATICFILES_MANIFEST else 0
+
 MEDIA_URL = '/media/'
 
 MEDIA_ROOT = BASE_DIR / "media"
 
+# How /media/ responses carry the file: "django" returns it from the worker
+# (sendfile under gunicorn), "nginx" sends X-Accel-Redirect to an internal
+# location at MEDIA_ACCEL_PREFIX aliased to MEDIA_ROOT, "sendfile" sends
+# X-Sendfile for Apache mod_xsendfile or lighttpd.
+MEDIA_SERVE = os.getenv("MEDIA_SERVE", "django")
+MEDIA_ACCEL_PREFIX = os.getenv("MEDIA_ACCEL_PREFIX", "/protected-media/")
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -146,6 +309,13 @@ RAZORPAY_KEY_SECRET = os.getenv("RAZORPAY_KEY_SECRET")
 RAZORPAY_CURRENCY = "INR"
 SITE_URL = os.getenv("SITE_URL", "http://localhost:8000")  # used to build absolute callback URL
 
+# Local stand-in for Razorpay (urbano/gateway.py), for load tests and demos.
+# It accepts every payment signature, so it is refused outside DEBUG.
+PAYMENT_GATEWAY_STUB = os.getenv("PAYMENT_GATEWAY_STUB", "0") == "1"
+if PAYMENT_GATEWAY_STUB and not DEBUG:
+    raise ImproperlyConfigured("PAYMENT_GATEWAY_STUB accepts any payment signature; it needs DEBUG")
+PAYMENT_GATEWAY_STUB_LATENCY_MS = int(os.getenv("PAYMENT_GATEWAY_STUB_LATENCY_MS", "0"))
+
 EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
 EMAIL_HOST = "smtp.gmail.com"
 EMAIL_PORT = 587
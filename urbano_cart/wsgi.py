@@ -8,9 +8,16 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 """
 
 import os
+import time
+
+started = time.perf_counter()
 
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'urbano_cart.settings')
 
 application = get_wsgi_application()
+
+from urbano import warmup  # noqa: E402
+
+warmup.run(started)